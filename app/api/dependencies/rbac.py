@@ -11,7 +11,11 @@ from app.db.tables.auth.auth import User
 from app.db.tables.rbac.models import Role, Permission, Module, Account, APIKey
 from app.schemas.auth.bands import TokenData
 import hashlib
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+# How stale APIKey.last_used_at may get: recording every use would make each
+# API-key request a write, pinning it (and the client) to the primary
+API_KEY_LAST_USED_INTERVAL = timedelta(minutes=1)
 
 
 class RBACService:
@@ -266,13 +270,15 @@ async def verify_api_key(
     if not api_key:
         return None
     
-    # Check expiration
-    if api_key.expires_at and api_key.expires_at < datetime.utcnow():
+    # Check expiration (the columns are timezone-aware)
+    now = datetime.now(timezone.utc)
+    if api_key.expires_at and api_key.expires_at < now:
         return None
     
-    # Update last used
-    api_key.last_used_at = datetime.utcnow()
-    await session.commit()
+    # Update last used, at most once per interval
+    if not api_key.last_used_at or now - api_key.last_used_at >= API_KEY_LAST_USED_INTERVAL:
+        api_key.last_used_at = now
+        await session.flush()
     
     return api_key
 
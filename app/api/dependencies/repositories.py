@@ -1,30 +1,27 @@
-import os.path
 import re
 from typing import Optional
 
 import ulid
 
-from fastapi import Depends
-from fastapi.responses import FileResponse
+from fastapi import Depends, Request
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.db.models import async_session
+from app.db.routing import reads_from_replica, wrote_recently
 
 
-class TempFileResponse(FileResponse):
-    def __init__(self, path, *args, **kwargs):
-        super().__init__(path, *args, **kwargs)
-        self.file_path = path
-
-    def __del__(self):
-        if os.path.exists(self.file_path):
-            os.remove(self.file_path)
-
-
-async def get_db() -> AsyncSession:
+async def get_db(request: Request) -> AsyncSession:
+    """
+    One session and one transaction per request: repositories only flush, and
+    the work is committed once here when the request succeeds. Code that must
+    survive a partial failure uses a savepoint (session.begin_nested()).
+    """
     async with async_session() as session:
+        session.info["read_only"] = reads_from_replica(request)
+        session.info["primary_only"] = wrote_recently(request)
+        request.state.db_session = session
         yield session
         await session.commit()
 
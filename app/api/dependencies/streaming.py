@@ -0,0 +1,173 @@
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+
+from app.core.config import settings
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "Range: bytes=..." header into an inclusive (start, end).
+    Returns None when the whole object should be sent (no header, multiple
+    ranges or a unit other than bytes). Raises 416 when the range cannot be
+    satisfied.
+    """
+    if not range_header:
+        return None
+    
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    
+    start_str, _, end_str = spec.strip().partition("-")
+    try:
+        if not start_str:
+            # Suffix range: last N bytes
+            suffix = int(end_str)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(size - suffix, 0), size - 1
+        else:
+            start = int(start_str)
+            end = int(end_str) if end_str else size - 1
+            if end_str and end < start:
+                # Invalid byte-range-spec: ignored, the full content is sent (RFC 7233 2.1)
+                return None
+    except ValueError:
+        return None
+    
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def if_range_matches(if_range: Optional[str], etag: Optional[str], last_modified) -> bool:
+    """Check an If-Range validator (strong ETag or HTTP date) against the object"""
+    if not if_range:
+        return True
+    
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # Weak validators never match for range requests
+        return bool(etag) and not if_range.startswith("W/") and if_range == etag
+    
+    if last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(if_range) == last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
+
+
+async def stream_storage_object(
+    storage_service,
+    storage_path: str,
+    media_type: Optional[str],
+    filename: str,
+    range_header: Optional[str] = None,
+    if_range: Optional[str] = None,
+    disposition: str = "attachment",
+    cache_version: Optional[str] = None
+) -> Response:
+    """
+    Build a StreamingResponse that pipes a stored object to the client in chunks.
+    Honors Range/If-Range with 206 partial responses backed by ranged GETs,
+    so memory use and time-to-first-byte do not depend on the object size.
+    Objects held by the local disk cache are served from disk; cache_version
+    (the content hash) lets a hit skip storage entirely. Hits are read from an
+    open file, so an eviction while the response streams does not break it.
+    """
+    cached = storage_service.open_cached(storage_path, cache_version)
+    if cached:
+        info = storage_service.cached_file_info(cached, cache_version)
+    else:
+        # Backends that keep objects on local disk serve them directly (sendfile)
+        local_path = storage_service.get_local_path(storage_path)
+        if local_path:
+            return _file_response(local_path, media_type, filename, disposition)
+        
+        info = await storage_service.get_file_info(storage_path)
+        
+        # Without a content hash the ETag identifies the cached version
+        if not cache_version:
+            cache_version = info.get("etag")
+            cached = storage_service.open_cached(storage_path, cache_version)
+    size = info["size"]
+    
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'{disposition}; filename="{filename}"'
+    }
+    if info.get("etag"):
+        headers["ETag"] = info["etag"]
+    if info.get("last_modified"):
+        headers["Last-Modified"] = formatdate(info["last_modified"].timestamp(), usegmt=True)
+    
+    byte_range = None
+    if size > 0 and if_range_matches(if_range, info.get("etag"), info.get("last_modified")):
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except HTTPException:
+            if cached:
+                cached.close()
+            raise
+    
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+    else:
+        headers["Content-Length"] = str(size)
+        status_code = status.HTTP_200_OK
+    
+    if cached:
+        body = storage_service.stream_cached(cached, byte_range)
+    else:
+        body = await storage_service.open_file_stream(storage_path, byte_range)
+        if not byte_range:
+            body = storage_service.cache_through(storage_path, cache_version, size, body)
+    
+    return StreamingResponse(
+        body,
+        status_code=status_code,
+        media_type=media_type or "application/octet-stream",
+        headers=headers
+    )
+
+
+def _file_response(path: str, media_type: Optional[str], filename: str,
+                   disposition: str) -> FileResponse:
+    """Serve an object from local disk; FileResponse handles Range/If-Range itself"""
+    return FileResponse(
+        path,
+        media_type=media_type or "application/octet-stream",
+        filename=filename,
+        content_disposition_type=disposition
+    )
+
+
+async def redirect_to_storage(
+    storage_service,
+    storage_path: str,
+    media_type: Optional[str],
+    filename: str
+) -> RedirectResponse:
+    """
+    Redirect the client to a short-lived presigned GET so the bytes are served
+    by storage directly instead of through the API workers.
+    """
+    url = await storage_service.get_file_url(
+        storage_path,
+        expires_in=settings.s3_presigned_download_expires,
+        filename=filename,
+        content_type=media_type
+    )
+    return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, status, Header, Query
+from fastapi import APIRouter, Depends, status, Header, Query, Response
 from typing import List, Optional
 
 from app.api.dependencies.rbac import require_permission, get_current_user
 from app.api.dependencies.repositories import get_repository
+from app.db.pagination import set_next_cursor
 from app.db.repositories.dms.approvals_repository import ApprovalsRepository
 from app.schemas.dms.schemas import (
     ApprovalWorkflowCreate, ApprovalWorkflowOut, ApprovalWorkflowDetail,
@@ -91,15 +92,18 @@ async def get_workflow(
     summary="List workflows"
 )
 async def list_workflows(
+    response: Response,
     file_id: Optional[str] = Query(None),
     status: Optional[str] = Query(None, pattern=r'^(pending|approved|rejected|cancelled)$'),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; skip is ignored"),
     current_user: TokenData = Depends(get_current_user),
     repository: ApprovalsRepository = Depends(get_repository(ApprovalsRepository))
 ):
     """List approval workflows with filters"""
-    workflows = await repository.list_workflows(file_id, status, skip, limit)
+    workflows = await repository.list_workflows(file_id, status, skip, limit, cursor)
+    set_next_cursor(response, workflows)
     
     return [
         ApprovalWorkflowOut(
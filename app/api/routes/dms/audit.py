@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from app.api.dependencies.repositories import get_db
+from app.db.pagination import set_next_cursor
 from app.api.dependencies.auth_utils import get_current_user
 from app.api.dependencies.rbac import require_permission
 from app.db.tables.auth.auth import User
@@ -16,13 +17,15 @@ router = APIRouter(prefix="/audit", tags=["Audit"])
 async def query_audit_logs(
     query: AuditLogQuery,
     account_id: str,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     _: None = Depends(require_permission("audit", "read"))
 ):
-    """Query audit logs with filters"""
+    """Query audit logs with filters; the next page's cursor is in X-Next-Cursor"""
     repo = AuditRepository(db)
     logs = await repo.query_logs(account_id, query)
+    set_next_cursor(response, logs)
     return logs
 
 
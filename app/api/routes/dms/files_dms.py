@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, status, Header, File, UploadFile, Query
-from fastapi.responses import StreamingResponse, Response
+from fastapi import APIRouter, BackgroundTasks, Depends, status, Header, File, UploadFile, Query
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
-import io
 
 from app.api.dependencies.rbac import require_permission, get_current_user
 from app.api.dependencies.repositories import get_repository
+from app.api.dependencies.streaming import stream_storage_object, redirect_to_storage
+from app.db.pagination import set_next_cursor
 from app.db.repositories.dms.dms_repository import DMSRepository
+from app.db.repositories.dms.blob_repository import BlobRepository
 from app.schemas.dms.schemas import (
     FileCreate, FileUpdate, FileOut, UploadResponse, BulkUploadResponse,
-    OfficeDocCreate, DownloadAllRequest
+    OfficeDocCreate, DownloadAllRequest,
+    DirectUploadRequest, DirectUploadOut, DirectUploadComplete, DirectUploadAbort
 )
 from app.schemas.auth.bands import TokenData
+from app.services.renditions import rendition_service, RENDITION_SIZES, RENDITION_MEDIA_TYPE
 from app.services.storage_service import storage_service
 
 router = APIRouter(tags=["Files DMS"], prefix="/files-dms")
@@ -24,63 +28,43 @@ router = APIRouter(tags=["Files DMS"], prefix="/files-dms")
     summary="Upload files"
 )
 async def upload_files(
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     folder_id: str = Query(...),
     x_account_id: str = Header(...),
     current_user: TokenData = Depends(get_current_user),
-    repository: DMSRepository = Depends(get_repository(DMSRepository))
+    repository: DMSRepository = Depends(get_repository(DMSRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
 ):
     """Upload one or multiple files to a folder"""
-    uploaded = []
-    failed = []
+    results, failed_files = await repository.ingest_uploads(
+        x_account_id, folder_id, files, current_user.id, blob_repo, storage_service
+    )
     
-    for file in files:
-        try:
-            # Generate storage path
-            storage_path = f"files/{x_account_id}/{folder_id}/{file.filename}"
-            
-            # Upload to S3/MinIO
-            size_bytes, file_hash = await storage_service.upload_file(file, storage_path)
-            
-            # Check for duplicate
-            existing = await repository.get_files_by_hash(file_hash, x_account_id)
-            if existing:
-                # File already exists, skip or link
-                uploaded.append(UploadResponse(
-                    file_id=existing.id,
-                    name=existing.name,
-                    size_bytes=existing.size_bytes,
-                    mime_type=existing.mime_type,
-                    message="File already exists (deduplicated)"
-                ))
-                continue
-            
-            # Create file record
-            file_data = FileCreate(
-                account_id=x_account_id,
-                folder_id=folder_id,
-                name=file.filename,
-                original_filename=file.filename,
-                mime_type=file.content_type,
-                size_bytes=size_bytes,
-                storage_path=storage_path,
-                file_hash=file_hash
+    uploaded = []
+    for file, new_file, deduplicated in results:
+        if not deduplicated:
+            # Render the list-view thumbnail once the response has gone out
+            background_tasks.add_task(
+                rendition_service.generate,
+                x_account_id, new_file.file_hash, new_file.storage_path, new_file.mime_type
             )
-            
-            new_file = await repository.create_file(file_data, current_user.id)
-            
-            uploaded.append(UploadResponse(
-                file_id=new_file.id,
-                name=new_file.name,
-                size_bytes=new_file.size_bytes,
-                mime_type=new_file.mime_type,
-                message="Uploaded successfully"
-            ))
-        except Exception as e:
-            failed.append({
-                "filename": file.filename,
-                "error": str(e)
-            })
+        
+        uploaded.append(UploadResponse(
+            file_id=new_file.id,
+            name=new_file.name,
+            size_bytes=new_file.size_bytes,
+            mime_type=new_file.mime_type,
+            message="File already exists (deduplicated)" if deduplicated else "Uploaded successfully"
+        ))
+    
+    failed = [
+        {
+            "filename": file.filename,
+            "error": str(error)
+        }
+        for file, error in failed_files
+    ]
     
     return BulkUploadResponse(
         uploaded=uploaded,
@@ -104,90 +88,167 @@ async def upload_zip(
     preserve_structure: bool = Query(True),
     x_account_id: str = Header(...),
     current_user: TokenData = Depends(get_current_user),
-    repository: DMSRepository = Depends(get_repository(DMSRepository))
+    repository: DMSRepository = Depends(get_repository(DMSRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
 ):
     """Upload ZIP file and extract contents into folder structure"""
-    # Extract ZIP
-    extracted_files = await storage_service.extract_zip(zip_file)
-    
-    uploaded = []
-    failed = []
-    folder_cache = {}  # Cache created folders
+    archive = await storage_service.open_zip(zip_file)
     
-    for file_info in extracted_files:
-        try:
-            # Determine target folder
-            target_folder_id = folder_id
-            
-            if preserve_structure and file_info['folder_path']:
-                # Create nested folders
-                parent_id = folder_id
-                for folder_name in file_info['folder_path']:
-                    cache_key = f"{parent_id}:{folder_name}"
-                    
-                    if cache_key in folder_cache:
-                        parent_id = folder_cache[cache_key]
-                    else:
-                        # Get section_id from parent folder
-                        parent_folder = await repository.get_folder(parent_id, x_account_id)
-                        
-                        # Create subfolder
-                        from app.schemas.dms.schemas import FolderCreate
-                        folder_data = FolderCreate(
-                            account_id=x_account_id,
-                            section_id=parent_folder.section_id,
-                            parent_folder_id=parent_id,
-                            name=folder_name
-                        )
-                        new_folder = await repository.create_folder(folder_data, current_user.id)
-                        folder_cache[cache_key] = new_folder.id
-                        parent_id = new_folder.id
-                
-                target_folder_id = parent_id
-            
-            # Upload file
-            storage_path = f"files/{x_account_id}/{target_folder_id}/{file_info['filename']}"
-            
-            # Upload content to S3
-            from fastapi import UploadFile as FUF
-            temp_file = FUF(filename=file_info['filename'], file=io.BytesIO(file_info['content']))
-            size_bytes, file_hash = await storage_service.upload_file(temp_file, storage_path)
-            
-            # Create file record
-            file_data = FileCreate(
-                account_id=x_account_id,
-                folder_id=target_folder_id,
-                name=file_info['filename'],
-                original_filename=file_info['filename'],
-                size_bytes=file_info['size'],
-                storage_path=storage_path,
-                file_hash=file_hash
+    with archive:
+        members = storage_service.list_zip_members(archive)
+        
+        # Materialize the whole folder tree up front
+        if preserve_structure:
+            folder_ids = await repository.ensure_folder_tree(
+                x_account_id,
+                folder_id,
+                [tuple(member['folder_path']) for member in members],
+                current_user.id
             )
-            
-            new_file = await repository.create_file(file_data, current_user.id)
-            
-            uploaded.append(UploadResponse(
-                file_id=new_file.id,
-                name=new_file.name,
-                size_bytes=new_file.size_bytes,
-                mime_type=new_file.mime_type,
-                message=f"Extracted from ZIP: {file_info['original_path']}"
-            ))
-        except Exception as e:
-            failed.append({
-                "filename": file_info['filename'],
-                "error": str(e)
-            })
+        else:
+            folder_ids = {}
+        
+        # Hash and upload members concurrently, streaming each one from the archive
+        stored, failed_members = await blob_repo.store_zip_members(
+            x_account_id, archive, members, storage_service
+        )
+    
+    file_data = [
+        FileCreate(
+            account_id=x_account_id,
+            folder_id=folder_ids.get(tuple(member['folder_path']), folder_id),
+            name=member['filename'],
+            original_filename=member['filename'],
+            mime_type=member['mime_type'],
+            size_bytes=size_bytes,
+            storage_path=storage_path,
+            file_hash=file_hash
+        )
+        for member, size_bytes, file_hash, storage_path in stored
+    ]
+    new_files = await repository.bulk_create_files(file_data, current_user.id)
+    
+    uploaded = [
+        UploadResponse(
+            file_id=new_file.id,
+            name=new_file.name,
+            size_bytes=new_file.size_bytes,
+            mime_type=new_file.mime_type,
+            message=f"Extracted from ZIP: {member['original_path']}"
+        )
+        for new_file, (member, _, _, _) in zip(new_files, stored)
+    ]
+    failed = [
+        {
+            "filename": member['filename'],
+            "error": str(error)
+        }
+        for member, error in failed_members
+    ]
     
     return BulkUploadResponse(
         uploaded=uploaded,
         failed=failed,
-        total=len(extracted_files),
+        total=len(members),
         success_count=len(uploaded),
         fail_count=len(failed)
     )
 
 
+@router.post(
+    "/direct-upload",
+    response_model=DirectUploadOut,
+    dependencies=[Depends(require_permission("files", "create"))],
+    summary="Start a direct-to-storage upload"
+)
+async def begin_direct_upload(
+    data: DirectUploadRequest,
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
+):
+    """
+    Get presigned URLs to upload a file straight to storage.
+    Call /direct-upload/complete once the upload has finished.
+    """
+    return await blob_repo.begin_direct_upload(
+        x_account_id, storage_service, data.size_bytes, data.file_hash, data.mime_type
+    )
+
+
+@router.post(
+    "/direct-upload/complete",
+    response_model=UploadResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_permission("files", "create"))],
+    summary="Finish a direct-to-storage upload"
+)
+async def complete_direct_upload(
+    data: DirectUploadComplete,
+    folder_id: str = Query(...),
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user),
+    repository: DMSRepository = Depends(get_repository(DMSRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
+):
+    """Verify a direct upload (size and SHA-256) and create the file record"""
+    storage_path = await blob_repo.store_direct_upload(
+        x_account_id,
+        storage_service,
+        data.size_bytes,
+        data.file_hash,
+        data.mime_type,
+        storage_key=data.storage_key,
+        upload_id=data.upload_id,
+        parts=[
+            {'PartNumber': part.part_number, 'ETag': part.etag}
+            for part in data.parts or []
+        ]
+    )
+    
+    file_data = FileCreate(
+        account_id=x_account_id,
+        folder_id=folder_id,
+        name=data.filename,
+        original_filename=data.filename,
+        mime_type=data.mime_type,
+        size_bytes=data.size_bytes,
+        storage_path=storage_path,
+        file_hash=data.file_hash
+    )
+    new_file = await repository.create_file(file_data, current_user.id)
+    
+    return UploadResponse(
+        file_id=new_file.id,
+        name=new_file.name,
+        size_bytes=new_file.size_bytes,
+        mime_type=new_file.mime_type,
+        message="Uploaded successfully"
+    )
+
+
+@router.post(
+    "/direct-upload/abort",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_permission("files", "create"))],
+    summary="Abandon a direct-to-storage upload"
+)
+async def abort_direct_upload(
+    data: DirectUploadAbort,
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user)
+):
+    """Discard a direct upload that will not be completed"""
+    if not data.storage_key.startswith(f"uploads/{x_account_id}/"):
+        from app.core.exceptions import http_400
+        raise http_400(msg="Invalid upload key")
+    
+    if data.upload_id:
+        await storage_service.abort_multipart_upload(data.storage_key, data.upload_id)
+    else:
+        await storage_service.delete_file(data.storage_key)
+
+
 @router.post(
     "/create-office",
     response_model=FileOut,
@@ -214,15 +275,19 @@ async def create_office_document(
     summary="List files"
 )
 async def list_files(
+    response: Response,
     folder_id: Optional[str] = Query(None),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; skip is ignored"),
     x_account_id: str = Header(...),
     current_user: TokenData = Depends(get_current_user),
     repository: DMSRepository = Depends(get_repository(DMSRepository))
 ):
-    """List files in account or folder"""
-    return await repository.list_files(x_account_id, folder_id, skip, limit)
+    """List files in account or folder, newest first"""
+    page = await repository.list_files(x_account_id, folder_id, skip, limit, cursor)
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get(
@@ -248,26 +313,88 @@ async def get_file(
 )
 async def download_file(
     file_id: str,
+    redirect: bool = Query(False, description="Redirect to a short-lived presigned storage URL (S3 backends only)"),
     x_account_id: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
     current_user: TokenData = Depends(get_current_user),
     repository: DMSRepository = Depends(get_repository(DMSRepository))
 ):
-    """Download file"""
+    """Download file (streamed, supports Range requests)"""
     file = await repository.get_file(file_id, x_account_id)
     if not file:
         from app.core.exceptions import http_404
         raise http_404(msg="File not found")
     
-    # Download from S3
-    content = await storage_service.download_file(file.storage_path)
+    if redirect and storage_service.can_presign(file.storage_path):
+        return await redirect_to_storage(
+            storage_service, file.storage_path, file.mime_type, file.original_filename
+        )
     
-    return Response(
-        content=content,
-        media_type=file.mime_type or 'application/octet-stream',
-        headers={
-            'Content-Disposition': f'attachment; filename="{file.original_filename}"'
-        }
+    # Stream from S3, honoring Range/If-Range
+    return await stream_storage_object(
+        storage_service,
+        file.storage_path,
+        media_type=file.mime_type,
+        filename=file.original_filename,
+        range_header=range_header,
+        if_range=if_range,
+        cache_version=file.file_hash
+    )
+
+
+@router.get(
+    "/{file_id}/rendition",
+    dependencies=[Depends(require_permission("files", "read"))],
+    summary="Get a thumbnail or preview image"
+)
+async def get_file_rendition(
+    file_id: str,
+    size: str = Query("thumbnail", pattern=f"^({'|'.join(RENDITION_SIZES)})$"),
+    v: Optional[str] = Query(None, description="Content hash the URL is pinned to; pinned URLs may be cached for a year"),
+    x_account_id: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    current_user: TokenData = Depends(get_current_user),
+    repository: DMSRepository = Depends(get_repository(DMSRepository))
+):
+    """
+    Serve a small WebP thumbnail or first-page preview of an image or PDF.
+    Renditions are rendered once per content and size, then served from storage.
+    """
+    from app.core.exceptions import http_404
+    
+    file = await repository.get_file(file_id, x_account_id)
+    if not file:
+        raise http_404(msg="File not found")
+    
+    # Pinned to the current content: the URL can never change meaning
+    if v and v == file.file_hash:
+        cache_control = "private, max-age=31536000, immutable"
+    else:
+        cache_control = "private, no-cache"
+    etag = f'"{file.file_hash}-{size}"'
+    
+    if if_none_match == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers={"ETag": etag, "Cache-Control": cache_control})
+    
+    storage_path = await rendition_service.get_or_create(
+        file.account_id, file.file_hash, file.storage_path, file.mime_type, size
     )
+    if not storage_path:
+        raise http_404(msg="No preview available for this file")
+    
+    response = await stream_storage_object(
+        storage_service,
+        storage_path,
+        media_type=RENDITION_MEDIA_TYPE,
+        filename=f"{size}.webp",
+        disposition="inline",
+        cache_version=f"{file.file_hash}-{size}"
+    )
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
 
 
 @router.post(
@@ -281,42 +408,17 @@ async def download_all(
     current_user: TokenData = Depends(get_current_user),
     repository: DMSRepository = Depends(get_repository(DMSRepository))
 ):
-    """Download all files in account/section/folder as ZIP"""
+    """Stream all files in account/section/folder as a ZIP archive"""
     account_id = request.account_id or x_account_id
     
-    # Get files based on scope
-    if request.folder_id:
-        files = await repository.list_files(account_id, request.folder_id, limit=10000)
-    elif request.section_id:
-        # Get all folders in section, then all files
-        from sqlalchemy import select
-        from app.db.tables.dms.folders_new import FolderNew
-        stmt = select(FolderNew).where(FolderNew.section_id == request.section_id)
-        result = await repository.session.execute(stmt)
-        folders = result.scalars().all()
-        
-        files = []
-        for folder in folders:
-            folder_files = await repository.list_files(account_id, folder.id, limit=10000)
-            files.extend(folder_files)
-    else:
-        # All files in account
-        files = await repository.list_files(account_id, limit=10000)
-    
-    # Prepare file list for ZIP
-    file_list = []
-    for file in files:
-        file_list.append({
-            'storage_path': file.storage_path,
-            'filename': file.original_filename,
-            'folder_path': []  # TODO: Build folder path
-        })
-    
-    # Create ZIP
-    zip_content = await storage_service.create_zip(file_list)
+    file_list = await repository.list_files_for_export(
+        account_id,
+        section_id=request.section_id,
+        folder_id=request.folder_id
+    )
     
-    return Response(
-        content=zip_content,
+    return StreamingResponse(
+        storage_service.stream_zip(file_list),
         media_type='application/zip',
         headers={
             'Content-Disposition': f'attachment; filename="download-{account_id}.zip"'
@@ -356,7 +458,7 @@ async def delete_file(
 ):
     """Delete file (soft delete by default, permanent if specified)"""
     if permanent:
-        await repository.permanent_delete_file(file_id, x_account_id)
+        await repository.permanent_delete_file(file_id, x_account_id, storage_service)
     else:
         await repository.soft_delete_file(file_id, x_account_id)
 
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, status, Header, Query
-from typing import List, Optional
+from fastapi import APIRouter, Depends, status, Header, Query, Response
+from typing import List, Optional, Union
 
 from app.api.dependencies.rbac import require_permission, get_current_user
 from app.api.dependencies.repositories import get_repository
+from app.db.pagination import set_next_cursor
 from app.db.repositories.dms.dms_repository import DMSRepository
-from app.schemas.dms.schemas import FolderCreate, FolderUpdate, FolderOut, FolderTree
+from app.schemas.dms.schemas import FolderCreate, FolderUpdate, FolderOut, FolderTree, FolderTreeNode
 from app.schemas.auth.bands import TokenData
+from app.services.storage_service import storage_service
 
 router = APIRouter(tags=["Folders DMS"], prefix="/folders-dms")
 
@@ -36,32 +38,42 @@ async def create_folder(
     summary="List folders"
 )
 async def list_folders(
+    response: Response,
     section_id: Optional[str] = Query(None),
     parent_folder_id: Optional[str] = Query(None),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; skip is ignored"),
     x_account_id: str = Header(...),
     current_user: TokenData = Depends(get_current_user),
     repository: DMSRepository = Depends(get_repository(DMSRepository))
 ):
     """List folders in an account/section"""
-    return await repository.list_folders(x_account_id, section_id, parent_folder_id, skip, limit)
+    page = await repository.list_folders(x_account_id, section_id, parent_folder_id, skip, limit, cursor)
+    set_next_cursor(response, page)
+    return page
 
 
 @router.get(
     "/tree/{section_id}",
-    response_model=List[dict],
+    response_model=Union[List[FolderTree], List[FolderTreeNode]],
     dependencies=[Depends(require_permission("folders", "read"))],
     summary="Get folder tree"
 )
 async def get_folder_tree(
     section_id: str,
+    parent: Optional[str] = Query(None, description="Return only the subtree below this folder"),
+    depth: Optional[int] = Query(None, ge=1, description="Number of levels to return"),
+    compact: bool = Query(False, description="Flat list of FolderTreeNode instead of nested folders"),
     x_account_id: str = Header(...),
     current_user: TokenData = Depends(get_current_user),
     repository: DMSRepository = Depends(get_repository(DMSRepository))
 ):
-    """Get complete folder tree for a section"""
-    return await repository.get_folder_tree(section_id, x_account_id)
+    """
+    Get the folder tree for a section. Use depth and parent to load large
+    trees level by level; folder_count > 0 marks folders with more levels.
+    """
+    return await repository.get_folder_tree(section_id, x_account_id, parent, depth, compact)
 
 
 @router.get(
@@ -110,4 +122,4 @@ async def delete_folder(
     repository: DMSRepository = Depends(get_repository(DMSRepository))
 ):
     """Delete folder (cascades to files)"""
-    await repository.delete_folder(folder_id, x_account_id)
+    await repository.delete_folder(folder_id, x_account_id, storage_service)
@@ -8,7 +8,7 @@ from app.api.dependencies.rbac import require_permission
 from app.db.tables.auth.auth import User
 from app.db.repositories.dms.inbox_repository import InboxRepository
 from app.db.repositories.dms.audit_repository import AuditRepository
-from app.services.storage_service import StorageService
+from app.services.storage_service import StorageService, get_storage_service
 from app.schemas.dms.sharing_schemas import (
     InboxEntryOut, InboxEntryCreate, InboxEntryMove
 )
@@ -34,7 +34,7 @@ async def create_inbox_entry(
     data: InboxEntryCreate,
     inbox_address: str,
     db: AsyncSession = Depends(get_db),
-    storage_service: StorageService = Depends()
+    storage_service: StorageService = Depends(get_storage_service)
 ):
     """Simulate receiving an email (no auth required for external systems)"""
     repo = InboxRepository(db)
@@ -96,7 +96,7 @@ async def move_inbox_entry_to_folder(
     data: InboxEntryMove,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    storage_service: StorageService = Depends(),
+    storage_service: StorageService = Depends(get_storage_service),
     _: None = Depends(require_permission("inbox", "update"))
 ):
     """Move inbox entry attachments to a folder"""
@@ -130,7 +130,7 @@ async def delete_inbox_entry(
     entry_id: str,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    storage_service: StorageService = Depends(),
+    storage_service: StorageService = Depends(get_storage_service),
     _: None = Depends(require_permission("inbox", "delete"))
 ):
     """Delete inbox entry"""
@@ -142,7 +142,7 @@ async def delete_inbox_entry(
         from app.core.exceptions import http_404
         raise http_404(msg="Inbox entry not found")
     
-    await repo.delete_inbox_entry(entry_id, storage_service)
+    reclaimed = await repo.delete_inbox_entry(entry_id)
     
     await audit_repo.log_action(
         account_id=entry.account_id,
@@ -151,5 +151,10 @@ async def delete_inbox_entry(
         resource_type="inbox_entry",
         resource_id=entry_id
     )
+    await db.commit()
+    
+    # Content nothing references any more goes only once the delete is committed
+    if reclaimed:
+        await storage_service.delete_files(reclaimed)
     
     return {"message": "Inbox entry deleted successfully"}
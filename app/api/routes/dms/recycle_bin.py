@@ -1,14 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 
 from app.api.dependencies.repositories import get_db
+from app.db.pagination import set_next_cursor
 from app.api.dependencies.auth_utils import get_current_user
 from app.api.dependencies.rbac import require_permission
 from app.db.tables.auth.auth import User
 from app.db.repositories.dms.recycle_bin_repository import RecycleBinRepository
 from app.db.repositories.dms.audit_repository import AuditRepository
-from app.services.storage_service import StorageService
+from app.services.storage_service import StorageService, get_storage_service
 from app.schemas.dms.sharing_schemas import RecycleBinItemOut, RecycleBinRestore
 
 router = APIRouter(prefix="/recycle-bin", tags=["Recycle Bin"])
@@ -17,15 +18,18 @@ router = APIRouter(prefix="/recycle-bin", tags=["Recycle Bin"])
 @router.get("/files", response_model=List[RecycleBinItemOut])
 async def list_deleted_files(
     account_id: str,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; skip is ignored"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     _: None = Depends(require_permission("admin_users", "read"))  # Admin only
 ):
     """List deleted files in recycle bin"""
     repo = RecycleBinRepository(db)
-    files = await repo.list_deleted_files(account_id, skip, limit)
+    files = await repo.list_deleted_files(account_id, skip, limit, cursor)
+    set_next_cursor(response, files)
     
     return [
         RecycleBinItemOut(
@@ -101,7 +105,7 @@ async def permanently_delete_items(
     account_id: str,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    storage_service: StorageService = Depends(),
+    storage_service: StorageService = Depends(get_storage_service),
     _: None = Depends(require_permission("admin_users", "delete"))
 ):
     """Permanently delete items from recycle bin"""
@@ -111,7 +115,7 @@ async def permanently_delete_items(
     if data.item_type == "file":
         count = await repo.permanently_delete_files(data.item_ids, account_id, storage_service)
     else:
-        count = await repo.permanently_delete_folders(data.item_ids, account_id)
+        count = await repo.permanently_delete_folders(data.item_ids, account_id, storage_service)
     
     await audit_repo.log_action(
         account_id=account_id,
@@ -129,14 +133,14 @@ async def empty_recycle_bin(
     account_id: str,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    storage_service: StorageService = Depends(),
+    storage_service: StorageService = Depends(get_storage_service),
     _: None = Depends(require_permission("admin_users", "delete"))
 ):
     """Empty entire recycle bin for an account"""
     repo = RecycleBinRepository(db)
     audit_repo = AuditRepository(db)
     
-    result = await repo.empty_recycle_bin(account_id, storage_service)
+    result, reclaimed = await repo.empty_recycle_bin(account_id, storage_service)
     
     await audit_repo.log_action(
         account_id=account_id,
@@ -146,5 +150,9 @@ async def empty_recycle_bin(
         resource_id=account_id,
         metadata=result
     )
+    await db.commit()
+    
+    # Reclaimed content goes only once nothing committed points at it
+    result["objects_deleted"] += await storage_service.delete_files(reclaimed)
     
     return result
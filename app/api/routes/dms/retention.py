@@ -8,6 +8,7 @@ from app.api.dependencies.rbac import require_permission
 from app.db.tables.auth.auth import User
 from app.db.repositories.dms.retention_repository import RetentionRepository
 from app.db.repositories.dms.audit_repository import AuditRepository
+from app.services.storage_service import StorageService, get_storage_service
 from app.schemas.dms.sharing_schemas import (
     RetentionPolicyCreate, RetentionPolicyUpdate, RetentionPolicyOut
 )
@@ -130,6 +131,7 @@ async def delete_retention_policy(
 async def apply_retention_policies(
     account_id: str,
     db: AsyncSession = Depends(get_db),
+    storage_service: StorageService = Depends(get_storage_service),
     current_user: User = Depends(get_current_user),
     _: None = Depends(require_permission("retention", "admin"))
 ):
@@ -137,7 +139,7 @@ async def apply_retention_policies(
     repo = RetentionRepository(db)
     audit_repo = AuditRepository(db)
     
-    result = await repo.apply_retention_policies(account_id)
+    result = await repo.apply_retention_policies(account_id, storage_service)
     
     await audit_repo.log_action(
         account_id=account_id,
@@ -30,11 +30,13 @@ async def search_files(
     - content: Search in file content (placeholder for future)
     - all: Search everywhere
     """
-    results, total = await repository.search_files(x_account_id, search_request)
+    results, total, total_capped = await repository.search_files(x_account_id, search_request)
     
     return SearchResponse(
         results=results,
         total=total,
+        total_capped=total_capped,
         query=search_request.q,
-        scope=search_request.scope
+        scope=search_request.scope,
+        next_cursor=results.next_cursor
     )
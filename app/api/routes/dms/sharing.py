@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from app.api.dependencies.repositories import get_db
+from app.db.pagination import set_next_cursor
 from app.api.dependencies.auth_utils import get_current_user
 from app.api.dependencies.rbac import require_permission
 from app.db.tables.auth.auth import User
@@ -48,10 +49,12 @@ async def create_share(
 @router.get("", response_model=List[ShareOut])
 async def list_shares(
     account_id: str,
+    response: Response,
     resource_type: Optional[str] = None,
     resource_id: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; skip is ignored"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
     _: None = Depends(require_permission("sharing", "read"))
@@ -63,8 +66,10 @@ async def list_shares(
         resource_type=resource_type,
         resource_id=resource_id,
         skip=skip,
-        limit=limit
+        limit=limit,
+        cursor=cursor
     )
+    set_next_cursor(response, shares)
     return shares
 
 
@@ -1,16 +1,20 @@
-from fastapi import APIRouter, Depends, status, Header, File, UploadFile, Query
-from fastapi.responses import Response
+from fastapi import APIRouter, BackgroundTasks, Depends, status, Header, File, UploadFile, Query, Path
 from typing import List, Optional
 
 from app.api.dependencies.rbac import require_permission, get_current_user, get_rbac_service, RBACService
 from app.api.dependencies.repositories import get_repository
+from app.api.dependencies.streaming import stream_storage_object, redirect_to_storage
 from app.db.repositories.dms.versioning_repository import VersioningRepository
 from app.db.repositories.dms.dms_repository import DMSRepository
+from app.db.repositories.dms.blob_repository import BlobRepository
 from app.schemas.dms.schemas import (
     FileVersionOut, FileLockCreate, FileLockOut, FileLockStatus,
+    DirectUploadRequest, DirectUploadOut, DirectUploadComplete,
+    ChunkedUploadRequest, ChunkedUploadOut,
     FileReminderCreate, FileReminderUpdate, FileReminderOut, FileReminderDetail
 )
 from app.schemas.auth.bands import TokenData
+from app.services.renditions import rendition_service
 from app.services.storage_service import storage_service
 
 router = APIRouter(tags=["File Versioning & Locking"], prefix="/files-dms")
@@ -27,12 +31,14 @@ router = APIRouter(tags=["File Versioning & Locking"], prefix="/files-dms")
 )
 async def upload_new_version(
     file_id: str,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     comment: Optional[str] = Query(None),
     x_account_id: str = Header(...),
     current_user: TokenData = Depends(get_current_user),
     dms_repo: DMSRepository = Depends(get_repository(DMSRepository)),
-    version_repo: VersioningRepository = Depends(get_repository(VersioningRepository))
+    version_repo: VersioningRepository = Depends(get_repository(VersioningRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
 ):
     """Upload a new version of an existing file"""
     # Check if file exists
@@ -47,11 +53,10 @@ async def upload_new_version(
         from app.core.exceptions import http_403
         raise http_403(msg=f"File is locked by another user until {lock.locked_until}")
     
-    # Generate storage path for new version
-    storage_path = f"files/{x_account_id}/{existing_file.folder_id}/versions/{file_id}/{file.filename}"
-    
-    # Upload to S3
-    size_bytes, file_hash = await storage_service.upload_file(file, storage_path)
+    # Store content in the blob store (no PUT if the account already holds it)
+    size_bytes, file_hash, storage_path = await blob_repo.store_upload(
+        x_account_id, file, storage_service
+    )
     
     # Create version record
     version = await version_repo.create_version(
@@ -64,14 +69,216 @@ async def upload_new_version(
         created_by=current_user.id
     )
     
-    # Update file record to point to new version
+    await _make_current_version(existing_file, version, blob_repo)
+    background_tasks.add_task(
+        rendition_service.generate, x_account_id, file_hash, storage_path, file.content_type
+    )
+    return version
+
+
+async def _make_current_version(existing_file, version, blob_repo: BlobRepository):
+    """Point the file record at a new version; the file's blob reference moves with it"""
+    old_storage_path = existing_file.storage_path
+    await blob_repo.retain(existing_file.account_id, version.storage_path)
+    reclaimed = await blob_repo.release_paths(
+        existing_file.account_id, [old_storage_path], include_legacy=False
+    )
+    
     existing_file.current_version_id = version.id
-    existing_file.storage_path = storage_path
-    existing_file.mime_type = file.content_type
-    existing_file.size_bytes = size_bytes
-    existing_file.file_hash = file_hash
-    await version_repo.session.commit()
+    existing_file.storage_path = version.storage_path
+    existing_file.mime_type = version.mime_type
+    existing_file.size_bytes = version.size_bytes
+    existing_file.file_hash = version.file_hash
+    await blob_repo.session.commit()
+    
+    # Reclaim the previous content (and its chunks) only once nothing references it any more
+    if reclaimed:
+        await storage_service.delete_files(reclaimed)
+
+
+@router.post(
+    "/{file_id}/versions/direct-upload",
+    response_model=DirectUploadOut,
+    dependencies=[Depends(require_permission("files", "update"))],
+    summary="Start a direct-to-storage version upload"
+)
+async def begin_direct_version_upload(
+    file_id: str,
+    data: DirectUploadRequest,
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user),
+    dms_repo: DMSRepository = Depends(get_repository(DMSRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
+):
+    """
+    Get presigned URLs to upload a new version straight to storage.
+    Call /versions/direct-upload/complete once the upload has finished.
+    """
+    if not await dms_repo.get_file(file_id, x_account_id):
+        from app.core.exceptions import http_404
+        raise http_404(msg="File not found")
     
+    return await blob_repo.begin_direct_upload(
+        x_account_id, storage_service, data.size_bytes, data.file_hash, data.mime_type
+    )
+
+
+@router.post(
+    "/{file_id}/versions/direct-upload/complete",
+    response_model=FileVersionOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_permission("files", "update"))],
+    summary="Finish a direct-to-storage version upload"
+)
+async def complete_direct_version_upload(
+    file_id: str,
+    data: DirectUploadComplete,
+    comment: Optional[str] = Query(None),
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user),
+    dms_repo: DMSRepository = Depends(get_repository(DMSRepository)),
+    version_repo: VersioningRepository = Depends(get_repository(VersioningRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
+):
+    """Verify a direct upload (size and SHA-256) and create the version record"""
+    existing_file = await dms_repo.get_file(file_id, x_account_id)
+    if not existing_file:
+        from app.core.exceptions import http_404
+        raise http_404(msg="File not found")
+    
+    is_locked, lock = await version_repo.check_file_locked(file_id, current_user.id)
+    if is_locked:
+        from app.core.exceptions import http_403
+        raise http_403(msg=f"File is locked by another user until {lock.locked_until}")
+    
+    storage_path = await blob_repo.store_direct_upload(
+        x_account_id,
+        storage_service,
+        data.size_bytes,
+        data.file_hash,
+        data.mime_type,
+        storage_key=data.storage_key,
+        upload_id=data.upload_id,
+        parts=[
+            {'PartNumber': part.part_number, 'ETag': part.etag}
+            for part in data.parts or []
+        ]
+    )
+    
+    version = await version_repo.create_version(
+        file_id=file_id,
+        storage_path=storage_path,
+        mime_type=data.mime_type,
+        size_bytes=data.size_bytes,
+        file_hash=data.file_hash,
+        comment=comment,
+        created_by=current_user.id
+    )
+    
+    await _make_current_version(existing_file, version, blob_repo)
+    return version
+
+
+@router.post(
+    "/{file_id}/versions/chunked",
+    response_model=ChunkedUploadOut,
+    dependencies=[Depends(require_permission("files", "update"))],
+    summary="Start a chunked version upload"
+)
+async def begin_chunked_version_upload(
+    file_id: str,
+    data: ChunkedUploadRequest,
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user),
+    dms_repo: DMSRepository = Depends(get_repository(DMSRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
+):
+    """
+    Send the chunk list of a new version (content-defined chunks, hashed with
+    SHA-256) and get back the chunks storage does not hold yet. PUT each of them
+    to /versions/chunked/{chunk_hash}, then call /versions/chunked/complete.
+    """
+    if not await dms_repo.get_file(file_id, x_account_id):
+        from app.core.exceptions import http_404
+        raise http_404(msg="File not found")
+    
+    return await blob_repo.begin_chunked_upload(
+        x_account_id, storage_service, data.size_bytes, data.file_hash,
+        [(chunk.hash, chunk.size_bytes) for chunk in data.chunks]
+    )
+
+
+@router.put(
+    "/{file_id}/versions/chunked/{chunk_hash}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    dependencies=[Depends(require_permission("files", "update"))],
+    summary="Upload one chunk of a chunked version upload"
+)
+async def upload_version_chunk(
+    file_id: str,
+    chunk_hash: str = Path(..., pattern=r'^[0-9a-f]{64}$'),
+    chunk: UploadFile = File(...),
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user),
+    dms_repo: DMSRepository = Depends(get_repository(DMSRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
+):
+    """Store a chunk; its content must match chunk_hash"""
+    if not await dms_repo.get_file(file_id, x_account_id):
+        from app.core.exceptions import http_404
+        raise http_404(msg="File not found")
+    
+    await blob_repo.store_chunk(x_account_id, storage_service, chunk, chunk_hash)
+
+
+@router.post(
+    "/{file_id}/versions/chunked/complete",
+    response_model=FileVersionOut,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_permission("files", "update"))],
+    summary="Finish a chunked version upload"
+)
+async def complete_chunked_version_upload(
+    file_id: str,
+    data: ChunkedUploadRequest,
+    comment: Optional[str] = Query(None),
+    x_account_id: str = Header(...),
+    current_user: TokenData = Depends(get_current_user),
+    dms_repo: DMSRepository = Depends(get_repository(DMSRepository)),
+    version_repo: VersioningRepository = Depends(get_repository(VersioningRepository)),
+    blob_repo: BlobRepository = Depends(get_repository(BlobRepository))
+):
+    """Verify the reassembled content (SHA-256) and create the version record"""
+    existing_file = await dms_repo.get_file(file_id, x_account_id)
+    if not existing_file:
+        from app.core.exceptions import http_404
+        raise http_404(msg="File not found")
+    
+    is_locked, lock = await version_repo.check_file_locked(file_id, current_user.id)
+    if is_locked:
+        from app.core.exceptions import http_403
+        raise http_403(msg=f"File is locked by another user until {lock.locked_until}")
+    
+    storage_path = await blob_repo.complete_chunked_upload(
+        x_account_id,
+        storage_service,
+        data.size_bytes,
+        data.file_hash,
+        data.mime_type,
+        [(chunk.hash, chunk.size_bytes) for chunk in data.chunks]
+    )
+    
+    version = await version_repo.create_version(
+        file_id=file_id,
+        storage_path=storage_path,
+        mime_type=data.mime_type,
+        size_bytes=data.size_bytes,
+        file_hash=data.file_hash,
+        comment=comment,
+        created_by=current_user.id
+    )
+    
+    await _make_current_version(existing_file, version, blob_repo)
     return version
 
 
@@ -120,24 +327,33 @@ async def get_version(
 async def download_version(
     file_id: str,
     version_id: str,
+    redirect: bool = Query(False, description="Redirect to a short-lived presigned storage URL (S3 backends only)"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
     current_user: TokenData = Depends(get_current_user),
     repository: VersioningRepository = Depends(get_repository(VersioningRepository))
 ):
-    """Download a specific version of a file"""
+    """Download a specific version of a file (streamed, supports Range requests)"""
     version = await repository.get_version(version_id)
     if not version or version.file_id != file_id:
         from app.core.exceptions import http_404
         raise http_404(msg="Version not found")
     
-    # Download from S3
-    content = await storage_service.download_file(version.storage_path)
+    filename = f"v{version.version_number}_{version.file.original_filename}"
+    if redirect and storage_service.can_presign(version.storage_path):
+        return await redirect_to_storage(
+            storage_service, version.storage_path, version.mime_type, filename
+        )
     
-    return Response(
-        content=content,
-        media_type=version.mime_type or 'application/octet-stream',
-        headers={
-            'Content-Disposition': f'attachment; filename="v{version.version_number}_{version.file.original_filename}"'
-        }
+    # Stream from S3, honoring Range/If-Range
+    return await stream_storage_object(
+        storage_service,
+        version.storage_path,
+        media_type=version.mime_type,
+        filename=filename,
+        range_header=range_header,
+        if_range=if_range,
+        cache_version=version.file_hash
     )
 
 
@@ -160,7 +376,13 @@ async def restore_version(
         from app.core.exceptions import http_403
         raise http_403(msg=f"File is locked by another user until {lock.locked_until}")
     
-    return await repository.restore_version(file_id, version_id)
+    version, reclaimed = await repository.restore_version(file_id, version_id)
+    await repository.session.commit()
+    
+    # Content nothing references any more goes only once the restore is committed
+    if reclaimed:
+        await storage_service.delete_files(reclaimed)
+    return version
 
 
 # ==================== FILE LOCKS ====================
@@ -1,8 +1,8 @@
 from typing import Dict, List, Optional, Union
 from uuid import UUID
 
-from fastapi import APIRouter, status, File, UploadFile, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, status, File, UploadFile, Depends, Header
+from fastapi.responses import Response
 from sqlalchemy.engine import Row
 
 from app.api.dependencies.auth_utils import get_current_user
@@ -95,23 +95,27 @@ async def upload(
 )
 async def download(
     file_name: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
     repository: DocumentRepository = Depends(DocumentRepository),
     metadata_repository: DocumentMetadataRepository = Depends(
         get_repository(DocumentMetadataRepository)
     ),
     user: TokenData = Depends(get_current_user),
-) -> object:
+) -> Response:
     """
-    Downloads a document with the specified file name.
+    Streams a document with the specified file name to the client.
 
     Args:
         file_name (str): The name of the file to be downloaded.
+        range_header (Optional[str]): HTTP Range header for partial downloads.
+        if_range (Optional[str]): HTTP If-Range header.
         repository (DocumentRepository): The repository for managing documents.
         metadata_repository (DocumentMetadataRepository): The repository for managing document metadata.
         user (TokenData): The token data of the authenticated user.
 
     Returns:
-        object: The downloaded document.
+        Response: The document content as an attachment.
 
     Raises:
         HTTP_400: If no file name is provided.
@@ -124,13 +128,13 @@ async def download(
         get_document_metadata = dict(
             await metadata_repository.get(document=file_name, owner=user)
         )
-
-        return await repository.download(
-            s3_url=get_document_metadata["s3_url"], name=get_document_metadata["name"]
-        )
     except Exception as e:
         raise http_404(msg=f"No file with {file_name}") from e
 
+    return await repository.download(
+        document=get_document_metadata, range_header=range_header, if_range=if_range
+    )
+
 
 @router.delete(
     "/{file_name}", status_code=status.HTTP_204_NO_CONTENT, name="add_to_bin"
@@ -283,28 +287,32 @@ async def empty_trash(
 
 @router.get(
     "/preview/{document}",
-    status_code=status.HTTP_204_NO_CONTENT,
+    status_code=status.HTTP_200_OK,
     name="preview_document",
 )
 async def get_document_preview(
     document: Union[str, UUID],
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
     repository: DocumentRepository = Depends(DocumentRepository),
     metadata_repository: DocumentMetadataRepository = Depends(
         get_repository(DocumentMetadataRepository)
     ),
     user: TokenData = Depends(get_current_user),
-) -> FileResponse:
+) -> Response:
     """
     Get the preview of a document.
 
     Args:
         document (Union[str, UUID]): The ID or name of the document.
+        range_header (Optional[str]): HTTP Range header, used by PDF viewers to fetch pages.
+        if_range (Optional[str]): HTTP If-Range header.
         repository (DocumentRepository): The repository for accessing document data.
         metadata_repository (DocumentMetadataRepository): The repository for accessing document metadata.
         user (TokenData): The user token data.
 
     Returns:
-        FileResponse: The file response containing the document preview.
+        Response: The document content streamed inline.
 
     Raises:
         HTTP_404: If the document ID or name is not provided or if the document does not exist.
@@ -317,7 +325,9 @@ async def get_document_preview(
         get_document_metadata = dict(
             await metadata_repository.get(document=document, owner=user)
         )
-        return await repository.preview(document=get_document_metadata)
+        return await repository.preview(
+            document=get_document_metadata, range_header=range_header, if_range=if_range
+        )
     except TypeError as e:
         raise http_404(msg="Document does not exists.") from e
     except ValueError as e:
@@ -42,7 +42,7 @@ async def update_my_profile(
         if value is not None:
             setattr(current_user, key, value)
     
-    await db.commit()
+    await db.flush()
     await db.refresh(current_user)
     
     return ProfileSettingsOut(
@@ -92,6 +92,6 @@ async def update_notification_preferences(
     ).values(notification_preferences=json.dumps(data.preferences))
     
     await db.execute(stmt)
-    await db.commit()
+    await db.flush()
     
     return {"message": "Notification preferences updated", "preferences": data.preferences}
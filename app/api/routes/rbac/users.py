@@ -85,7 +85,7 @@ async def create_user(
     )
     
     session.add(new_user)
-    await session.commit()
+    await session.flush()
     await session.refresh(new_user)
     
     return new_user
@@ -121,7 +121,7 @@ async def update_user(
     if is_active is not None:
         user.is_active = is_active
     
-    await session.commit()
+    await session.flush()
     await session.refresh(user)
     return user
 
@@ -200,7 +200,7 @@ async def activate_user(
         raise http_404(msg="User not found")
     
     user.is_active = True
-    await session.commit()
+    await session.flush()
     return {"message": "User activated successfully"}
 
 
@@ -227,7 +227,7 @@ async def deactivate_user(
         raise http_400(msg="Cannot deactivate super admin")
     
     user.is_active = False
-    await session.commit()
+    await session.flush()
     return {"message": "User deactivated successfully"}
 
 
@@ -259,5 +259,5 @@ async def reset_user_password(
     user.password = get_hashed_password(data.new_password)
     user.password_changed_at = datetime.utcnow()
     
-    await session.commit()
+    await session.flush()
     return {"message": "Password reset successfully"}
@@ -26,6 +26,25 @@ class GlobalConfig(BaseSettings):
     postgres_port: int = int(os.environ.get("POSTGRES_PORT"))
     postgres_db: str = os.environ.get("POSTGRES_DB")
     db_echo_log: bool = str(os.environ.get("DEBUG", "False")).lower() == "true"
+    # connection pool: DB_POOL_SIZE persistent connections plus up to DB_MAX_OVERFLOW
+    # extra ones under load; checkouts give up after DB_POOL_TIMEOUT seconds
+    db_pool_size: int = int(os.environ.get("DB_POOL_SIZE", 10))
+    db_max_overflow: int = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+    db_pool_timeout: int = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+    db_pool_recycle: int = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    db_pool_pre_ping: bool = (
+        str(os.environ.get("DB_POOL_PRE_PING", "True")).lower() == "true"
+    )
+    # compiled-statement cache (SQLAlchemy) and prepared-statement cache (asyncpg)
+    db_query_cache_size: int = int(os.environ.get("DB_QUERY_CACHE_SIZE", 1200))
+    db_prepared_statement_cache_size: int = int(
+        os.environ.get("DB_PREPARED_STATEMENT_CACHE_SIZE", 100)
+    )
+    # optional read replica: GET requests and read-only repository calls use it;
+    # clients stay on the primary for DB_REPLICA_STICKY_SECONDS after a write
+    replica_hostname: str = os.environ.get("DATABASE_REPLICA_HOSTNAME", "")
+    replica_port: int = int(os.environ.get("DATABASE_REPLICA_PORT", os.environ.get("POSTGRES_PORT")))
+    db_replica_sticky_seconds: int = int(os.environ.get("DB_REPLICA_STICKY_SECONDS", 10))
     # s3 / minio configurations
     aws_access_key_id: str = os.environ.get("AWS_ACCESS_KEY_ID")
     aws_secret_key: str = os.environ.get("AWS_SECRET_ACCESS_KEY")
@@ -35,6 +54,73 @@ class GlobalConfig(BaseSettings):
     s3_endpoint_url: str = os.environ.get("S3_ENDPOINT_URL")
     s3_bucket: str = os.environ.get("S3_BUCKET")
     s3_test_bucket: str = os.environ.get("S3_TEST_BUCKET")
+    # storage backend: "s3" (S3/MinIO) or "local" (files under STORAGE_LOCAL_ROOT)
+    storage_backend: str = os.environ.get("STORAGE_BACKEND", "s3").lower()
+    storage_local_root: str = os.environ.get("STORAGE_LOCAL_ROOT", "/app/storage")
+    # uploads are streamed in parts of this size (S3 requires >= 5 MiB per part)
+    s3_upload_part_size: int = int(
+        os.environ.get("S3_UPLOAD_PART_SIZE", 8 * 1024 * 1024)
+    )
+    # large uploads send up to S3_UPLOAD_CONCURRENCY parts at once, holding at most
+    # S3_UPLOAD_MAX_BUFFER bytes of parts in memory
+    s3_upload_concurrency: int = int(os.environ.get("S3_UPLOAD_CONCURRENCY", 8))
+    s3_upload_max_buffer: int = int(
+        os.environ.get("S3_UPLOAD_MAX_BUFFER", 256 * 1024 * 1024)
+    )
+    # downloads are streamed to the client in chunks of this size
+    s3_download_chunk_size: int = int(
+        os.environ.get("S3_DOWNLOAD_CHUNK_SIZE", 1024 * 1024)
+    )
+    # storage I/O runs on a bounded thread pool, sized with the HTTP connection pool
+    s3_io_workers: int = int(os.environ.get("S3_IO_WORKERS", 32))
+    s3_max_pool_connections: int = int(os.environ.get("S3_MAX_POOL_CONNECTIONS", 50))
+    s3_tcp_keepalive: bool = (
+        str(os.environ.get("S3_TCP_KEEPALIVE", "True")).lower() == "true"
+    )
+    # shared S3 client timeouts (seconds) and retry policy ("standard" or "adaptive")
+    s3_connect_timeout: int = int(os.environ.get("S3_CONNECT_TIMEOUT", 5))
+    s3_read_timeout: int = int(os.environ.get("S3_READ_TIMEOUT", 60))
+    s3_max_attempts: int = int(os.environ.get("S3_MAX_ATTEMPTS", 5))
+    s3_retry_mode: str = os.environ.get("S3_RETRY_MODE", "standard")
+    # direct-to-storage transfers: presigned URL lifetimes and the multipart cut-over
+    s3_presigned_upload_expires: int = int(os.environ.get("S3_PRESIGNED_UPLOAD_EXPIRES", 3600))
+    s3_presigned_download_expires: int = int(os.environ.get("S3_PRESIGNED_DOWNLOAD_EXPIRES", 300))
+    s3_direct_multipart_threshold: int = int(
+        os.environ.get("S3_DIRECT_MULTIPART_THRESHOLD", 64 * 1024 * 1024)
+    )
+    # local read-through cache for hot objects (disabled when STORAGE_CACHE_DIR is empty);
+    # the size bound applies per worker process
+    storage_cache_dir: str = os.environ.get("STORAGE_CACHE_DIR", "")
+    storage_cache_max_bytes: int = int(
+        os.environ.get("STORAGE_CACHE_MAX_BYTES", 1024 * 1024 * 1024)
+    )
+    storage_cache_max_object_bytes: int = int(
+        os.environ.get("STORAGE_CACHE_MAX_OBJECT_BYTES", 64 * 1024 * 1024)
+    )
+    # ZIP export: objects fetched ahead of the writer, and the size limit for full read-ahead
+    zip_prefetch_count: int = int(os.environ.get("ZIP_PREFETCH_COUNT", 4))
+    zip_prefetch_max_bytes: int = int(
+        os.environ.get("ZIP_PREFETCH_MAX_BYTES", 8 * 1024 * 1024)
+    )
+    # ZIP import and multi-file uploads: members/files hashed and uploaded concurrently
+    zip_ingest_workers: int = int(os.environ.get("ZIP_INGEST_WORKERS", 8))
+    # chunked storage: large API uploads are split into content-defined chunks of
+    # about this average size, each stored once, so new versions only add changed chunks
+    storage_chunking: bool = (
+        str(os.environ.get("STORAGE_CHUNKING", "False")).lower() == "true"
+    )
+    storage_chunk_size: int = int(os.environ.get("STORAGE_CHUNK_SIZE", 1024 * 1024))
+    storage_chunk_workers: int = int(os.environ.get("STORAGE_CHUNK_WORKERS", 8))
+    # thumbnails/previews: originals larger than this are not rendered
+    rendition_max_source_bytes: int = int(
+        os.environ.get("RENDITION_MAX_SOURCE_BYTES", 50 * 1024 * 1024)
+    )
+    # document IDs reserved per worker and account at a time
+    document_id_block_size: int = int(os.environ.get("DOCUMENT_ID_BLOCK_SIZE", 100))
+    # recycle bin purge: files deleted (and committed) per chunk
+    purge_batch_size: int = int(os.environ.get("PURGE_BATCH_SIZE", 500))
+    # search: matches counted per query at most (the response's total stops there)
+    search_count_limit: int = int(os.environ.get("SEARCH_COUNT_LIMIT", 1000))
     # user config
     access_token_expire_min: int = os.environ.get("ACCESS_TOKEN_EXPIRE_MIN")
     refresh_token_expire_min: int = os.environ.get("REFRESH_TOKEN_EXPIRE_MIN")
@@ -61,5 +147,12 @@ class GlobalConfig(BaseSettings):
             f"{self.postgres_hostname}:{self.postgres_port}/{self.postgres_db}"
         )
 
+    @property
+    def async_replica_database_url(self) -> str:
+        return (
+            f"postgresql+asyncpg://{self.postgres_user}:{self.postgres_password}@"
+            f"{self.replica_hostname}:{self.replica_port}/{self.postgres_db}"
+        )
+
 
 settings = GlobalConfig()
@@ -0,0 +1,92 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.db.models import async_engine
+from app.db.tables.dms.document_ids import DocumentIdCounter
+
+# Crockford base32: no I, L, O or U, so IDs read back unambiguously
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+DOCUMENT_ID_PREFIX = "DOC-"
+# Digits before the check character; longer once an account passes 32**6 documents
+MIN_DIGITS = 6
+
+
+def check_character(digits: str) -> str:
+    """Luhn mod 32 check character: catches any single mistyped character and most swapped neighbours"""
+    total = 0
+    factor = 2
+    for char in reversed(digits):
+        addend = factor * ALPHABET.index(char)
+        total += addend // 32 + addend % 32
+        factor = 3 - factor
+    return ALPHABET[-total % 32]
+
+
+def format_document_id(value: int) -> str:
+    """DOC-XXXXXXC: the counter value in base32 followed by its check character"""
+    digits = ""
+    while value:
+        value, remainder = divmod(value, 32)
+        digits = ALPHABET[remainder] + digits
+    digits = digits.rjust(MIN_DIGITS, "0")
+    return f"{DOCUMENT_ID_PREFIX}{digits}{check_character(digits)}"
+
+
+def is_valid_document_id(document_id: str) -> bool:
+    """Whether a document ID has this format and a matching check character"""
+    if not document_id.startswith(DOCUMENT_ID_PREFIX):
+        return False
+    body = document_id[len(DOCUMENT_ID_PREFIX):].upper()
+    if len(body) <= MIN_DIGITS or any(char not in ALPHABET for char in body):
+        return False
+    return check_character(body[:-1]) == body[-1]
+
+
+class DocumentIdAllocator:
+    """
+    Hands out document IDs from per-account blocks reserved on the
+    document_id_counters row. A block is reserved in its own short
+    transaction on the primary, so the counter row is never locked for the
+    length of an upload; values of a block left unused when a worker stops
+    are simply skipped.
+    """
+
+    def __init__(self, engine, block_size: int):
+        self.engine = engine
+        self.block_size = max(block_size, 1)
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    async def allocate(self, account_id: str, count: int = 1) -> List[str]:
+        """count new document IDs for an account"""
+        values = []
+        async with self._locks.setdefault(account_id, asyncio.Lock()):
+            while len(values) < count:
+                next_value, end = self._blocks.get(account_id, (0, 0))
+                if next_value >= end:
+                    next_value, end = await self._reserve(account_id, max(self.block_size, count - len(values)))
+                take = min(end - next_value, count - len(values))
+                values.extend(range(next_value, next_value + take))
+                self._blocks[account_id] = (next_value + take, end)
+        return [format_document_id(value) for value in values]
+
+    async def _reserve(self, account_id: str, size: int) -> Tuple[int, int]:
+        """Reserve the next size values of the account's counter; returns [start, end)"""
+        stmt = insert(DocumentIdCounter).values(
+            account_id=account_id,
+            next_value=1 + size
+        ).on_conflict_do_update(
+            index_elements=[DocumentIdCounter.account_id],
+            set_={"next_value": DocumentIdCounter.next_value + size}
+        ).returning(DocumentIdCounter.next_value)
+
+        async with self.engine.begin() as connection:
+            end = (await connection.execute(stmt)).scalar_one()
+        return end - size, end
+
+
+# Singleton instance
+document_id_allocator = DocumentIdAllocator(async_engine, settings.document_id_block_size)
@@ -1,32 +1,44 @@
 import logging
 
-from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 from app.core.exceptions import http_500
+from app.db.pool import MeteredQueuePool
+from app.db.routing import RoutingSession
 
 logger = logging.getLogger("sqlalchemy")
 
-engine = create_engine(
-    url=settings.sync_database_url,
-    echo=settings.db_echo_log,
-)
+def _create_engine(url: str):
+    return create_async_engine(
+        url=url,
+        echo=settings.db_echo_log,
+        poolclass=MeteredQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        # compiled SQL is cached per statement shape, so queries are not recompiled per request
+        query_cache_size=settings.db_query_cache_size,
+        # asyncpg prepared statements per connection (0 behind pgbouncer in transaction mode)
+        connect_args={"prepared_statement_cache_size": settings.db_prepared_statement_cache_size},
+    )
 
-async_engine = create_async_engine(
-    url=settings.async_database_url,
-    echo=settings.db_echo_log,
-    query_cache_size=0,
-)
 
-session = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+async_engine = _create_engine(settings.async_database_url)
+
+# Optional read replica, used by sessions marked read-only (see app.db.routing)
+replica_engine = _create_engine(settings.async_replica_database_url) if settings.replica_hostname else None
 
 async_session = sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    replica_bind=replica_engine.sync_engine if replica_engine else None,
     autocommit=False,
     autoflush=False,
     expire_on_commit=False,
@@ -38,11 +50,17 @@ metadata = Base.metadata
 
 async def check_tables():
     try:
-        with Session(engine) as _session:
+        async with async_engine.begin() as connection:
             # Create tables
-            metadata.create_all(engine)
-            _session.commit()
+            await connection.run_sync(metadata.create_all)
             logger.info("Tables created if they didn't already exist.")
     except OperationalError as e:
         logger.error("Error Creating table: %s", e)
         raise http_500(msg="An error occurred while creating tables.") from e
+
+
+def pool_stats() -> dict:
+    """Live checkout/wait/overflow numbers of the application connection pools"""
+    if replica_engine is None:
+        return async_engine.pool.stats()
+    return {"primary": async_engine.pool.stats(), "replica": replica_engine.pool.stats()}
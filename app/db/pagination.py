@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import http_400
+
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(list):
+    """A page of rows; next_cursor is None on the last page"""
+
+    def __init__(self, items=(), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor from the sort key values of the last row of a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence) -> List[Any]:
+    """Sort key values of a cursor, typed like the key columns"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(keys):
+            raise ValueError("wrong number of values")
+        return [
+            datetime.fromisoformat(value) if isinstance(key.type, DateTime) else value
+            for key, value in zip(keys, values)
+        ]
+    except (ValueError, TypeError):
+        raise http_400(msg="Invalid cursor")
+
+
+async def paginate(session: AsyncSession, stmt, keys: Sequence, cursor: Optional[str] = None,
+                   skip: int = 0, limit: int = 100, descending: bool = True) -> Page:
+    """
+    Run a select of ORM rows one page at a time, ordered by keys (the last one
+    unique, e.g. the ULID id). With a cursor the page starts right after the
+    row it was made from, so a deep page costs the same as the first one;
+    without one, skip/limit offset paging still works. The next cursor is
+    returned either way.
+    """
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        if descending:
+            stmt = stmt.where(tuple_(*keys) < tuple_(*values))
+        else:
+            stmt = stmt.where(tuple_(*keys) > tuple_(*values))
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    stmt = stmt.order_by(*[key.desc() if descending else key.asc() for key in keys])
+    # One extra row tells whether there is a next page
+    result = await session.execute(stmt.limit(limit + 1))
+    rows = result.scalars().all()
+
+    if len(rows) <= limit:
+        return Page(rows)
+    rows = rows[:limit]
+    return Page(rows, encode_cursor([getattr(rows[-1], key.key) for key in keys]))
+
+
+def set_next_cursor(response, page: Page):
+    """Expose the next cursor of a list endpoint as a response header"""
+    if page.next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
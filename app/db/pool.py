@@ -0,0 +1,55 @@
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Connection pool that records how long checkouts wait for a connection,
+    how often they time out and how far it overflows, so DB_POOL_SIZE and
+    DB_MAX_OVERFLOW can be tuned from live numbers.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "overflow_max": 0,
+        }
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._metrics_lock:
+                self._metrics["checkouts"] += 1
+                self._metrics["timeouts"] += timed_out
+                self._metrics["wait_seconds_total"] += waited
+                self._metrics["wait_seconds_max"] = max(self._metrics["wait_seconds_max"], waited)
+                self._metrics["overflow_max"] = max(self._metrics["overflow_max"], self.overflow())
+
+    def stats(self) -> dict:
+        """Current pool occupancy plus checkout/wait/overflow counters"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": self.overflow(),
+            **metrics,
+            "wait_seconds_avg": metrics["wait_seconds_total"] / metrics["checkouts"] if metrics["checkouts"] else 0.0,
+        }
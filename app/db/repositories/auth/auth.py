@@ -67,7 +67,7 @@ class AuthRepository:
         new_user.password_changed_at = datetime.utcnow()
 
         self.session.add(new_user)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(new_user)
 
         return new_user
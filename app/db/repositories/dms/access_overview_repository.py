@@ -10,12 +10,14 @@ from app.db.tables.dms.sections import Section
 from app.db.tables.rbac.models import Role, Group, Permission, user_roles, user_groups, group_roles
 from app.db.tables.auth.auth import User
 from app.schemas.dms.sharing_schemas import UserAccessItem, ResourceAccessItem
+from app.db.routing import read_only
 
 
 class AccessOverviewRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
     
+    @read_only
     async def get_user_access(
         self,
         account_id: str,
@@ -79,6 +81,7 @@ class AccessOverviewRepository:
         
         return access_items
     
+    @read_only
     async def get_resource_access(
         self,
         account_id: str,
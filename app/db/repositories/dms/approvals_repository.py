@@ -12,12 +12,15 @@ from app.db.tables.dms.approvals import (
 )
 from app.db.tables.dms.files import FileNew
 from app.db.tables.dms.folders_new import FolderNew
+from app.db.tables.dms.folder_closure import FolderClosure
 from app.db.tables.auth.auth import User
 from app.schemas.dms.schemas import (
     ApprovalWorkflowCreate, ApprovalDecision,
     FolderApprovalRuleCreate, FolderApprovalRuleUpdate,
     NotificationSettingsCreate, NotificationSettingsUpdate
 )
+from app.db.routing import read_only
+from app.db.pagination import Page, paginate
 
 
 class ApprovalsRepository:
@@ -57,7 +60,7 @@ class ApprovalsRepository:
             )
             self.session.add(step)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(workflow)
         
         # Create notifications for approvers
@@ -77,9 +80,10 @@ class ApprovalsRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
+    @read_only
     async def list_workflows(self, file_id: Optional[str] = None, status: Optional[str] = None,
-                           skip: int = 0, limit: int = 100) -> List[ApprovalWorkflow]:
-        """List workflows with filters"""
+                           skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        """List workflows with filters, newest first, paged by offset or cursor"""
         stmt = select(ApprovalWorkflow).options(
             selectinload(ApprovalWorkflow.steps).selectinload(ApprovalStep.approver),
             selectinload(ApprovalWorkflow.file),
@@ -95,9 +99,8 @@ class ApprovalsRepository:
         if conditions:
             stmt = stmt.where(and_(*conditions))
         
-        stmt = stmt.order_by(ApprovalWorkflow.created_at.desc()).offset(skip).limit(limit)
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return await paginate(self.session, stmt, (ApprovalWorkflow.created_at, ApprovalWorkflow.id),
+                              cursor, skip, limit)
     
     async def get_my_pending_approvals(self, user_id: str, skip: int = 0, limit: int = 100) -> List[ApprovalStep]:
         """Get pending approval steps for a user"""
@@ -181,7 +184,7 @@ class ApprovalsRepository:
         # Update workflow status
         await self._update_workflow_status(step.workflow)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(step)
         
         # Create notifications
@@ -232,7 +235,7 @@ class ApprovalsRepository:
             if step.status == StepStatus.pending:
                 step.status = StepStatus.skipped
         
-        await self.session.commit()
+        await self.session.flush()
     
     # ==================== FOLDER APPROVAL RULES ====================
     
@@ -266,7 +269,7 @@ class ApprovalsRepository:
             )
             self.session.add(approver)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(rule)
         
         return rule
@@ -335,7 +338,7 @@ class ApprovalsRepository:
                 )
                 self.session.add(approver)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(rule)
         
         return rule
@@ -347,52 +350,20 @@ class ApprovalsRepository:
             raise http_404(msg="Folder rule not found")
         
         await self.session.delete(rule)
-        await self.session.commit()
+        await self.session.flush()
     
     async def get_applicable_rule(self, folder_id: str) -> Optional[FolderApprovalRule]:
         """Get applicable rule for a folder (including parent folders if apply_to_subfolders is true)"""
-        # Get folder with parent chain
-        stmt = select(FolderNew).where(FolderNew.id == folder_id)
+        # The folder's own rule, else the nearest ancestor rule that applies to subfolders
+        stmt = select(FolderApprovalRule).join(
+            FolderClosure, FolderClosure.ancestor_id == FolderApprovalRule.folder_id
+        ).where(
+            FolderClosure.descendant_id == folder_id,
+            FolderApprovalRule.is_active == True,
+            or_(FolderClosure.depth == 0, FolderApprovalRule.apply_to_subfolders == True)
+        ).order_by(FolderClosure.depth).limit(1).options(selectinload(FolderApprovalRule.approvers))
         result = await self.session.execute(stmt)
-        folder = result.scalar_one_or_none()
-        
-        if not folder:
-            return None
-        
-        # Check current folder
-        stmt = select(FolderApprovalRule).where(
-            FolderApprovalRule.folder_id == folder_id,
-            FolderApprovalRule.is_active == True
-        ).options(selectinload(FolderApprovalRule.approvers))
-        result = await self.session.execute(stmt)
-        rule = result.scalar_one_or_none()
-        
-        if rule:
-            return rule
-        
-        # Check parent folders with apply_to_subfolders
-        current_folder = folder
-        while current_folder.parent_folder_id:
-            stmt = select(FolderApprovalRule).where(
-                FolderApprovalRule.folder_id == current_folder.parent_folder_id,
-                FolderApprovalRule.is_active == True,
-                FolderApprovalRule.apply_to_subfolders == True
-            ).options(selectinload(FolderApprovalRule.approvers))
-            result = await self.session.execute(stmt)
-            rule = result.scalar_one_or_none()
-            
-            if rule:
-                return rule
-            
-            # Get parent folder
-            stmt = select(FolderNew).where(FolderNew.id == current_folder.parent_folder_id)
-            result = await self.session.execute(stmt)
-            current_folder = result.scalar_one_or_none()
-            
-            if not current_folder:
-                break
-        
-        return None
+        return result.scalar_one_or_none()
     
     async def auto_create_workflow_for_file(self, file_id: str, folder_id: str, initiated_by: str) -> Optional[ApprovalWorkflow]:
         """Auto-create workflow based on folder rules"""
@@ -423,7 +394,7 @@ class ApprovalsRepository:
             )
             self.session.add(step)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(workflow)
         
         # Create notifications
@@ -461,7 +432,7 @@ class ApprovalsRepository:
             )
             self.session.add(settings)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(settings)
         
         return settings
@@ -487,7 +458,7 @@ class ApprovalsRepository:
         )
         
         self.session.add(notification)
-        await self.session.commit()
+        await self.session.flush()
     
     async def _create_approval_notifications(self, workflow: ApprovalWorkflow):
         """Create notifications when workflow is created"""
@@ -547,6 +518,7 @@ class ApprovalsRepository:
                     )
                     break
     
+    @read_only
     async def list_notifications(self, user_id: str, is_read: Optional[bool] = None,
                                 skip: int = 0, limit: int = 100) -> List[Notification]:
         """List user notifications"""
@@ -574,7 +546,7 @@ class ApprovalsRepository:
         notification.is_read = True
         notification.read_at = datetime.utcnow()
         
-        await self.session.commit()
+        await self.session.flush()
     
     async def mark_all_notifications_read(self, user_id: str):
         """Mark all notifications as read"""
@@ -587,7 +559,7 @@ class ApprovalsRepository:
         )
         
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     async def get_unread_count(self, user_id: str) -> int:
         """Get count of unread notifications"""
@@ -5,6 +5,8 @@ from datetime import datetime
 
 from app.db.tables.dms.audit import AuditLog
 from app.schemas.dms.sharing_schemas import AuditLogQuery
+from app.db.routing import read_only
+from app.db.pagination import Page, paginate
 
 
 class AuditRepository:
@@ -37,16 +39,17 @@ class AuditRepository:
         )
         
         self.session.add(log)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(log)
         return log
     
+    @read_only
     async def query_logs(
         self,
         account_id: str,
         query: AuditLogQuery
-    ) -> List[AuditLog]:
-        """Query audit logs with filters"""
+    ) -> Page:
+        """Query audit logs with filters, newest first, paged by offset or cursor"""
         stmt = select(AuditLog).where(AuditLog.account_id == account_id)
         
         # Apply filters
@@ -63,12 +66,8 @@ class AuditRepository:
         if query.resource_id:
             stmt = stmt.where(AuditLog.resource_id == query.resource_id)
         
-        # Order and paginate
-        stmt = stmt.order_by(AuditLog.created_at.desc())
-        stmt = stmt.offset(query.skip).limit(query.limit)
-        
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return await paginate(self.session, stmt, (AuditLog.created_at, AuditLog.id),
+                              query.cursor, query.skip, query.limit)
     
     async def get_resource_history(
         self,
@@ -0,0 +1,838 @@
+import asyncio
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import UploadFile
+
+from app.api.dependencies.repositories import get_ulid
+from app.core.config import settings
+from app.core.exceptions import http_400
+from app.db.tables.dms.blobs import StorageBlob, StorageBlobChunk
+from app.db.tables.dms.files import FileNew
+from app.db.tables.dms.folders_new import FolderNew
+from app.db.tables.dms.folder_closure import FolderClosure
+from app.db.tables.dms.versioning import FileVersion
+from app.db.tables.dms.inbox import InboxEntry, InboxAttachment
+from app.logs.logger import docflow_logger
+from app.services.chunking import MANIFEST_PREFIX, is_manifest
+from app.services.renditions import rendition_keys, supports_renditions
+
+
+class BlobRepository:
+    """
+    Content-addressed blob store. Objects are keyed by SHA-256 per account and
+    shared by files, versions and inbox attachments through a reference count.
+    Reference changes are flushed with the caller's transaction, not committed here.
+    """
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    @staticmethod
+    def blob_path(account_id: str, file_hash: str) -> str:
+        """Storage key for a blob"""
+        return f"blobs/{account_id}/{file_hash[:2]}/{file_hash}"
+    
+    @staticmethod
+    def manifest_path(account_id: str, file_hash: str) -> str:
+        """Storage key of the chunk manifest of a blob stored in chunks"""
+        return f"{MANIFEST_PREFIX}{account_id}/{file_hash[:2]}/{file_hash}"
+    
+    async def get_blob(self, account_id: str, file_hash: str) -> Optional[StorageBlob]:
+        """Get blob by content hash"""
+        stmt = select(StorageBlob).where(
+            StorageBlob.account_id == account_id,
+            StorageBlob.file_hash == file_hash
+        )
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+    
+    async def add_reference(self, account_id: str, file_hash: str, size_bytes: int = 0,
+                            mime_type: Optional[str] = None) -> Tuple[str, int]:
+        """
+        Take one reference on a blob, creating the row if needed.
+        Returns: (storage_path, ref_count after the increment)
+        """
+        stmt = insert(StorageBlob).values(
+            account_id=account_id,
+            file_hash=file_hash,
+            storage_path=self.blob_path(account_id, file_hash),
+            size_bytes=size_bytes,
+            mime_type=mime_type,
+            ref_count=1
+        ).on_conflict_do_update(
+            constraint="uq_blob_account_hash",
+            set_={"ref_count": StorageBlob.ref_count + 1, "updated_at": func.now()}
+        ).returning(StorageBlob.storage_path, StorageBlob.ref_count)
+        
+        result = await self.session.execute(stmt)
+        storage_path, ref_count = result.one()
+        return storage_path, ref_count
+    
+    async def store_upload(
+        self,
+        account_id: str,
+        file: UploadFile,
+        storage_service,
+        size_bytes: Optional[int] = None,
+        file_hash: Optional[str] = None
+    ) -> Tuple[int, str, str]:
+        """
+        Store an upload in the blob store and take a reference on it.
+        The content is hashed locally first, so content the account already
+        holds costs no PUT at all.
+        Returns: (size_bytes, file_hash, storage_path)
+        """
+        if file_hash is None:
+            size_bytes, file_hash = await storage_service.hash_file(file)
+        
+        # Large content the account does not hold yet is stored as deduplicated chunks
+        if settings.storage_chunking and size_bytes > storage_service.chunker.max_size:
+            if not await self.get_blob(account_id, file_hash):
+                storage_path = await self.store_chunked_upload(account_id, file, storage_service)
+                return size_bytes, file_hash, storage_path
+        
+        storage_path, ref_count = await self.add_reference(
+            account_id, file_hash, size_bytes, file.content_type
+        )
+        
+        # First reference (or a concurrent uploader has not finished yet): make sure the object exists
+        if ref_count == 1 or not await storage_service.file_exists(storage_path):
+            try:
+                await storage_service.upload_file_stream(file, storage_path)
+            except Exception:
+                await self.release(account_id, storage_path)
+                raise
+        
+        return size_bytes, file_hash, storage_path
+    
+    async def store_chunked_upload(self, account_id: str, file: UploadFile, storage_service) -> str:
+        """
+        Store an upload as content-defined chunks plus a manifest. Each distinct
+        chunk is uploaded only if the account does not hold it yet, so a new
+        version of a large file costs roughly the bytes that changed.
+        Returns: storage_path of the blob (a manifest, or existing content)
+        """
+        size_bytes, file_hash, chunks = await storage_service.chunk_file(file)
+        references = await self.add_references(
+            account_id, [(chunk_hash, size, None) for _, size, chunk_hash in chunks]
+        )
+        
+        first_span = {}
+        for offset, size, chunk_hash in chunks:
+            first_span.setdefault(chunk_hash, (offset, size))
+        
+        semaphore = asyncio.Semaphore(max(settings.storage_chunk_workers, 1))
+        read_lock = asyncio.Lock()
+        
+        async def ensure_stored(chunk_hash: str, offset: int, size: int):
+            storage_path, created = references[chunk_hash]
+            async with semaphore:
+                if created or not await storage_service.file_exists(storage_path):
+                    # The spooled upload has one file position: read ranges one at a time
+                    async with read_lock:
+                        data = await storage_service.read_file_range(file, offset, size)
+                    await storage_service.upload_bytes(storage_path, data)
+        
+        results = await asyncio.gather(
+            *[ensure_stored(chunk_hash, *span) for chunk_hash, span in first_span.items()],
+            return_exceptions=True
+        )
+        chunk_list = [(references[chunk_hash][0], size) for _, size, chunk_hash in chunks]
+        
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            keys = await self.release_paths(account_id, [path for path, _ in chunk_list], include_legacy=False)
+            await storage_service.delete_files(keys)
+            raise errors[0]
+        
+        return await self._add_manifest(
+            account_id, storage_service, file_hash, size_bytes, file.content_type, chunk_list
+        )
+    
+    async def _add_manifest(self, account_id: str, storage_service, file_hash: str, size_bytes: int,
+                            mime_type: Optional[str], chunks: List[Tuple[str, int]]) -> str:
+        """
+        Take a reference on the manifest blob for chunks that already carry one
+        reference per occurrence. If the content turns out to be stored already
+        (plain or chunked), the chunk references are given back and the existing
+        blob is used instead.
+        """
+        manifest_path = self.manifest_path(account_id, file_hash)
+        stmt = insert(StorageBlob).values(
+            account_id=account_id,
+            file_hash=file_hash,
+            storage_path=manifest_path,
+            size_bytes=size_bytes,
+            mime_type=mime_type,
+            ref_count=1
+        ).on_conflict_do_update(
+            constraint="uq_blob_account_hash",
+            set_={"ref_count": StorageBlob.ref_count + 1, "updated_at": func.now()}
+        ).returning(StorageBlob.id, StorageBlob.storage_path, StorageBlob.ref_count)
+        blob_id, storage_path, ref_count = (await self.session.execute(stmt)).one()
+        
+        if ref_count > 1 or storage_path != manifest_path:
+            keys = await self.release_paths(account_id, [path for path, _ in chunks], include_legacy=False)
+            await storage_service.delete_files(keys)
+            return storage_path
+        
+        rows = [
+            {"blob_id": blob_id, "position": position, "chunk_path": chunk_path, "size_bytes": size}
+            for position, (chunk_path, size) in enumerate(chunks)
+        ]
+        for start in range(0, len(rows), 1000):
+            await self.session.execute(insert(StorageBlobChunk).values(rows[start:start + 1000]))
+        
+        try:
+            await storage_service.put_manifest(manifest_path, file_hash, size_bytes, mime_type, chunks)
+        except Exception:
+            # Everything released here was referenced by this upload only, and the
+            # error rolls the transaction back, so the chunks can go right away
+            await storage_service.delete_files(await self.release(account_id, manifest_path))
+            raise
+        return manifest_path
+    
+    def _check_chunk_list(self, storage_service, size_bytes: int, chunks: List[Tuple[str, int]]):
+        """Validate a client's chunk list before any work is done"""
+        if not settings.storage_chunking:
+            raise http_400(msg="Chunked uploads are not enabled")
+        if size_bytes <= storage_service.chunker.max_size:
+            raise http_400(msg="Content is too small for a chunked upload")
+        max_size = storage_service.chunker.max_size
+        if sum(size for _, size in chunks) != size_bytes or any(size > max_size for _, size in chunks):
+            raise http_400(msg="Invalid chunk list")
+    
+    async def _stored_chunks(self, account_id: str, chunk_hashes: List[str]) -> Dict[str, Tuple[str, int]]:
+        """Chunks the account already holds: {chunk_hash: (storage_path, size_bytes)}"""
+        stored = {}
+        for start in range(0, len(chunk_hashes), 1000):
+            stmt = select(StorageBlob.file_hash, StorageBlob.storage_path, StorageBlob.size_bytes).where(
+                StorageBlob.account_id == account_id,
+                StorageBlob.file_hash.in_(chunk_hashes[start:start + 1000])
+            )
+            for chunk_hash, storage_path, size in (await self.session.execute(stmt)).all():
+                stored[chunk_hash] = (storage_path, size)
+        return stored
+    
+    async def begin_chunked_upload(self, account_id: str, storage_service, size_bytes: int,
+                                   file_hash: str, chunks: List[Tuple[str, int]]) -> dict:
+        """
+        Plan an upload in which the client sends only the chunks the account does
+        not hold yet. chunks: List of (chunk_hash, size_bytes) in content order.
+        """
+        self._check_chunk_list(storage_service, size_bytes, chunks)
+        response = {
+            "upload_required": False,
+            "missing_chunks": [],
+            "chunk_size": settings.storage_chunk_size,
+            "max_chunk_size": storage_service.chunker.max_size
+        }
+        
+        blob = await self.get_blob(account_id, file_hash)
+        if blob and blob.size_bytes == size_bytes:
+            return response
+        
+        stored = await self._stored_chunks(account_id, list({chunk_hash for chunk_hash, _ in chunks}))
+        response["upload_required"] = True
+        response["missing_chunks"] = list(dict.fromkeys(
+            chunk_hash for chunk_hash, _ in chunks if chunk_hash not in stored
+        ))
+        return response
+    
+    async def store_chunk(self, account_id: str, storage_service, file: UploadFile, chunk_hash: str):
+        """
+        Store one chunk of a chunked upload after checking its hash. The blob row
+        is created without a reference: the completing upload takes one, and
+        reconcile() reclaims chunks no upload ever completes.
+        """
+        size_bytes, actual_hash = await storage_service.hash_file(file)
+        if actual_hash != chunk_hash:
+            raise http_400(msg="Chunk content does not match its hash")
+        if size_bytes > storage_service.chunker.max_size:
+            raise http_400(msg="Chunk is too large")
+        
+        stmt = insert(StorageBlob).values(
+            account_id=account_id,
+            file_hash=chunk_hash,
+            storage_path=self.blob_path(account_id, chunk_hash),
+            size_bytes=size_bytes,
+            ref_count=0
+        ).on_conflict_do_update(
+            constraint="uq_blob_account_hash",
+            set_={"updated_at": func.now()}
+        ).returning(StorageBlob.storage_path)
+        storage_path = (await self.session.execute(stmt)).scalar_one()
+        
+        if not await storage_service.file_exists(storage_path):
+            await storage_service.upload_file_stream(file, storage_path)
+    
+    async def complete_chunked_upload(self, account_id: str, storage_service, size_bytes: int,
+                                      file_hash: str, mime_type: Optional[str],
+                                      chunks: List[Tuple[str, int]]) -> str:
+        """
+        Finish a chunked upload: check every chunk is stored, verify the SHA-256 of
+        the reassembled content (read back inside storage, not re-sent by the
+        client) and take references on the chunks and the manifest.
+        Returns: storage_path of the blob
+        """
+        self._check_chunk_list(storage_service, size_bytes, chunks)
+        
+        blob = await self.get_blob(account_id, file_hash)
+        if blob and blob.size_bytes == size_bytes:
+            storage_path, _ = await self.add_reference(account_id, file_hash, size_bytes, mime_type)
+            return storage_path
+        
+        stored = await self._stored_chunks(account_id, list({chunk_hash for chunk_hash, _ in chunks}))
+        if any(chunk_hash not in stored or stored[chunk_hash][1] != size for chunk_hash, size in chunks):
+            raise http_400(msg="Not all chunks have been uploaded")
+        
+        chunk_list = [(stored[chunk_hash][0], size) for chunk_hash, size in chunks]
+        if await storage_service.hash_chunks(chunk_list) != file_hash:
+            raise http_400(msg="Uploaded content does not match its hash")
+        
+        await self.add_references(account_id, [(chunk_hash, size, None) for chunk_hash, size in chunks])
+        return await self._add_manifest(
+            account_id, storage_service, file_hash, size_bytes, mime_type, chunk_list
+        )
+    
+    @staticmethod
+    def staging_path(account_id: str) -> str:
+        """Storage key a direct upload is sent to before it is verified"""
+        return f"uploads/{account_id}/{get_ulid()}"
+    
+    async def begin_direct_upload(self, account_id: str, storage_service, size_bytes: int,
+                                  file_hash: str, mime_type: Optional[str] = None) -> dict:
+        """
+        Prepare an upload that goes straight from the client to storage: a
+        presigned PUT, or a presigned multipart upload for large files. Content
+        the account already holds needs no upload at all.
+        """
+        if not storage_service.supports_presigned_urls:
+            raise http_400(msg="Direct uploads are not supported by the storage backend")
+        
+        expires_in = settings.s3_presigned_upload_expires
+        blob = await self.get_blob(account_id, file_hash)
+        if blob and blob.size_bytes == size_bytes and await storage_service.file_exists(blob.storage_path):
+            return {"upload_required": False, "expires_in": expires_in}
+        
+        storage_key = self.staging_path(account_id)
+        content_type = mime_type or 'application/octet-stream'
+        
+        if size_bytes <= settings.s3_direct_multipart_threshold:
+            url = await storage_service.get_upload_url(storage_key, content_type, file_hash, expires_in)
+            return {
+                "upload_required": True,
+                "storage_key": storage_key,
+                "url": url,
+                "expires_in": expires_in
+            }
+        
+        multipart = await storage_service.create_multipart_upload_urls(
+            storage_key, content_type, size_bytes, expires_in
+        )
+        return {
+            "upload_required": True,
+            "storage_key": storage_key,
+            "expires_in": expires_in,
+            **multipart
+        }
+    
+    async def store_direct_upload(
+        self,
+        account_id: str,
+        storage_service,
+        size_bytes: int,
+        file_hash: str,
+        mime_type: Optional[str] = None,
+        storage_key: Optional[str] = None,
+        upload_id: Optional[str] = None,
+        parts: Optional[List[dict]] = None
+    ) -> str:
+        """
+        Finalize an upload sent straight to storage and take a reference on its blob.
+        The staged object's size and SHA-256 are verified before it is copied into
+        the blob store (server side) and discarded. Without a storage_key the content
+        must already be in the account's blob store.
+        Returns: storage_path of the blob
+        """
+        if not storage_key:
+            blob = await self.get_blob(account_id, file_hash)
+            if not blob or blob.size_bytes != size_bytes:
+                raise http_400(msg="Content not found, upload required")
+            storage_path, _ = await self.add_reference(account_id, file_hash, size_bytes, mime_type)
+            return storage_path
+        
+        if not storage_key.startswith(f"uploads/{account_id}/"):
+            raise http_400(msg="Invalid upload key")
+        
+        try:
+            if upload_id:
+                try:
+                    await storage_service.complete_multipart_upload(storage_key, upload_id, parts or [])
+                except Exception:
+                    # Never leave an orphaned multipart upload behind
+                    try:
+                        await storage_service.abort_multipart_upload(storage_key, upload_id)
+                    except Exception:
+                        pass
+                    raise
+            
+            info = await storage_service.get_file_info(storage_key)
+            if info['size'] != size_bytes:
+                raise http_400(msg="Uploaded size does not match")
+            if not await storage_service.verify_file_hash(storage_key, file_hash):
+                raise http_400(msg="Uploaded content does not match its hash")
+            
+            storage_path, ref_count = await self.add_reference(
+                account_id, file_hash, size_bytes, mime_type
+            )
+            if ref_count == 1 or not await storage_service.file_exists(storage_path):
+                try:
+                    await storage_service.copy_file(storage_key, storage_path)
+                except Exception:
+                    await self.release(account_id, storage_path)
+                    raise
+        finally:
+            try:
+                await storage_service.delete_file(storage_key)
+            except Exception:
+                pass  # Staged objects that linger are harmless
+        
+        return storage_path
+    
+    async def add_references(self, account_id: str,
+                             blobs: List[Tuple[str, int, Optional[str]]]) -> Dict[str, Tuple[str, bool]]:
+        """
+        Take one reference per (file_hash, size_bytes, mime_type) entry with a
+        single upsert per batch. Repeated hashes take one reference each.
+        Returns: {file_hash: (storage_path, created)} where created means the
+        blob row did not exist before this call.
+        """
+        counts = Counter(file_hash for file_hash, _, _ in blobs)
+        rows = {}
+        for file_hash, size_bytes, mime_type in blobs:
+            rows.setdefault(file_hash, {
+                "account_id": account_id,
+                "file_hash": file_hash,
+                "storage_path": self.blob_path(account_id, file_hash),
+                "size_bytes": size_bytes,
+                "mime_type": mime_type,
+                "ref_count": counts[file_hash]
+            })
+        
+        references = {}
+        # Rows are locked in insert order until commit: a fixed (hash) order keeps
+        # concurrent uploads sharing content from deadlocking
+        rows = [rows[file_hash] for file_hash in sorted(rows)]
+        for start in range(0, len(rows), 1000):
+            stmt = insert(StorageBlob).values(rows[start:start + 1000])
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_blob_account_hash",
+                set_={
+                    "ref_count": StorageBlob.ref_count + stmt.excluded.ref_count,
+                    "updated_at": func.now()
+                }
+            ).returning(StorageBlob.file_hash, StorageBlob.storage_path, StorageBlob.ref_count)
+            
+            for file_hash, storage_path, ref_count in (await self.session.execute(stmt)).all():
+                references[file_hash] = (storage_path, ref_count == counts[file_hash])
+        return references
+    
+    async def store_zip_members(self, account_id: str, archive, members: List[dict],
+                                storage_service) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Store the members of an opened ZIP in the blob store. Members are hashed
+        and uploaded by a bounded pool of workers straight from the archive, and
+        references are taken with one bulk upsert, so memory stays bounded by
+        zip_ingest_workers parts whatever the archive size.
+        Returns: (stored, failed) with stored entries (member, size_bytes, file_hash,
+        storage_path) and failed entries (member, error)
+        """
+        semaphore = asyncio.Semaphore(max(settings.zip_ingest_workers, 1))
+        
+        async def bounded(fn, *args):
+            async with semaphore:
+                return await fn(*args)
+        
+        results = await asyncio.gather(
+            *[bounded(storage_service.hash_zip_member, archive, member) for member in members],
+            return_exceptions=True
+        )
+        
+        hashed = []
+        failed = []
+        for member, result in zip(members, results):
+            if isinstance(result, Exception):
+                failed.append((member, result))
+            else:
+                hashed.append((member, *result))
+        
+        references = await self.add_references(
+            account_id,
+            [(file_hash, size_bytes, member['mime_type']) for member, size_bytes, file_hash in hashed]
+        )
+        
+        # One upload per distinct content; existing blobs are only checked for presence
+        first_member = {}
+        for member, _, file_hash in hashed:
+            first_member.setdefault(file_hash, member)
+        
+        async def ensure_stored(file_hash: str, member: dict):
+            storage_path, created = references[file_hash]
+            if created or not await storage_service.file_exists(storage_path):
+                await storage_service.upload_zip_member(archive, member, storage_path)
+        
+        upload_results = await asyncio.gather(
+            *[bounded(ensure_stored, file_hash, member) for file_hash, member in first_member.items()],
+            return_exceptions=True
+        )
+        upload_errors = {
+            file_hash: result
+            for file_hash, result in zip(first_member, upload_results)
+            if isinstance(result, Exception)
+        }
+        
+        stored = []
+        for member, size_bytes, file_hash in hashed:
+            storage_path = references[file_hash][0]
+            if file_hash in upload_errors:
+                await self.release(account_id, storage_path)
+                failed.append((member, upload_errors[file_hash]))
+            else:
+                stored.append((member, size_bytes, file_hash, storage_path))
+        return stored, failed
+    
+    async def store_uploads(self, account_id: str, uploads: List[Tuple[UploadFile, int, str]],
+                            storage_service) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Store a batch of already hashed uploads (file, size_bytes, file_hash) in
+        the blob store. References are taken with one bulk upsert and each
+        distinct content is uploaded once, by a bounded pool of workers. Large
+        new content goes through store_upload to be stored as chunks.
+        Returns: (stored, failed) with stored entries (file, size_bytes, file_hash,
+        storage_path) and failed entries (file, error)
+        """
+        stored = []
+        failed = []
+        
+        chunked = []
+        if settings.storage_chunking:
+            large = {file_hash for _, size_bytes, file_hash in uploads if size_bytes > storage_service.chunker.max_size}
+            if large:
+                held = set((await self.session.execute(
+                    select(StorageBlob.file_hash).where(
+                        StorageBlob.account_id == account_id,
+                        StorageBlob.file_hash.in_(large)
+                    )
+                )).scalars().all())
+                chunked = [upload for upload in uploads if upload[2] in large - held]
+                uploads = [upload for upload in uploads if upload[2] not in large - held]
+        
+        for file, size_bytes, file_hash in chunked:
+            try:
+                async with self.session.begin_nested():
+                    stored.append((file, *await self.store_upload(account_id, file, storage_service, size_bytes, file_hash)))
+            except Exception as e:
+                failed.append((file, e))
+        
+        references = await self.add_references(
+            account_id,
+            [(file_hash, size_bytes, file.content_type) for file, size_bytes, file_hash in uploads]
+        )
+        
+        first_file = {}
+        for file, _, file_hash in uploads:
+            first_file.setdefault(file_hash, file)
+        
+        semaphore = asyncio.Semaphore(max(settings.zip_ingest_workers, 1))
+        
+        async def ensure_stored(file_hash: str, file: UploadFile):
+            storage_path, created = references[file_hash]
+            async with semaphore:
+                if created or not await storage_service.file_exists(storage_path):
+                    await storage_service.upload_file_stream(file, storage_path)
+        
+        upload_results = await asyncio.gather(
+            *[ensure_stored(file_hash, file) for file_hash, file in first_file.items()],
+            return_exceptions=True
+        )
+        upload_errors = {
+            file_hash: result
+            for file_hash, result in zip(first_file, upload_results)
+            if isinstance(result, Exception)
+        }
+        
+        for file, size_bytes, file_hash in uploads:
+            storage_path = references[file_hash][0]
+            if file_hash in upload_errors:
+                await self.release(account_id, storage_path)
+                failed.append((file, upload_errors[file_hash]))
+            else:
+                stored.append((file, size_bytes, file_hash, storage_path))
+        return stored, failed
+    
+    async def retain(self, account_id: str, storage_path: Optional[str]) -> Optional[int]:
+        """
+        Take another reference on an existing blob, e.g. when a second row starts
+        pointing at the same content.
+        Returns the new ref_count, or None if storage_path is not a blob.
+        """
+        if not storage_path:
+            return None
+        
+        stmt = update(StorageBlob).where(
+            StorageBlob.account_id == account_id,
+            StorageBlob.storage_path == storage_path
+        ).values(
+            ref_count=StorageBlob.ref_count + 1,
+            updated_at=func.now()
+        ).returning(StorageBlob.ref_count)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+    
+    async def release(self, account_id: str, storage_path: Optional[str]) -> List[str]:
+        """
+        Drop the reference a file, version or attachment holds on the blob at
+        storage_path; the row is removed when the last reference goes away.
+        Returns the storage keys of reclaimed content, for the caller to delete
+        once the transaction has committed (see release_paths).
+        """
+        return await self.release_paths(account_id, [storage_path], include_legacy=False)
+    
+    async def _release_chunks(self, account_id: str, storage_paths: List[str]) -> List[str]:
+        """
+        Drop the chunk references held by manifest blobs that are being removed.
+        Returns the storage keys of chunks nothing references any more.
+        """
+        manifest_paths = [path for path in storage_paths if is_manifest(path)]
+        if not manifest_paths:
+            return []
+        
+        stmt = select(StorageBlobChunk.chunk_path).join(
+            StorageBlob, StorageBlobChunk.blob_id == StorageBlob.id
+        ).where(
+            StorageBlob.account_id == account_id,
+            StorageBlob.storage_path.in_(manifest_paths)
+        )
+        chunk_paths = (await self.session.execute(stmt)).scalars().all()
+        return await self.release_paths(account_id, chunk_paths, include_legacy=False)
+    
+    async def release_paths(self, account_id: str, storage_paths: List[Optional[str]],
+                            include_legacy: bool = True) -> List[str]:
+        """
+        Drop one reference per entry in storage_paths with one UPDATE per batch
+        (paths are grouped by how many references they lose) and remove the blob
+        rows that reach zero, along with the chunk references of manifests.
+        Returns the storage keys to delete: reclaimed blobs, their chunks and
+        renditions, plus (with include_legacy) legacy per-file objects that are
+        not blobs at all.
+        """
+        counts = Counter(path for path in storage_paths if path)
+        by_count: Dict[int, List[str]] = {}
+        for storage_path, count in counts.items():
+            by_count.setdefault(count, []).append(storage_path)
+        
+        remaining = {}
+        renderable = {}
+        for count, paths in by_count.items():
+            for start in range(0, len(paths), 1000):
+                stmt = update(StorageBlob).where(
+                    StorageBlob.account_id == account_id,
+                    StorageBlob.storage_path.in_(paths[start:start + 1000])
+                ).values(
+                    ref_count=StorageBlob.ref_count - count,
+                    updated_at=func.now()
+                ).returning(
+                    StorageBlob.storage_path, StorageBlob.ref_count,
+                    StorageBlob.file_hash, StorageBlob.mime_type
+                ).execution_options(synchronize_session=False)
+                for storage_path, ref_count, file_hash, mime_type in (await self.session.execute(stmt)).all():
+                    remaining[storage_path] = ref_count
+                    if supports_renditions(mime_type):
+                        renderable[storage_path] = file_hash
+        
+        reclaimed = [path for path, ref_count in remaining.items() if ref_count <= 0]
+        chunk_keys = await self._release_chunks(account_id, reclaimed)
+        # Thumbnails and previews go with the content they were rendered from
+        chunk_keys += [
+            key for path in reclaimed if path in renderable
+            for key in rendition_keys(account_id, renderable[path])
+        ]
+        for start in range(0, len(reclaimed), 1000):
+            await self.session.execute(
+                delete(StorageBlob).where(
+                    StorageBlob.account_id == account_id,
+                    StorageBlob.storage_path.in_(reclaimed[start:start + 1000]),
+                    StorageBlob.ref_count <= 0
+                ).execution_options(synchronize_session=False)
+            )
+        
+        legacy = [path for path in counts if path not in remaining] if include_legacy else []
+        return reclaimed + chunk_keys + legacy
+    
+    async def purge_files(self, account_id: str, storage_service,
+                          file_ids: Optional[List[str]] = None, deleted_only: bool = True,
+                          folder_ids=None) -> dict:
+        """
+        Permanently delete files (by default every file in the recycle bin) in
+        chunks of purge_batch_size. folder_ids (a list or a select of IDs)
+        limits the purge to files anywhere below those folders. Each chunk is a handful of set-based
+        statements: DELETE ... RETURNING storage_path for versions and files, one
+        batched reference release, then a commit. Objects are deleted only after
+        the commit, with batched storage deletes, so a failure never leaves rows
+        pointing at missing content.
+        Returns: {"files_deleted", "objects_deleted"}
+        """
+        chunk_size = max(settings.purge_batch_size, 1)
+        totals = {"files_deleted": 0, "objects_deleted": 0}
+        
+        while True:
+            stmt = select(FileNew.id).where(FileNew.account_id == account_id)
+            if deleted_only:
+                stmt = stmt.where(FileNew.is_deleted == True)
+            if file_ids is not None:
+                stmt = stmt.where(FileNew.id.in_(file_ids))
+            if folder_ids is not None:
+                stmt = stmt.where(FileNew.folder_id.in_(
+                    select(FolderClosure.descendant_id).where(FolderClosure.ancestor_id.in_(folder_ids))
+                ))
+            ids = (await self.session.execute(stmt.limit(chunk_size))).scalars().all()
+            if not ids:
+                break
+            
+            # Versions first: the cascade from files_new would drop their paths unseen
+            version_paths = (await self.session.execute(
+                delete(FileVersion).where(
+                    FileVersion.file_id.in_(ids)
+                ).returning(FileVersion.storage_path).execution_options(synchronize_session=False)
+            )).scalars().all()
+            file_paths = (await self.session.execute(
+                delete(FileNew).where(
+                    FileNew.id.in_(ids)
+                ).returning(FileNew.storage_path).execution_options(synchronize_session=False)
+            )).scalars().all()
+            
+            keys = await self.release_paths(account_id, [*file_paths, *version_paths])
+            await self.session.commit()
+            
+            totals["files_deleted"] += len(file_paths)
+            totals["objects_deleted"] += await storage_service.delete_files(keys)
+            docflow_logger.info(
+                f"Purge {account_id}: {totals['files_deleted']} files, "
+                f"{totals['objects_deleted']} objects deleted"
+            )
+            
+            if len(ids) < chunk_size:
+                break
+        
+        return totals
+    
+    async def purge_folders(self, account_id: str, storage_service,
+                            folder_ids: Optional[List[str]] = None, deleted_only: bool = True) -> dict:
+        """
+        Permanently delete folders (by default every folder in the recycle bin)
+        with everything below them. Their files go through purge_files() first,
+        so blob references are released rather than dropped by the cascade; the
+        folders then go in committed chunks of DELETE ... RETURNING, subfolders
+        following by cascade.
+        Returns: {"folders_deleted", "files_deleted", "objects_deleted"}
+        """
+        selected = select(FolderNew.id).where(FolderNew.account_id == account_id)
+        if deleted_only:
+            selected = selected.where(FolderNew.is_deleted == True)
+        if folder_ids is not None:
+            selected = selected.where(FolderNew.id.in_(folder_ids))
+        
+        totals = await self.purge_files(account_id, storage_service, deleted_only=False, folder_ids=selected)
+        totals["folders_deleted"] = 0
+        
+        chunk_size = max(settings.purge_batch_size, 1)
+        while True:
+            ids = (await self.session.execute(selected.limit(chunk_size))).scalars().all()
+            if not ids:
+                break
+            
+            deleted = (await self.session.execute(
+                delete(FolderNew).where(
+                    FolderNew.id.in_(ids)
+                ).returning(FolderNew.id).execution_options(synchronize_session=False)
+            )).scalars().all()
+            await self.session.commit()
+            
+            totals["folders_deleted"] += len(deleted)
+            docflow_logger.info(f"Purge {account_id}: {totals['folders_deleted']} folders deleted")
+            
+            if len(ids) < chunk_size:
+                break
+        
+        return totals
+    
+    async def reconcile(self, account_id: str) -> Tuple[dict, List[str]]:
+        """
+        Recompute reference counts from files, versions, inbox attachments and
+        chunk manifests.
+        Catches references dropped by database cascades (folder/section deletes)
+        and removes the rows of blobs nothing points at any more. Returns the
+        stats and the storage keys to delete once the caller has committed.
+        
+        Blobs touched in the last hour are left alone, and every statement
+        re-checks that against the locked row: add_reference() and retain()
+        bump updated_at, so a blob picked up by a concurrent upload is never
+        reclaimed from under it.
+        """
+        file_refs = select(FileNew.storage_path.label("storage_path")).where(
+            FileNew.account_id == account_id
+        )
+        version_refs = select(FileVersion.storage_path.label("storage_path")).join(
+            FileNew, FileVersion.file_id == FileNew.id
+        ).where(FileNew.account_id == account_id)
+        inbox_refs = select(InboxAttachment.storage_path.label("storage_path")).join(
+            InboxEntry, InboxAttachment.inbox_entry_id == InboxEntry.id
+        ).where(InboxEntry.account_id == account_id)
+        chunk_refs = select(StorageBlobChunk.chunk_path.label("storage_path")).join(
+            StorageBlob, StorageBlobChunk.blob_id == StorageBlob.id
+        ).where(StorageBlob.account_id == account_id)
+        
+        refs = file_refs.union_all(version_refs, inbox_refs, chunk_refs).subquery()
+        settled = StorageBlob.updated_at < func.now() - text("interval '1 hour'")
+        
+        # Unreferenced blobs go in one conditional DELETE; repeated because
+        # deleting a manifest drops the references its chunks held
+        keys = []
+        reclaimed = 0
+        while True:
+            deleted = (await self.session.execute(
+                delete(StorageBlob).where(
+                    StorageBlob.account_id == account_id,
+                    settled,
+                    ~select(refs.c.storage_path).where(
+                        refs.c.storage_path == StorageBlob.storage_path
+                    ).exists()
+                ).returning(
+                    StorageBlob.storage_path, StorageBlob.file_hash, StorageBlob.mime_type
+                ).execution_options(synchronize_session=False)
+            )).all()
+            if not deleted:
+                break
+            reclaimed += len(deleted)
+            for storage_path, file_hash, mime_type in deleted:
+                keys.append(storage_path)
+                if supports_renditions(mime_type):
+                    keys += rendition_keys(account_id, file_hash)
+        
+        counts = select(
+            refs.c.storage_path, func.count().label("ref_count")
+        ).group_by(refs.c.storage_path).subquery()
+        result = await self.session.execute(
+            update(StorageBlob).where(
+                StorageBlob.account_id == account_id,
+                StorageBlob.storage_path == counts.c.storage_path,
+                StorageBlob.ref_count != counts.c.ref_count,
+                settled
+            ).values(ref_count=counts.c.ref_count).execution_options(synchronize_session=False)
+        )
+        
+        return {"blobs_updated": result.rowcount, "blobs_reclaimed": reclaimed}, keys
@@ -1,17 +1,25 @@
-from typing import List, Optional, Dict, Any
-from sqlalchemy import select, func, and_, or_, delete
+from typing import List, Optional, Dict, Any, Tuple
+from sqlalchemy import select, insert, func, and_, or_, delete, literal
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from fastapi import UploadFile
+import asyncio
 import hashlib
 import os
-import secrets
 from datetime import datetime
 
+from app.api.dependencies.repositories import get_ulid
 from app.core.exceptions import http_400, http_404, http_403
 from app.db.tables.dms.sections import Section
 from app.db.tables.dms.folders_new import FolderNew
 from app.db.tables.dms.files import FileNew
+from app.db.tables.dms.stats import FolderStats, SectionStats
+from app.db.tables.dms.folder_closure import FolderClosure, subtree_ids
 from app.db.tables.dms.metadata import MetadataDefinition, FileMetadata, RelatedFile
+from app.db.repositories.dms.blob_repository import BlobRepository
+from app.db.pagination import Page, paginate
+from app.db.document_ids import document_id_allocator
 from app.schemas.dms.schemas import (
     SectionCreate, SectionUpdate,
     FolderCreate, FolderUpdate,
@@ -20,6 +28,7 @@ from app.schemas.dms.schemas import (
     MetadataDefinitionCreate, MetadataDefinitionUpdate,
     FileMetadataUpdate, RelatedFileCreate
 )
+from app.db.routing import read_only
 
 
 class DMSRepository:
@@ -41,7 +50,7 @@ class DMSRepository:
         
         section = Section(**data.model_dump(), created_by=created_by)
         self.session.add(section)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(section)
         return section
     
@@ -55,30 +64,21 @@ class DMSRepository:
     
     async def list_sections(self, account_id: str, skip: int = 0, limit: int = 100) -> List[dict]:
         """List all sections for an account with folder and file counts"""
-        stmt = select(Section).where(
+        # Counts come from section_stats, kept current by triggers
+        stmt = select(
+            Section,
+            func.coalesce(SectionStats.folder_count, 0),
+            func.coalesce(SectionStats.file_count, 0),
+            func.coalesce(SectionStats.total_bytes, 0),
+        ).outerjoin(
+            SectionStats, SectionStats.section_id == Section.id
+        ).where(
             Section.account_id == account_id
         ).order_by(Section.position, Section.name).offset(skip).limit(limit)
         result = await self.session.execute(stmt)
-        sections = result.scalars().all()
         
-        # Add folder and file counts
         sections_with_counts = []
-        for section in sections:
-            # Count folders
-            folder_stmt = select(func.count(FolderNew.id)).where(FolderNew.section_id == section.id)
-            folder_result = await self.session.execute(folder_stmt)
-            folder_count = folder_result.scalar() or 0
-            
-            # Count files (via folders)
-            file_stmt = select(func.count(FileNew.id)).join(
-                FolderNew, FileNew.folder_id == FolderNew.id
-            ).where(
-                FolderNew.section_id == section.id,
-                FileNew.is_deleted == False
-            )
-            file_result = await self.session.execute(file_stmt)
-            file_count = file_result.scalar() or 0
-            
+        for section, folder_count, file_count, total_bytes in result.all():
             section_dict = {
                 "id": section.id,
                 "account_id": section.account_id,
@@ -89,7 +89,8 @@ class DMSRepository:
                 "created_at": section.created_at,
                 "updated_at": section.updated_at,
                 "folder_count": folder_count,
-                "file_count": file_count
+                "file_count": file_count,
+                "total_bytes": total_bytes
             }
             sections_with_counts.append(section_dict)
         
@@ -104,7 +105,7 @@ class DMSRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(section, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(section)
         return section
     
@@ -115,7 +116,7 @@ class DMSRepository:
             raise http_404(msg="Section not found")
         
         await self.session.delete(section)
-        await self.session.commit()
+        await self.session.flush()
     
     # ==================== FOLDERS ====================
     
@@ -137,10 +138,59 @@ class DMSRepository:
         
         folder = FolderNew(**data.model_dump(), created_by=created_by)
         self.session.add(folder)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(folder)
         return folder
     
+    async def ensure_folder_tree(self, account_id: str, root_folder_id: str,
+                                 folder_paths: List[tuple], created_by: str) -> Dict[tuple, str]:
+        """
+        Make sure every relative folder path exists below root_folder_id.
+        Existing folders are reused; missing ones are created with one batched insert.
+        Returns: {path tuple: folder_id}, with () mapped to the root folder
+        """
+        root = await self.get_folder(root_folder_id, account_id)
+        if not root:
+            raise http_404(msg="Folder not found")
+        
+        # Every folder of the section in one query, keyed by (parent, name)
+        stmt = select(FolderNew.id, FolderNew.name, FolderNew.parent_folder_id).where(
+            FolderNew.section_id == root.section_id
+        )
+        existing = {
+            (row.parent_folder_id, row.name): row.id
+            for row in (await self.session.execute(stmt)).all()
+        }
+        
+        folder_ids = {(): root.id}
+        new_folders = []
+        for path in sorted(set(folder_paths), key=len):
+            for depth in range(1, len(path) + 1):
+                prefix = path[:depth]
+                if prefix in folder_ids:
+                    continue
+                
+                parent_id = folder_ids[prefix[:-1]]
+                key = (parent_id, prefix[-1])
+                if key not in existing:
+                    existing[key] = get_ulid()
+                    new_folders.append({
+                        "id": existing[key],
+                        "account_id": account_id,
+                        "section_id": root.section_id,
+                        "parent_folder_id": parent_id,
+                        "name": prefix[-1],
+                        "created_by": created_by
+                    })
+                folder_ids[prefix] = existing[key]
+        
+        if new_folders:
+            # Parents precede children, so one multi-row insert satisfies the self-reference
+            await self.session.execute(insert(FolderNew), new_folders)
+            await self.session.flush()
+        
+        return folder_ids
+    
     async def get_folder(self, folder_id: str, account_id: Optional[str] = None) -> Optional[FolderNew]:
         """Get folder by ID"""
         stmt = select(FolderNew).where(FolderNew.id == folder_id)
@@ -150,8 +200,9 @@ class DMSRepository:
         return result.scalar_one_or_none()
     
     async def list_folders(self, account_id: str, section_id: Optional[str] = None, 
-                          parent_folder_id: Optional[str] = None, skip: int = 0, limit: int = 100) -> List[FolderNew]:
-        """List folders"""
+                          parent_folder_id: Optional[str] = None, skip: int = 0, limit: int = 100,
+                          cursor: Optional[str] = None) -> Page:
+        """List folders by name, paged by offset or cursor"""
         stmt = select(FolderNew).where(FolderNew.account_id == account_id)
         
         if section_id:
@@ -163,39 +214,72 @@ class DMSRepository:
             # Root folders only
             stmt = stmt.where(FolderNew.parent_folder_id.is_(None))
         
-        stmt = stmt.order_by(FolderNew.name).offset(skip).limit(limit)
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return await paginate(self.session, stmt, (FolderNew.name, FolderNew.id), cursor, skip, limit,
+                              descending=False)
     
-    async def get_folder_tree(self, section_id: str, account_id: str) -> List[dict]:
-        """Get complete folder tree for a section"""
-        # Get all folders in section
-        stmt = select(FolderNew).where(
+    @read_only
+    async def get_folder_tree(self, section_id: str, account_id: str, parent_id: Optional[str] = None,
+                              depth: Optional[int] = None, compact: bool = False) -> List[dict]:
+        """
+        Get the folder tree of a section in one query. Starts at the section
+        root, or below parent_id, and stops after depth levels so the UI can
+        expand subtrees lazily; folder_count tells whether a node has more.
+        Compact mode returns a flat list of small nodes linked by parent id.
+        """
+        anchor = select(
+            FolderNew.id, FolderNew.parent_folder_id, literal(1).label("level")
+        ).where(
             FolderNew.section_id == section_id,
             FolderNew.account_id == account_id
-        ).order_by(FolderNew.name)
+        )
+        if parent_id:
+            anchor = anchor.where(FolderNew.parent_folder_id == parent_id)
+        else:
+            anchor = anchor.where(FolderNew.parent_folder_id.is_(None))
+        
+        tree = anchor.cte("tree", recursive=True)
+        children = select(
+            FolderNew.id, FolderNew.parent_folder_id, (tree.c.level + 1).label("level")
+        ).join(tree, FolderNew.parent_folder_id == tree.c.id)
+        if depth:
+            children = children.where(tree.c.level < depth)
+        tree = tree.union_all(children)
+        
+        if compact:
+            columns = [FolderNew.id, FolderNew.parent_folder_id, FolderNew.name]
+        else:
+            columns = [c for c in FolderNew.__table__.columns]
+        stmt = select(
+            *columns,
+            func.coalesce(FolderStats.file_count, 0).label("file_count"),
+            func.coalesce(FolderStats.folder_count, 0).label("folder_count"),
+        ).join(
+            tree, tree.c.id == FolderNew.id
+        ).outerjoin(
+            FolderStats, FolderStats.folder_id == FolderNew.id
+        ).order_by(tree.c.level, FolderNew.name)
         result = await self.session.execute(stmt)
-        folders = result.scalars().all()
+        rows = [dict(row) for row in result.mappings()]
         
-        # Build tree structure
-        folder_dict = {f.id: {**f.__dict__, 'subfolders': [], 'file_count': 0} for f in folders}
-        root_folders = []
+        if not rows and parent_id:
+            # No children: tell an empty folder from one missing in this section
+            parent = await self.get_folder(parent_id, account_id)
+            if not parent or parent.section_id != section_id:
+                raise http_404(msg="Folder not found")
         
-        for folder in folders:
-            if folder.parent_folder_id:
-                if folder.parent_folder_id in folder_dict:
-                    folder_dict[folder.parent_folder_id]['subfolders'].append(folder_dict[folder.id])
-            else:
-                root_folders.append(folder_dict[folder.id])
+        if compact:
+            return rows
         
-        # Count files in each folder
-        for folder_id in folder_dict:
-            stmt = select(func.count(FileNew.id)).where(
-                FileNew.folder_id == folder_id,
-                FileNew.is_deleted == False
-            )
-            result = await self.session.execute(stmt)
-            folder_dict[folder_id]['file_count'] = result.scalar()
+        # Rows come level by level, so parents are placed before their children
+        nodes = {}
+        root_folders = []
+        for row in rows:
+            node = nodes[row["id"]] = {**row, "subfolders": []}
+            parent = nodes.get(row["parent_folder_id"])
+            if parent is not None:
+                parent["subfolders"].append(node)
+            else:
+                root_folders.append(node)
         
         return root_folders
     
@@ -205,21 +289,33 @@ class DMSRepository:
         if not folder:
             raise http_404(msg="Folder not found")
         
+        if data.parent_folder_id:
+            stmt = subtree_ids(folder_id).where(FolderClosure.descendant_id == data.parent_folder_id)
+            if (await self.session.execute(stmt)).first():
+                raise http_400(msg="A folder cannot be moved into itself or its subfolders")
+        
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(folder, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(folder)
         return folder
     
-    async def delete_folder(self, folder_id: str, account_id: Optional[str] = None):
-        """Delete folder (cascades to files)"""
+    async def delete_folder(self, folder_id: str, account_id: Optional[str] = None,
+                            storage_service=None):
+        """Delete folder (cascades to files) and release the stored content of its files"""
         folder = await self.get_folder(folder_id, account_id)
         if not folder:
             raise http_404(msg="Folder not found")
         
+        if storage_service:
+            await BlobRepository(self.session).purge_folders(
+                folder.account_id, storage_service, folder_ids=[folder.id], deleted_only=False
+            )
+            return
+        
         await self.session.delete(folder)
-        await self.session.commit()
+        await self.session.flush()
     
     # ==================== FILES ====================
     
@@ -227,28 +323,100 @@ class DMSRepository:
         """Create file record with auto-generated document_id"""
         # Generate document_id if not provided
         if not data.document_id:
-            data.document_id = await self._generate_document_id(data.account_id)
+            data.document_id = (await document_id_allocator.allocate(data.account_id))[0]
         
         file = FileNew(**data.model_dump(), created_by=created_by)
         self.session.add(file)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(file)
         return file
     
-    async def _generate_document_id(self, account_id: str) -> str:
-        """Generate unique document ID for account"""
-        while True:
-            # Generate format: DOC-XXXXXX (6 random alphanumeric)
-            doc_id = f"DOC-{secrets.token_hex(3).upper()}"
-            
-            # Check if exists
-            stmt = select(FileNew).where(
-                FileNew.account_id == account_id,
-                FileNew.document_id == doc_id
+    async def bulk_create_files(self, items: List[FileCreate], created_by: str) -> List[FileNew]:
+        """Create many file records with block-allocated document IDs and one multi-row insert"""
+        missing = [item for item in items if not item.document_id]
+        by_account = {}
+        for item in missing:
+            by_account.setdefault(item.account_id, []).append(item)
+        for account_id, account_items in by_account.items():
+            document_ids = await document_id_allocator.allocate(account_id, len(account_items))
+            for item, document_id in zip(account_items, document_ids):
+                item.document_id = document_id
+        
+        if not items:
+            return []
+        
+        # One multi-row INSERT ... RETURNING, rows back in input order
+        stmt = insert(FileNew).returning(FileNew, sort_by_parameter_order=True)
+        result = await self.session.scalars(
+            stmt, [{"id": get_ulid(), **item.model_dump(), "created_by": created_by} for item in items]
+        )
+        return result.all()
+    
+    async def ingest_uploads(self, account_id: str, folder_id: str, files: List[UploadFile],
+                             created_by: str, blob_repo: BlobRepository, storage_service) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Create files from a batch of uploads with a constant number of queries:
+        one IN query for duplicates, one upsert for blob references, document
+        IDs from the allocator and one multi-row insert. Content already in the
+        account (or earlier in the batch) is not stored again.
+        Returns: (results, failed) with results entries (upload, file, deduplicated)
+        in upload order and failed entries (upload, error)
+        """
+        if not await self.get_folder(folder_id, account_id):
+            raise http_404(msg="Folder not found")
+        
+        # Hash locally first so duplicates cost no PUT
+        hashes = await asyncio.gather(*[storage_service.hash_file(file) for file in files], return_exceptions=True)
+        failed = []
+        hashed = []
+        for file, result in zip(files, hashes):
+            if isinstance(result, Exception):
+                failed.append((file, result))
+            else:
+                hashed.append((file, *result))
+        
+        existing = await self.get_files_by_hashes([file_hash for _, _, file_hash in hashed], account_id)
+        new_uploads = {}
+        for file, size_bytes, file_hash in hashed:
+            if file_hash not in existing:
+                new_uploads.setdefault(file_hash, (file, size_bytes, file_hash))
+        
+        stored, store_failed = await blob_repo.store_uploads(account_id, list(new_uploads.values()), storage_service)
+        failed.extend(store_failed)
+        
+        new_files = await self.bulk_create_files([
+            FileCreate(
+                account_id=account_id,
+                folder_id=folder_id,
+                name=file.filename,
+                original_filename=file.filename,
+                mime_type=file.content_type,
+                size_bytes=size_bytes,
+                storage_path=storage_path,
+                file_hash=file_hash
             )
-            result = await self.session.execute(stmt)
-            if not result.scalar_one_or_none():
-                return doc_id
+            for file, size_bytes, file_hash, storage_path in stored
+        ], created_by)
+        created = {id(file): new_file for (file, *_), new_file in zip(stored, new_files)}
+        by_hash = {new_file.file_hash: new_file for new_file in new_files}
+        store_errors = {id(file): error for file, error in store_failed}
+        hash_errors = {file_hash: store_errors[id(file)] for file, _, file_hash in new_uploads.values() if id(file) in store_errors}
+        
+        results = []
+        for file, _, file_hash in hashed:
+            if id(file) in store_errors:
+                continue
+            if id(file) in created:
+                results.append((file, created[id(file)], False))
+            elif file_hash in existing:
+                results.append((file, existing[file_hash], True))
+            elif file_hash in by_hash:
+                # Same content as an earlier upload of this batch
+                results.append((file, by_hash[file_hash], True))
+            else:
+                # Same content as an earlier upload of this batch that could not be stored
+                failed.append((file, hash_errors[file_hash]))
+        return results, failed
     
     async def get_file(self, file_id: str, account_id: Optional[str] = None) -> Optional[FileNew]:
         """Get file by ID"""
@@ -258,9 +426,10 @@ class DMSRepository:
         result = await self.session.execute(stmt)
         return result.scalar_one_or_none()
     
+    @read_only
     async def list_files(self, account_id: str, folder_id: Optional[str] = None, 
-                        skip: int = 0, limit: int = 100) -> List[FileNew]:
-        """List files"""
+                        skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> Page:
+        """List files, newest first, paged by offset or cursor"""
         stmt = select(FileNew).where(
             FileNew.account_id == account_id,
             FileNew.is_deleted == False
@@ -269,9 +438,65 @@ class DMSRepository:
         if folder_id:
             stmt = stmt.where(FileNew.folder_id == folder_id)
         
-        stmt = stmt.order_by(FileNew.created_at.desc()).offset(skip).limit(limit)
+        return await paginate(self.session, stmt, (FileNew.created_at, FileNew.id), cursor, skip, limit)
+    
+    @read_only
+    async def list_files_for_export(self, account_id: str, section_id: Optional[str] = None,
+                                    folder_id: Optional[str] = None) -> List[dict]:
+        """
+        List every live file in an account, section or folder (including its
+        subfolders) for a ZIP export. Selects only the columns the archive
+        needs and resolves folder paths from the ancestor index in one query.
+        """
+        stmt = select(
+            FileNew.storage_path,
+            FileNew.original_filename,
+            FileNew.mime_type,
+            FileNew.size_bytes,
+            FileNew.folder_id
+        ).where(
+            FileNew.account_id == account_id,
+            FileNew.is_deleted == False
+        )
+        
+        folder_ids = None
+        if folder_id:
+            folder_ids = subtree_ids(folder_id)
+        elif section_id:
+            folder_ids = select(FolderNew.id).where(FolderNew.section_id == section_id)
+        if folder_ids is not None:
+            stmt = stmt.where(FileNew.folder_id.in_(folder_ids))
+        
+        stmt = stmt.order_by(FileNew.folder_id, FileNew.original_filename)
+        rows = (await self.session.execute(stmt)).all()
+        
+        folder_paths = await self.get_folder_paths(account_id, folder_ids)
+        return [
+            {
+                'storage_path': row.storage_path,
+                'filename': row.original_filename,
+                'mime_type': row.mime_type,
+                'size_bytes': row.size_bytes,
+                'folder_path': folder_paths.get(row.folder_id, [])
+            }
+            for row in rows
+        ]
+    
+    async def get_folder_paths(self, account_id: str, folder_ids=None) -> Dict[str, List[str]]:
+        """Map folder IDs in an account (or the given subset) to their name path from the section root"""
+        stmt = select(
+            FolderClosure.descendant_id,
+            func.array_agg(aggregate_order_by(FolderNew.name, FolderClosure.depth.desc()))
+        ).join(
+            FolderNew, FolderNew.id == FolderClosure.ancestor_id
+        ).where(
+            FolderNew.account_id == account_id
+        ).group_by(FolderClosure.descendant_id)
+        if folder_ids is not None:
+            stmt = stmt.where(FolderClosure.descendant_id.in_(folder_ids))
+        
         result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return {folder_id: list(path) for folder_id, path in result.all()}
     
     async def update_file(self, file_id: str, data: FileUpdate, account_id: Optional[str] = None) -> FileNew:
         """Update file"""
@@ -282,7 +507,7 @@ class DMSRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(file, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(file)
         return file
     
@@ -294,7 +519,7 @@ class DMSRepository:
         
         file.is_deleted = True
         file.deleted_at = datetime.utcnow()
-        await self.session.commit()
+        await self.session.flush()
     
     async def restore_file(self, file_id: str, account_id: Optional[str] = None):
         """Restore soft-deleted file"""
@@ -309,10 +534,11 @@ class DMSRepository:
         
         file.is_deleted = False
         file.deleted_at = None
-        await self.session.commit()
+        await self.session.flush()
     
-    async def permanent_delete_file(self, file_id: str, account_id: Optional[str] = None):
-        """Permanently delete file"""
+    async def permanent_delete_file(self, file_id: str, account_id: Optional[str] = None,
+                                    storage_service=None):
+        """Permanently delete file and release its stored content"""
         stmt = select(FileNew).where(FileNew.id == file_id)
         if account_id:
             stmt = stmt.where(FileNew.account_id == account_id)
@@ -322,8 +548,14 @@ class DMSRepository:
         if not file:
             raise http_404(msg="File not found")
         
+        if storage_service:
+            await BlobRepository(self.session).purge_files(
+                file.account_id, storage_service, file_ids=[file.id], deleted_only=False
+            )
+            return
+        
         await self.session.delete(file)
-        await self.session.commit()
+        await self.session.flush()
     
     async def create_office_document(self, data: OfficeDocCreate, created_by: str) -> FileNew:
         """Create empty Office document placeholder"""
@@ -340,11 +572,12 @@ class DMSRepository:
             storage_path=storage_path,
             is_office_doc=True,
             office_type=data.office_type,
+            document_id=(await document_id_allocator.allocate(data.account_id))[0],
             created_by=created_by
         )
         
         self.session.add(file)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(file)
         return file
     
@@ -366,6 +599,20 @@ class DMSRepository:
         }
         return mime_types.get(office_type, mime_types['word'])
     
+    async def get_files_by_hashes(self, file_hashes: List[str], account_id: str) -> Dict[str, FileNew]:
+        """Live files holding any of the given hashes, one per hash, with a single IN query"""
+        if not file_hashes:
+            return {}
+        stmt = select(FileNew).where(
+            FileNew.file_hash.in_(set(file_hashes)),
+            FileNew.account_id == account_id,
+            FileNew.is_deleted == False
+        ).order_by(FileNew.created_at, FileNew.id)
+        files = {}
+        for file in (await self.session.execute(stmt)).scalars().all():
+            files.setdefault(file.file_hash, file)
+        return files
+    
     async def get_files_by_hash(self, file_hash: str, account_id: str) -> Optional[FileNew]:
         """Check if file with same hash exists (deduplication)"""
         stmt = select(FileNew).where(
@@ -374,4 +621,5 @@ class DMSRepository:
             FileNew.is_deleted == False
         )
         result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        # Versions and ZIP imports may hold the same content more than once
+        return result.scalars().first()
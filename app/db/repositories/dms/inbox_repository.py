@@ -3,13 +3,18 @@ from sqlalchemy import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from datetime import datetime
+from fastapi import UploadFile
+from starlette.datastructures import Headers
 import base64
+import io
 import secrets
 
 from app.core.exceptions import http_400, http_404
 from app.db.tables.dms.inbox import InboxEntry, InboxAttachment
 from app.db.tables.dms.files import FileNew
 from app.db.tables.rbac.models import Account
+from app.db.repositories.dms.blob_repository import BlobRepository
+from app.schemas.dms.schemas import FileCreate
 from app.schemas.dms.sharing_schemas import InboxEntryCreate, InboxEntryMove
 
 
@@ -35,7 +40,7 @@ class InboxRepository:
         inbox_address = f"{slug}-{unique_token}@docflow.inbox"
         
         account.inbox_address = inbox_address
-        await self.session.commit()
+        await self.session.flush()
         
         return inbox_address
     
@@ -66,6 +71,7 @@ class InboxRepository:
         await self.session.flush()
         
         # Process attachments
+        blob_repo = BlobRepository(self.session)
         for attachment_data in data.attachments:
             filename = attachment_data.get("filename")
             content_base64 = attachment_data.get("content_base64")
@@ -80,21 +86,28 @@ class InboxRepository:
             except Exception:
                 continue
             
-            # Store in temporary inbox location
-            storage_path = f"inbox/{account_id}/{entry.id}/{filename}"
-            await storage_service.upload_file(storage_path, content)
+            # Store in the account's blob store (shared with files created from it)
+            upload = UploadFile(
+                file=io.BytesIO(content),
+                filename=filename,
+                headers=Headers({"content-type": mime_type or "application/octet-stream"})
+            )
+            size_bytes, file_hash, storage_path = await blob_repo.store_upload(
+                account_id, upload, storage_service
+            )
             
             # Create attachment record
             attachment = InboxAttachment(
                 inbox_entry_id=entry.id,
                 filename=filename,
                 mime_type=mime_type,
-                size_bytes=str(len(content)),
-                storage_path=storage_path
+                size_bytes=str(size_bytes),
+                storage_path=storage_path,
+                file_hash=file_hash
             )
             self.session.add(attachment)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(entry, ["attachments"])
         return entry
     
@@ -146,30 +159,29 @@ class InboxRepository:
         if data.attachment_ids:
             attachments = [a for a in attachments if a.id in data.attachment_ids]
         
+        blob_repo = BlobRepository(self.session)
         created_files = []
         
         for attachment in attachments:
-            # Read file from inbox storage
-            content = await storage_service.download_file(attachment.storage_path)
+            # The file points at the attachment's blob: no download or copy needed
+            await blob_repo.retain(entry.account_id, attachment.storage_path)
             
             # Create file in target folder
-            file_data = {
-                "account_id": entry.account_id,
-                "folder_id": data.folder_id,
-                "name": attachment.filename,
-                "original_filename": attachment.filename,
-                "mime_type": attachment.mime_type,
-                "size_bytes": int(attachment.size_bytes),
-                "tags": [f"from:{entry.from_email}"],
-                "notes": f"Imported from inbox: {entry.subject or 'No subject'}"
-            }
+            file_data = FileCreate(
+                account_id=entry.account_id,
+                folder_id=data.folder_id,
+                name=attachment.filename,
+                original_filename=attachment.filename,
+                mime_type=attachment.mime_type,
+                size_bytes=int(attachment.size_bytes),
+                storage_path=attachment.storage_path,
+                file_hash=attachment.file_hash,
+                tags=[f"from:{entry.from_email}"],
+                notes=f"Imported from inbox: {entry.subject or 'No subject'}"
+            )
             
             # Use DMS repository to create file
-            file = await dms_repository.create_file_from_content(
-                file_data,
-                content,
-                user_id
-            )
+            file = await dms_repository.create_file(file_data, user_id)
             
             # Link attachment to created file
             attachment.file_id = file.id
@@ -181,22 +193,25 @@ class InboxRepository:
         entry.processed_by = user_id
         entry.folder_id = data.folder_id
         
-        await self.session.commit()
+        await self.session.flush()
         
         return created_files
     
-    async def delete_inbox_entry(self, entry_id: str, storage_service):
-        """Delete inbox entry and its attachments"""
+    async def delete_inbox_entry(self, entry_id: str) -> List[str]:
+        """
+        Delete inbox entry and its attachments.
+        Returns the storage keys to delete once the transaction has committed.
+        """
         entry = await self.get_inbox_entry(entry_id)
         if not entry:
             raise http_404(msg="Inbox entry not found")
         
-        # Delete attachment files from storage
-        for attachment in entry.attachments:
-            try:
-                await storage_service.delete_file(attachment.storage_path)
-            except Exception:
-                pass  # Continue even if file deletion fails
+        # Release attachment content (kept while files created from it still exist)
+        blob_repo = BlobRepository(self.session)
+        reclaimed = await blob_repo.release_paths(
+            entry.account_id, [attachment.storage_path for attachment in entry.attachments]
+        )
         
         await self.session.delete(entry)
-        await self.session.commit()
+        await self.session.flush()
+        return reclaimed
@@ -1,18 +1,23 @@
+import re
 from typing import List, Optional, Dict, Any
-from sqlalchemy import select, delete, or_
+from sqlalchemy import select, delete, or_, func, Float
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, with_expression
 
+from app.core.config import settings
 from app.core.exceptions import http_400, http_404
 from app.db.tables.dms.metadata import MetadataDefinition, FileMetadata, RelatedFile
 from app.db.tables.dms.files import FileNew
 from app.db.tables.dms.folders_new import FolderNew
 from app.db.tables.dms.sections import Section
+from app.db.tables.dms.search import SEARCH_CONFIG, MIN_PREFIX_LENGTH, build_tsquery
 from app.schemas.dms.schemas import (
     MetadataDefinitionCreate, MetadataDefinitionUpdate,
     FileMetadataUpdate, RelatedFileCreate,
     SearchRequest, SearchResult
 )
+from app.db.routing import read_only
+from app.db.pagination import Page, paginate
 
 
 class MetadataRepository:
@@ -34,7 +39,7 @@ class MetadataRepository:
         
         definition = MetadataDefinition(**data.model_dump(), created_by=created_by)
         self.session.add(definition)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(definition)
         return definition
     
@@ -73,7 +78,7 @@ class MetadataRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(definition, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(definition)
         return definition
     
@@ -84,7 +89,7 @@ class MetadataRepository:
             raise http_404(msg="Metadata definition not found")
         
         await self.session.delete(definition)
-        await self.session.commit()
+        await self.session.flush()
     
     async def get_files_by_definition(self, definition_id: str, account_id: str, 
                                       skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
@@ -171,7 +176,7 @@ class MetadataRepository:
                 )
                 self.session.add(new_metadata)
         
-        await self.session.commit()
+        await self.session.flush()
     
     async def delete_file_metadata(self, file_id: str, definition_id: str):
         """Delete specific metadata value"""
@@ -180,7 +185,7 @@ class MetadataRepository:
             FileMetadata.definition_id == definition_id
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     # ==================== RELATED FILES ====================
     
@@ -210,7 +215,7 @@ class MetadataRepository:
             created_by=created_by
         )
         self.session.add(related)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(related)
         return related
     
@@ -246,13 +251,20 @@ class MetadataRepository:
             raise http_404(msg="Related file link not found")
         
         await self.session.delete(related)
-        await self.session.commit()
+        await self.session.flush()
     
     # ==================== SEARCH ====================
     
-    async def search_files(self, account_id: str, search_request: SearchRequest) -> tuple[List[SearchResult], int]:
-        """Search files by name, metadata, tags, notes"""
-        query = search_request.q.lower()
+    @read_only
+    async def search_files(self, account_id: str, search_request: SearchRequest) -> tuple[Page, int, bool]:
+        """
+        Full-text search over file name, tags, notes and metadata values, best
+        matches first, paged by offset or cursor. Snippets mark matched words
+        with <b></b>.
+        Returns the page, the number of matches counted up to
+        SEARCH_COUNT_LIMIT, and whether there are more than that.
+        """
+        tsquery = build_tsquery(search_request.q, search_request.scope)
         
         # Base query
         stmt = select(FileNew).where(
@@ -267,63 +279,51 @@ class MetadataRepository:
         if search_request.folder_id:
             stmt = stmt.where(FileNew.folder_id == search_request.folder_id)
         
-        # Search conditions based on scope
-        search_conditions = []
-        
-        if search_request.scope in ["name", "all"]:
-            # Search in file name
-            search_conditions.append(FileNew.name.ilike(f"%{query}%"))
-        
-        if search_request.scope in ["metadata", "all"]:
-            # Search in tags
-            search_conditions.append(FileNew.tags.contains([query]))
-            # Search in notes
-            search_conditions.append(FileNew.notes.ilike(f"%{query}%"))
-        
-        # TODO: Content search - placeholder for future implementation
-        # if search_request.scope in ["content", "all"]:
-        #     # This would require full-text search on file content
-        #     pass
-        
-        if search_conditions:
-            stmt = stmt.where(or_(*search_conditions))
+        if tsquery:
+            tsq = func.to_tsquery(SEARCH_CONFIG, tsquery)
+            rank = func.ts_rank(FileNew.search_vector, tsq, type_=Float).label("search_rank")
+            document = func.concat_ws(" · ", FileNew.name, func.array_to_string(FileNew.tags, ", "),
+                                      FileNew.notes, func.dms_file_metadata_text(FileNew.id))
+            snippet = func.ts_headline(SEARCH_CONFIG, document, tsq, "MaxFragments=2, MinWords=5, MaxWords=20")
+            stmt = stmt.where(FileNew.search_vector.op("@@")(tsq)).options(
+                with_expression(FileNew.search_rank, rank),
+                with_expression(FileNew.search_snippet, snippet),
+            )
+            keys = (rank, FileNew.id)
+        else:
+            # Nothing to match words against (e.g. only punctuation): plain name match
+            pattern = re.sub(r"([\\%_])", r"\\\1", search_request.q)
+            stmt = stmt.where(FileNew.name.ilike(f"%{pattern}%", escape="\\"))
+            keys = (FileNew.created_at, FileNew.id)
         
-        # Get total count
-        count_stmt = select(func.count()).select_from(stmt.subquery())
+        # Count matches only up to the limit: a broad query matches most of the index
+        count_limit = settings.search_count_limit
+        count_stmt = select(func.count()).select_from(stmt.limit(count_limit + 1).subquery())
         count_result = await self.session.execute(count_stmt)
         total = count_result.scalar()
-        
-        # Apply pagination
-        stmt = stmt.offset(search_request.skip).limit(search_request.limit)
+        total_capped = total > count_limit
         
         # Load relationships
         stmt = stmt.options(
             selectinload(FileNew.folder).selectinload(FolderNew.section)
         )
         
-        result = await self.session.execute(stmt)
-        files = result.scalars().all()
+        files = await paginate(self.session, stmt, keys,
+                               search_request.cursor, search_request.skip, search_request.limit)
         
         # Build search results
+        terms = re.findall(r"[^\W_]+", search_request.q.lower())
         search_results = []
         for file in files:
             # Determine match type
-            match_type = "name"
-            match_snippet = None
-            
-            if query in file.name.lower():
+            if _matches(terms, file.name):
                 match_type = "name"
-                match_snippet = file.name
-            elif file.tags and any(query in tag.lower() for tag in file.tags):
+            elif file.tags and _matches(terms, " ".join(file.tags)):
                 match_type = "tags"
-                match_snippet = ", ".join(file.tags)
-            elif file.notes and query in file.notes.lower():
+            elif _matches(terms, file.notes):
                 match_type = "notes"
-                # Extract snippet around match
-                idx = file.notes.lower().find(query)
-                start = max(0, idx - 50)
-                end = min(len(file.notes), idx + 50)
-                match_snippet = "..." + file.notes[start:end] + "..."
+            else:
+                match_type = "metadata"
             
             search_results.append(SearchResult(
                 file_id=file.id,
@@ -336,9 +336,20 @@ class MetadataRepository:
                 mime_type=file.mime_type,
                 size_bytes=file.size_bytes,
                 tags=file.tags,
-                match_type=match_type,
-                match_snippet=match_snippet,
+                match_type=match_type if tsquery else "name",
+                match_snippet=file.search_snippet if tsquery else file.name,
                 created_at=file.created_at
             ))
         
-        return search_results, total
+        return Page(search_results, files.next_cursor), min(total, count_limit), total_capped
+
+
+def _matches(terms: List[str], text: Optional[str]) -> bool:
+    """Whether any search term starts a word of text, as the full-text query matched it"""
+    if not text:
+        return False
+    words = re.findall(r"[^\W_]+", text.lower())
+    return any(
+        word.startswith(term) if len(term) >= MIN_PREFIX_LENGTH else word == term
+        for term in terms for word in words
+    )
@@ -6,6 +6,8 @@ from datetime import datetime
 from app.core.exceptions import http_404, http_400
 from app.db.tables.dms.files import FileNew
 from app.db.tables.dms.folders_new import FolderNew
+from app.db.repositories.dms.blob_repository import BlobRepository
+from app.db.pagination import Page, paginate
 
 
 class RecycleBinRepository:
@@ -16,18 +18,18 @@ class RecycleBinRepository:
         self,
         account_id: str,
         skip: int = 0,
-        limit: int = 100
-    ) -> List[FileNew]:
-        """List deleted files in recycle bin"""
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Page:
+        """List deleted files in recycle bin, most recently deleted first"""
         stmt = select(FileNew).where(
             and_(
                 FileNew.account_id == account_id,
                 FileNew.is_deleted == True
             )
-        ).order_by(FileNew.deleted_at.desc()).offset(skip).limit(limit)
+        )
         
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return await paginate(self.session, stmt, (FileNew.deleted_at, FileNew.id), cursor, skip, limit)
     
     async def list_deleted_folders(
         self,
@@ -67,7 +69,7 @@ class RecycleBinRepository:
             file.deleted_at = None
             restored.append(file)
         
-        await self.session.commit()
+        await self.session.flush()
         return restored
     
     async def restore_folders(self, folder_ids: List[str], account_id: str) -> List[FolderNew]:
@@ -91,7 +93,7 @@ class RecycleBinRepository:
             folder.deleted_at = None
             restored.append(folder)
         
-        await self.session.commit()
+        await self.session.flush()
         return restored
     
     async def permanently_delete_files(
@@ -101,92 +103,50 @@ class RecycleBinRepository:
         storage_service
     ) -> int:
         """Permanently delete files from recycle bin"""
-        stmt = select(FileNew).where(
-            and_(
-                FileNew.id.in_(file_ids),
-                FileNew.account_id == account_id,
-                FileNew.is_deleted == True
-            )
-        )
-        result = await self.session.execute(stmt)
-        files = result.scalars().all()
+        blob_repo = BlobRepository(self.session)
+        result = await blob_repo.purge_files(account_id, storage_service, file_ids=file_ids)
         
-        if not files:
+        if not result["files_deleted"]:
             raise http_404(msg="No deleted files found with provided IDs")
-        
-        count = 0
-        for file in files:
-            # Delete from storage
-            try:
-                await storage_service.delete_file(file.storage_path)
-            except Exception:
-                pass  # Continue even if storage deletion fails
-            
-            # Delete from database
-            await self.session.delete(file)
-            count += 1
-        
-        await self.session.commit()
-        return count
+        return result["files_deleted"]
     
     async def permanently_delete_folders(
         self,
         folder_ids: List[str],
-        account_id: str
+        account_id: str,
+        storage_service
     ) -> int:
-        """Permanently delete folders from recycle bin"""
-        stmt = select(FolderNew).where(
-            and_(
-                FolderNew.id.in_(folder_ids),
-                FolderNew.account_id == account_id,
-                FolderNew.is_deleted == True
-            )
-        )
-        result = await self.session.execute(stmt)
-        folders = result.scalars().all()
+        """Permanently delete folders from recycle bin, with everything below them"""
+        blob_repo = BlobRepository(self.session)
+        result = await blob_repo.purge_folders(account_id, storage_service, folder_ids=folder_ids)
         
-        if not folders:
+        if not result["folders_deleted"]:
             raise http_404(msg="No deleted folders found with provided IDs")
-        
-        count = 0
-        for folder in folders:
-            await self.session.delete(folder)
-            count += 1
-        
-        await self.session.commit()
-        return count
+        return result["folders_deleted"]
     
     async def empty_recycle_bin(
         self,
         account_id: str,
         storage_service
-    ) -> dict:
-        """Empty entire recycle bin for an account"""
-        # Get all deleted files
-        files = await self.list_deleted_files(account_id, limit=10000)
-        
-        # Get all deleted folders
-        folders = await self.list_deleted_folders(account_id, limit=10000)
-        
-        # Delete files
-        file_count = 0
-        for file in files:
-            try:
-                await storage_service.delete_file(file.storage_path)
-            except Exception:
-                pass
-            await self.session.delete(file)
-            file_count += 1
-        
-        # Delete folders
-        folder_count = 0
-        for folder in folders:
-            await self.session.delete(folder)
-            folder_count += 1
-        
-        await self.session.commit()
+    ) -> tuple[dict, List[str]]:
+        """
+        Empty entire recycle bin for an account.
+        Returns the stats and the storage keys to delete once the caller has committed.
+        """
+        # Files go in committed chunks, however many there are
+        blob_repo = BlobRepository(self.session)
+        file_stats = await blob_repo.purge_files(account_id, storage_service)
+        
+        # Folders too, with the files below them, the same way
+        folder_stats = await blob_repo.purge_folders(account_id, storage_service)
+        
+        # Recount blob references to reclaim content whose references were
+        # dropped elsewhere (e.g. section deletes cascading to files)
+        blob_stats, reclaimed = await blob_repo.reconcile(account_id)
         
         return {
-            "files_deleted": file_count,
-            "folders_deleted": folder_count
-        }
+            "files_deleted": file_stats["files_deleted"] + folder_stats["files_deleted"],
+            "folders_deleted": folder_stats["folders_deleted"],
+            "objects_deleted": file_stats["objects_deleted"] + folder_stats["objects_deleted"],
+            "blobs_reclaimed": blob_stats["blobs_reclaimed"]
+        }, reclaimed
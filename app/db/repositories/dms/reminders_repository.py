@@ -32,7 +32,7 @@ class RemindersRepository:
             status=ReminderStatus.pending
         )
         self.session.add(reminder)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(reminder)
         return reminder
 
@@ -116,7 +116,7 @@ class RemindersRepository:
             return None
         
         reminder.status = status
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(reminder)
         return reminder
 
@@ -127,7 +127,7 @@ class RemindersRepository:
             return False
         
         await self.session.delete(reminder)
-        await self.session.commit()
+        await self.session.flush()
         return True
 
     async def get_due_reminders(self) -> List[FileReminder]:
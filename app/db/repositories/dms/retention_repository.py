@@ -6,7 +6,8 @@ from datetime import datetime, timedelta
 from app.core.exceptions import http_400, http_404
 from app.db.tables.dms.retention import RetentionPolicy, RetentionMode
 from app.db.tables.dms.files import FileNew
-from app.db.tables.dms.folders_new import FolderNew
+from app.db.tables.dms.folder_closure import subtree_ids
+from app.db.repositories.dms.blob_repository import BlobRepository
 from app.schemas.dms.sharing_schemas import RetentionPolicyCreate, RetentionPolicyUpdate
 
 
@@ -32,7 +33,7 @@ class RetentionRepository:
         
         policy = RetentionPolicy(**policy_data)
         self.session.add(policy)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(policy)
         return policy
     
@@ -71,7 +72,7 @@ class RetentionRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(policy, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(policy)
         return policy
     
@@ -82,23 +83,32 @@ class RetentionRepository:
             raise http_404(msg="Retention policy not found")
         
         await self.session.delete(policy)
-        await self.session.commit()
+        await self.session.flush()
     
-    async def apply_retention_policies(self, account_id: str) -> dict:
-        """Apply all retention policies for an account"""
+    async def apply_retention_policies(self, account_id: str, storage_service) -> dict:
+        """
+        Apply all retention policies for an account. Files past a DELETE policy
+        are purged like recycle bin files, releasing their stored content.
+        """
         # Get all policies for the account
         policies = await self.list_policies(account_id, limit=1000)
         
         moved_count = 0
-        deleted_count = 0
+        delete_ids = []
         
         for policy in policies:
             cutoff_date = datetime.utcnow() - timedelta(days=policy.retention_days)
             
-            # Get files in the folder that are older than retention period
+            # The policy folder, or its whole subtree if apply_to_subfolders
+            if policy.apply_to_subfolders:
+                folder_ids = subtree_ids(policy.folder_id)
+            else:
+                folder_ids = [policy.folder_id]
+            
+            # Get files that are older than retention period
             stmt = select(FileNew).where(
                 and_(
-                    FileNew.folder_id == policy.folder_id,
+                    FileNew.folder_id.in_(folder_ids),
                     FileNew.created_at < cutoff_date,
                     FileNew.is_deleted == False
                 )
@@ -113,44 +123,17 @@ class RetentionRepository:
                     file.deleted_at = datetime.utcnow()
                     moved_count += 1
                 elif policy.mode == RetentionMode.DELETE:
-                    # Hard delete
-                    await self.session.delete(file)
-                    deleted_count += 1
-            
-            # If apply_to_subfolders, handle subfolders recursively
-            if policy.apply_to_subfolders:
-                # Get all subfolders
-                stmt = select(FolderNew).where(
-                    and_(
-                        FolderNew.parent_id == policy.folder_id,
-                        FolderNew.is_deleted == False
-                    )
-                )
-                result = await self.session.execute(stmt)
-                subfolders = result.scalars().all()
-                
-                for subfolder in subfolders:
-                    # Apply policy to subfolder files
-                    stmt = select(FileNew).where(
-                        and_(
-                            FileNew.folder_id == subfolder.id,
-                            FileNew.created_at < cutoff_date,
-                            FileNew.is_deleted == False
-                        )
-                    )
-                    result = await self.session.execute(stmt)
-                    subfolder_files = result.scalars().all()
-                    
-                    for file in subfolder_files:
-                        if policy.mode == RetentionMode.MOVE_TO_RECYCLE:
-                            file.is_deleted = True
-                            file.deleted_at = datetime.utcnow()
-                            moved_count += 1
-                        elif policy.mode == RetentionMode.DELETE:
-                            await self.session.delete(file)
-                            deleted_count += 1
+                    # Hard delete, below
+                    delete_ids.append(file.id)
+        
+        await self.session.flush()
         
-        await self.session.commit()
+        deleted_count = 0
+        if delete_ids:
+            result = await BlobRepository(self.session).purge_files(
+                account_id, storage_service, file_ids=delete_ids, deleted_only=False
+            )
+            deleted_count = result["files_deleted"]
         
         return {
             "moved_to_recycle": moved_count,
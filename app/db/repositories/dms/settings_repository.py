@@ -25,7 +25,7 @@ class SettingsRepository:
                 primary_color="#2563eb"
             )
             self.session.add(settings)
-            await self.session.commit()
+            await self.session.flush()
             await self.session.refresh(settings)
         
         return settings
@@ -37,6 +37,6 @@ class SettingsRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(settings, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(settings)
         return settings
@@ -8,6 +8,7 @@ import secrets
 from app.core.exceptions import http_400, http_404
 from app.db.tables.dms.sharing import Share, ResourceType, TargetType, AccessLevel
 from app.schemas.dms.sharing_schemas import ShareCreate, ShareUpdate
+from app.db.pagination import Page, paginate
 
 
 class SharingRepository:
@@ -25,7 +26,7 @@ class SharingRepository:
         
         share = Share(**share_data)
         self.session.add(share)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(share)
         return share
     
@@ -56,9 +57,10 @@ class SharingRepository:
         resource_type: Optional[str] = None,
         resource_id: Optional[str] = None,
         skip: int = 0,
-        limit: int = 100
-    ) -> List[Share]:
-        """List shares for an account"""
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Page:
+        """List shares for an account, newest first, paged by offset or cursor"""
         stmt = select(Share).where(Share.account_id == account_id)
         
         if resource_type:
@@ -66,9 +68,7 @@ class SharingRepository:
         if resource_id:
             stmt = stmt.where(Share.resource_id == resource_id)
         
-        stmt = stmt.offset(skip).limit(limit).order_by(Share.created_at.desc())
-        result = await self.session.execute(stmt)
-        return result.scalars().all()
+        return await paginate(self.session, stmt, (Share.created_at, Share.id), cursor, skip, limit)
     
     async def list_shares_for_user(
         self,
@@ -106,7 +106,7 @@ class SharingRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(share, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(share)
         return share
     
@@ -117,7 +117,7 @@ class SharingRepository:
             raise http_404(msg="Share not found")
         
         await self.session.delete(share)
-        await self.session.commit()
+        await self.session.flush()
     
     async def check_share_access(
         self,
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -8,6 +8,7 @@ from app.core.exceptions import http_400, http_404, http_403
 from app.db.tables.dms.versioning import FileVersion, FileLock, FileReminder, ReminderStatus
 from app.db.tables.dms.files import FileNew
 from app.db.tables.auth.auth import User
+from app.db.repositories.dms.blob_repository import BlobRepository
 from app.schemas.dms.schemas import FileVersionCreate, FileLockCreate, FileReminderCreate, FileReminderUpdate
 
 
@@ -40,7 +41,7 @@ class VersioningRepository:
         )
         
         self.session.add(version)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(version)
         return version
     
@@ -58,8 +59,12 @@ class VersioningRepository:
         result = await self.session.execute(stmt)
         return result.scalars().all()
     
-    async def restore_version(self, file_id: str, version_id: str) -> FileVersion:
-        """Make a specific version the current one"""
+    async def restore_version(self, file_id: str, version_id: str) -> Tuple[FileVersion, List[str]]:
+        """
+        Make a specific version the current one.
+        Returns the version and the storage keys of reclaimed content, for the
+        caller to delete once the transaction has committed.
+        """
         version = await self.get_version(version_id)
         if not version or version.file_id != file_id:
             raise http_404(msg="Version not found")
@@ -72,14 +77,21 @@ class VersioningRepository:
         if not file:
             raise http_404(msg="File not found")
         
+        # The file's blob reference moves to the restored content
+        old_storage_path = file.storage_path
+        blob_repo = BlobRepository(self.session)
+        await blob_repo.retain(file.account_id, version.storage_path)
+        reclaimed = await blob_repo.release_paths(
+            file.account_id, [old_storage_path], include_legacy=False
+        )
+        
         file.current_version_id = version_id
         file.storage_path = version.storage_path
         file.mime_type = version.mime_type
         file.size_bytes = version.size_bytes
         file.file_hash = version.file_hash
-        
-        await self.session.commit()
-        return version
+        await self.session.flush()
+        return version, reclaimed
     
     # ==================== FILE LOCKS ====================
     
@@ -99,7 +111,7 @@ class VersioningRepository:
         )
         
         self.session.add(lock)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(lock)
         return lock
     
@@ -126,7 +138,7 @@ class VersioningRepository:
             raise http_403(msg="You don't have permission to unlock this file")
         
         await self.session.delete(lock)
-        await self.session.commit()
+        await self.session.flush()
     
     async def check_file_locked(self, file_id: str, user_id: str) -> tuple[bool, Optional[FileLock]]:
         """Check if file is locked by another user"""
@@ -144,7 +156,7 @@ class VersioningRepository:
         from sqlalchemy import delete
         stmt = delete(FileLock).where(FileLock.locked_until <= datetime.utcnow())
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     # ==================== FILE REMINDERS ====================
     
@@ -157,7 +169,7 @@ class VersioningRepository:
         )
         
         self.session.add(reminder)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(reminder)
         return reminder
     
@@ -213,7 +225,7 @@ class VersioningRepository:
             else:
                 setattr(reminder, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(reminder)
         return reminder
     
@@ -224,11 +236,11 @@ class VersioningRepository:
             raise http_404(msg="Reminder not found")
         
         await self.session.delete(reminder)
-        await self.session.commit()
+        await self.session.flush()
     
     async def mark_reminder_sent(self, reminder_id: str):
         """Mark reminder as sent"""
         reminder = await self.get_reminder(reminder_id)
         if reminder:
             reminder.status = ReminderStatus.sent
-            await self.session.commit()
+            await self.session.flush()
@@ -39,7 +39,7 @@ class CommentRepository:
             comment=comment_data.comment,
         )
         self.session.add(db_comment)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(db_comment)
 
         return CommentRead(**db_comment.__dict__)
@@ -88,7 +88,7 @@ class CommentRepository:
             .values(comment=comment_update.comment)
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
 
         await self.session.refresh(comment)
         return CommentRead(**comment.__dict__)
@@ -113,5 +113,5 @@ class CommentRepository:
 
         stmt = delete(self.comment_cls).where(self.comment_cls.id == comment_id)
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
 
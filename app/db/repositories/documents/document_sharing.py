@@ -5,7 +5,6 @@ from datetime import datetime, timedelta, timezone
 from random import randint
 from typing import Dict, Any, Union, List
 
-import boto3
 from botocore.exceptions import NoCredentialsError
 from sqlalchemy import select, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -20,6 +19,7 @@ from app.db.repositories.auth.auth import AuthRepository
 from app.db.repositories.documents.notify import NotifyRepo
 from app.schemas.auth.bands import TokenData
 from app.schemas.documents.document_sharing import SharingRequest
+from app.services.storage_driver import get_s3_client
 
 
 class DocumentSharingRepository:
@@ -28,7 +28,7 @@ class DocumentSharingRepository:
     """
 
     def __init__(self, session: AsyncSession) -> None:
-        self.client = boto3.client("s3")
+        self.client = get_s3_client()
 
         self.session = session
 
@@ -123,7 +123,7 @@ class DocumentSharingRepository:
         )
         try:
             self.session.add(share_entry)
-            await self.session.commit()
+            await self.session.flush()
             await self.session.refresh(share_entry)
 
             response = share_entry.__dict__
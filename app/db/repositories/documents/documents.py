@@ -1,20 +1,19 @@
 import hashlib
+import mimetypes
 import os
-import tempfile
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
-import boto3
-from botocore.exceptions import ClientError
-from fastapi import File
-from starlette.responses import FileResponse
+from fastapi import File, HTTPException
+from fastapi.responses import Response
 from ulid import ULID
 
 from app.api.dependencies.constants import SUPPORTED_FILE_TYPES
-from app.api.dependencies.repositories import TempFileResponse, get_key, get_s3_url
-from app.core.config import settings
+from app.api.dependencies.repositories import get_key, get_s3_url
+from app.api.dependencies.streaming import stream_storage_object
 from app.core.exceptions import http_400, http_404
 from app.db.repositories.documents.documents_metadata import DocumentMetadataRepository
 from app.schemas.auth.bands import TokenData
+from app.services.storage_service import storage_service
 
 
 async def perm_delete(
@@ -34,25 +33,8 @@ async def perm_delete(
 class DocumentRepository:
 
     def __init__(self):
-        boto3_config = {
-            "aws_access_key_id": settings.aws_access_key_id,
-            "aws_secret_access_key": settings.aws_secret_key,
-            "region_name": settings.aws_region,
-        }
-
-        if settings.s3_endpoint_url:
-            boto3_config["endpoint_url"] = settings.s3_endpoint_url
-
-        self.s3_client = boto3.resource("s3", **boto3_config)
-        self.client = boto3.client("s3", **boto3_config)
-        self.s3_bucket = self.s3_client.Bucket(settings.s3_bucket)
-        try:
-            self.client.put_bucket_versioning(
-                Bucket=settings.s3_bucket, VersioningConfiguration={"Status": "Enabled"}
-            )
-        except Exception as e:
-            # Minio does not support versioning in all configurations
-            ...
+        # Objects go through the configured storage backend (bucket versioning is set up at startup)
+        self.storage = storage_service
 
     @staticmethod
     async def _calculate_file_hash(file: File) -> str:
@@ -64,17 +46,11 @@ class DocumentRepository:
         return hashlib.sha256(contents).hexdigest()
 
     async def get_s3_file_object_body(self, key: str):
-        s3_object = self.client.get_object(Bucket=settings.s3_bucket, Key=key)
-        file = s3_object["Body"].read()
-
-        return file
+        return await self.storage.download_file(key)
 
     async def _delete_object(self, key: str) -> None:
 
-        try:
-            self.client.delete_object(Bucket=settings.s3_bucket, Key=key)
-        except Exception as e:
-            raise e
+        await self.storage.delete_file(key)
 
     async def _upload_new_file(
         self, file: File, folder: str, contents, file_type: str, user: TokenData
@@ -85,7 +61,7 @@ class DocumentRepository:
         else:
             key = f"{user.id}/{folder}/{str(ULID())}.{SUPPORTED_FILE_TYPES[file_type]}"
 
-        self.s3_bucket.put_object(Key=key, Body=contents)
+        await self.storage.upload_bytes(key, contents, file_type)
 
         return {
             "response": "file_added",
@@ -111,7 +87,7 @@ class DocumentRepository:
 
         key = await get_key(s3_url=doc["s3_url"])
 
-        self.s3_bucket.put_object(Key=key, Body=contents)
+        await self.storage.upload_bytes(key, contents, file_type)
 
         return {
             "response": "file_updated",
@@ -219,39 +195,55 @@ class DocumentRepository:
         except Exception as e:
             raise http_404(msg="Error uploading the file...") from e
 
-    async def download(self, s3_url: str, name: str) -> Dict[str, str]:
+    async def download(
+        self, document: Dict[str, Any], range_header: Optional[str] = None, if_range: Optional[str] = None
+    ) -> Response:
 
-        key = get_key(s3_url=s3_url)
+        key = await get_key(s3_url=document["s3_url"])
+        media_type = document.get("file_type") or mimetypes.guess_type(document["name"])[0]
 
         try:
-            self.s3_client.meta.client.download_file(
-                Bucket=settings.s3_bucket,
-                Key=await key,
-                Filename=r"/app/downloads/docflow_" + f"{name}",
+            return await stream_storage_object(
+                self.storage,
+                key,
+                media_type=media_type,
+                filename=document["name"],
+                range_header=range_header,
+                if_range=if_range,
+                cache_version=document.get("file_hash"),
             )
-        except ClientError as e:
+        except HTTPException:
+            raise
+        except Exception as e:
             raise http_404(msg=f"File not found: {e}") from e
 
-        return {"message": f"successfully downloaded {name} in downloads folder."}
-
-    async def preview(self, document: Dict[str, Any]) -> FileResponse:
+    async def preview(
+        self, document: Dict[str, Any], range_header: Optional[str] = None, if_range: Optional[str] = None
+    ) -> Response:
 
         key = await get_key(s3_url=document["s3_url"])
 
-        file = await self.get_s3_file_object_body(key)
-
-        # Determining the file extension from the key and media type for File Response
+        # Determining the media type from the key extension, only images and PDFs are previewed
         _, extension = os.path.splitext(key)
         if extension.lower() in [".jpg", ".jpeg", ".png", ".gif"]:
-            media_type = "image/" + extension.lower().lstrip(".")
+            media_type = "image/" + extension.lower().lstrip(".").replace("jpg", "jpeg")
         elif extension.lower() == ".pdf":
             media_type = "application/pdf"
         else:
             raise ValueError("Unsupported file type.")
 
-        # Creating a temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as temp:
-            temp.write(file)
-            temp_path = temp.name
-
-        return TempFileResponse(temp_path, media_type=media_type)
+        try:
+            return await stream_storage_object(
+                self.storage,
+                key,
+                media_type=media_type,
+                filename=document["name"],
+                range_header=range_header,
+                if_range=if_range,
+                disposition="inline",
+                cache_version=document.get("file_hash"),
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise http_404(msg=f"File not found: {e}") from e
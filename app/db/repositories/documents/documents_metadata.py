@@ -106,7 +106,7 @@ class DocumentMetadataRepository:
             doc_id=db_document.__dict__["id"], user_id=user_id
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
 
     async def _delete_access(self, document) -> None:
         await self.session.execute(
@@ -156,7 +156,7 @@ class DocumentMetadataRepository:
 
         try:
             self.session.add(db_document)
-            await self.session.commit()
+            await self.session.flush()
             await self.session.refresh(db_document)
         except IntegrityError as e:
             raise http_404(
@@ -252,7 +252,7 @@ class DocumentMetadataRepository:
 
             self.session.add(db_document)
 
-            await self.session.commit()
+            await self.session.flush()
         except Exception as e:
             raise http_404(msg=f"No file with {document}") from e
 
@@ -435,4 +435,4 @@ class DocumentMetadataRepository:
             ]
             setattr(db_document, "access_to", updated_access_to if updated_access_to else None)
         
-        await self.session.commit()
+        await self.session.flush()
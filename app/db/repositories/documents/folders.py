@@ -74,7 +74,7 @@ class FolderRepository:
 
         try:
             self.session.add(folder)
-            await self.session.commit()
+            await self.session.flush()
             await self.session.refresh(folder)
             return FolderRead(
                 id=str(folder.id),
@@ -52,7 +52,7 @@ class NotifyRepo:
 
                 try:
                     self.session.add(notify_entry)
-                    await self.session.commit()
+                    await self.session.flush()
                     await self.session.refresh(notify_entry)
                 except Exception as e:
                     raise http_500(
@@ -34,7 +34,7 @@ class RBACRepository:
         
         account = Account(**data.model_dump())
         self.session.add(account)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(account)
         return account
     
@@ -56,7 +56,7 @@ class RBACRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(account, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(account)
         return account
     
@@ -66,7 +66,7 @@ class RBACRepository:
             raise http_404(msg="Account not found")
         
         await self.session.delete(account)
-        await self.session.commit()
+        await self.session.flush()
     
     # Role Methods
     async def create_role(self, data: RoleCreate) -> Role:
@@ -81,7 +81,7 @@ class RBACRepository:
         
         role = Role(**data.model_dump())
         self.session.add(role)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(role)
         return role
     
@@ -109,7 +109,7 @@ class RBACRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(role, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(role)
         return role
     
@@ -122,7 +122,7 @@ class RBACRepository:
             raise http_400(msg="Cannot delete system role")
         
         await self.session.delete(role)
-        await self.session.commit()
+        await self.session.flush()
     
     # Group Methods
     async def create_group(self, data: GroupCreate) -> Group:
@@ -137,7 +137,7 @@ class RBACRepository:
         
         group = Group(**data.model_dump())
         self.session.add(group)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(group)
         return group
     
@@ -159,7 +159,7 @@ class RBACRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(group, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(group)
         return group
     
@@ -169,7 +169,7 @@ class RBACRepository:
             raise http_404(msg="Group not found")
         
         await self.session.delete(group)
-        await self.session.commit()
+        await self.session.flush()
     
     # Module Methods
     async def create_module(self, data: ModuleCreate) -> Module:
@@ -181,7 +181,7 @@ class RBACRepository:
         
         module = Module(**data.model_dump())
         self.session.add(module)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(module)
         return module
     
@@ -213,7 +213,7 @@ class RBACRepository:
         
         permission = Permission(**data.model_dump())
         self.session.add(permission)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(permission)
         return permission
     
@@ -235,7 +235,7 @@ class RBACRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(permission, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(permission)
         return permission
     
@@ -245,7 +245,7 @@ class RBACRepository:
             raise http_404(msg="Permission not found")
         
         await self.session.delete(permission)
-        await self.session.commit()
+        await self.session.flush()
     
     # User-Role Assignment
     async def assign_role_to_user(self, user_id: str, role_id: str):
@@ -260,7 +260,7 @@ class RBACRepository:
         
         stmt = user_roles.insert().values(user_id=user_id, role_id=role_id)
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     async def remove_role_from_user(self, user_id: str, role_id: str):
         stmt = delete(user_roles).where(
@@ -268,7 +268,7 @@ class RBACRepository:
             user_roles.c.role_id == role_id
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     # User-Group Assignment
     async def assign_group_to_user(self, user_id: str, group_id: str):
@@ -282,7 +282,7 @@ class RBACRepository:
         
         stmt = user_groups.insert().values(user_id=user_id, group_id=group_id)
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     async def remove_group_from_user(self, user_id: str, group_id: str):
         stmt = delete(user_groups).where(
@@ -290,7 +290,7 @@ class RBACRepository:
             user_groups.c.group_id == group_id
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     # User-Account Assignment
     async def assign_user_to_account(self, user_id: str, account_id: str, role_type: str = "member"):
@@ -308,7 +308,7 @@ class RBACRepository:
             role_type=role_type
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     async def remove_user_from_account(self, user_id: str, account_id: str):
         stmt = delete(account_users).where(
@@ -316,7 +316,7 @@ class RBACRepository:
             account_users.c.account_id == account_id
         )
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     async def update_user_account_role(self, user_id: str, account_id: str, role_type: str):
         from sqlalchemy import update
@@ -325,13 +325,13 @@ class RBACRepository:
             account_users.c.account_id == account_id
         ).values(role_type=role_type)
         await self.session.execute(stmt)
-        await self.session.commit()
+        await self.session.flush()
     
     # Password Policy Methods
     async def create_password_policy(self, data: PasswordPolicyCreate) -> PasswordPolicy:
         policy = PasswordPolicy(**data.model_dump())
         self.session.add(policy)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(policy)
         return policy
     
@@ -355,7 +355,7 @@ class RBACRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(policy, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(policy)
         return policy
     
@@ -371,7 +371,7 @@ class RBACRepository:
             created_by=created_by
         )
         self.session.add(api_key)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(api_key)
         
         return api_key, token
@@ -394,7 +394,7 @@ class RBACRepository:
         for key, value in data.model_dump(exclude_unset=True).items():
             setattr(api_key, key, value)
         
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(api_key)
         return api_key
     
@@ -404,13 +404,13 @@ class RBACRepository:
             raise http_404(msg="API key not found")
         
         await self.session.delete(api_key)
-        await self.session.commit()
+        await self.session.flush()
     
     # Password History
     async def add_password_history(self, user_id: str, password_hash: str):
         history = PasswordHistory(user_id=user_id, password_hash=password_hash)
         self.session.add(history)
-        await self.session.commit()
+        await self.session.flush()
     
     async def get_password_history(self, user_id: str, limit: int = 10) -> List[PasswordHistory]:
         stmt = select(PasswordHistory).where(
@@ -0,0 +1,93 @@
+import functools
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# Set on responses to requests that wrote, so the client's next requests read from the primary
+PRIMARY_COOKIE = "docflow_primary"
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to the replica while it is marked read-only
+    (session.info["read_only"]) and has not written anything. Writes, locking
+    reads and every statement after the first write go to the primary, so a
+    session always reads its own writes; session.info["primary_only"] (the
+    client wrote recently) keeps it off the replica altogether.
+    """
+
+    def __init__(self, *args, replica_bind=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica_bind = replica_bind
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (
+            self.replica_bind is not None
+            and self.info.get("read_only")
+            and not self.info.get("primary_only")
+            and not self.info.get("wrote")
+            and not self._flushing
+        ):
+            return self.replica_bind
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _track_writes(orm_execute_state):
+    # Anything that is not a plain SELECT (DML, raw SQL, SELECT ... FOR UPDATE) pins the session to the primary
+    statement = orm_execute_state.statement
+    if not orm_execute_state.is_select or getattr(statement, "_for_update_arg", None) is not None:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _track_flush(session, flush_context, instances):
+    session.info["wrote"] = True
+
+
+def reads_from_replica(request) -> bool:
+    """GET/HEAD requests read from the replica unless the client wrote recently"""
+    return request.method in ("GET", "HEAD") and not wrote_recently(request)
+
+
+def wrote_recently(request) -> bool:
+    """Whether the client carries the stickiness cookie and must read from the primary"""
+    return PRIMARY_COOKIE in request.cookies
+
+
+def read_only(method):
+    """
+    Mark a repository method as read-only so its queries may use the replica,
+    e.g. searches and listings served by POST endpoints. Has no effect once
+    the session has written, or for clients that wrote recently.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        info = self.session.info
+        previous = info.get("read_only", False)
+        info["read_only"] = True
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            info["read_only"] = previous
+
+    return wrapper
+
+
+async def primary_stickiness(request, call_next):
+    """
+    Middleware: after a request that wrote, keep the client on the primary for
+    DB_REPLICA_STICKY_SECONDS so its next reads see the write despite replica lag
+    """
+    response = await call_next(request)
+    session = getattr(request.state, "db_session", None)
+    if session is not None and session.info.get("wrote"):
+        response.set_cookie(
+            PRIMARY_COOKIE, "1",
+            max_age=settings.db_replica_sticky_seconds,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
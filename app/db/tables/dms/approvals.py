@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Boolean, Enum as SQLEnum
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Boolean, Enum as SQLEnum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import text
 import enum
@@ -46,6 +46,12 @@ class ApprovalWorkflow(Base):
     initiator = relationship("User", foreign_keys=[initiated_by])
     steps = relationship("ApprovalStep", back_populates="workflow", cascade="all, delete-orphan", order_by="ApprovalStep.order_index")
 
+    # Keyset pagination of workflow listings
+    __table_args__ = (
+        Index("ix_approval_workflows_created", "created_at", "id"),
+        Index("ix_approval_workflows_file_created", "file_id", "created_at", "id"),
+    )
+
 
 class StepStatus(enum.Enum):
     """Approval step status"""
@@ -43,4 +43,5 @@ class AuditLog(Base):
         Index("idx_audit_account_action", "account_id", "action"),
         Index("idx_audit_resource", "resource_type", "resource_id"),
         Index("idx_audit_created", "created_at"),
+        Index("idx_audit_account_created", "account_id", "created_at", "id"),
     )
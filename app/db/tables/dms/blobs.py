@@ -0,0 +1,54 @@
+from sqlalchemy import Column, String, BigInteger, Integer, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import text
+
+from app.api.dependencies.repositories import get_ulid
+from app.db.models import Base
+
+
+class StorageBlob(Base):
+    """
+    Content-addressed object in S3/MinIO, stored once per account and keyed by SHA-256.
+    Files, file versions and inbox attachments reference blobs by hash; the
+    object is deleted only when ref_count drops to zero.
+    """
+    __tablename__ = "storage_blobs"
+    
+    id = Column(String(26), primary_key=True, default=get_ulid, unique=True, index=True, nullable=False)
+    account_id = Column(String(26), ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False, index=True)
+    
+    file_hash = Column(String(64), nullable=False)  # SHA-256 of the content
+    storage_path = Column(String(1000), nullable=False)  # blobs/{account_id}/{hash[:2]}/{hash}
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    mime_type = Column(String(200), nullable=True)
+    
+    # Number of files, versions and inbox attachments pointing at this blob
+    ref_count = Column(Integer, nullable=False, default=0)
+    
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
+    
+    # Relationships
+    account = relationship("Account", foreign_keys=[account_id])
+    
+    __table_args__ = (
+        UniqueConstraint("account_id", "file_hash", name="uq_blob_account_hash"),
+        Index("idx_storage_blobs_path", "account_id", "storage_path"),
+    )
+
+
+class StorageBlobChunk(Base):
+    """
+    Chunk of a blob stored as a manifest of content-defined chunks. Each row
+    holds one reference on the chunk's own blob, released when the manifest
+    blob is reclaimed.
+    """
+    __tablename__ = "storage_blob_chunks"
+    
+    blob_id = Column(String(26), ForeignKey("storage_blobs.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    position = Column(Integer, primary_key=True, nullable=False)  # 0-based order in the content
+    chunk_path = Column(String(1000), nullable=False)  # storage_path of the chunk's blob
+    size_bytes = Column(BigInteger, nullable=False, default=0)
+    
+    # Relationships
+    blob = relationship("StorageBlob", foreign_keys=[blob_id])
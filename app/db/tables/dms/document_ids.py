@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, BigInteger, ForeignKey
+
+from app.db.models import Base
+
+
+class DocumentIdCounter(Base):
+    """
+    Per-account counter behind document IDs. Workers reserve blocks of
+    values from it (see app.db.document_ids), so creating a file needs no
+    lookup and concurrent uploads cannot pick the same ID.
+    """
+    __tablename__ = "document_id_counters"
+
+    account_id = Column(String(26), ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    # First value not handed out to any worker yet
+    next_value = Column(BigInteger, nullable=False, server_default="1")
@@ -1,6 +1,7 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Text, BigInteger, DateTime, ForeignKey, Boolean, ARRAY, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, BigInteger, DateTime, ForeignKey, Boolean, ARRAY, UniqueConstraint, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred, query_expression
 from sqlalchemy.sql.expression import text
 
 from app.api.dependencies.repositories import get_ulid
@@ -37,6 +38,13 @@ class FileNew(Base):
     # Tags and Notes
     tags = Column(ARRAY(String), nullable=True)  # Simple tags array
     notes = Column(Text, nullable=True)  # Free-form notes with support for links
+
+    # Full-text search document over name, tags, notes and metadata values,
+    # maintained by database triggers (see app.db.tables.dms.search)
+    search_vector = deferred(Column(TSVECTOR, nullable=True))
+    # Filled in by search queries only
+    search_rank = query_expression()
+    search_snippet = query_expression()
     
     # Office document support
     is_office_doc = Column(Boolean, default=False, nullable=False)
@@ -60,4 +68,9 @@ class FileNew(Base):
     # Ensure unique document_id per account
     __table_args__ = (
         UniqueConstraint("account_id", "document_id", name="uq_file_account_document_id"),
+        # Keyset pagination of listings (sort key + id tie-breaker)
+        Index("ix_files_new_account_created", "account_id", "created_at", "id"),
+        Index("ix_files_new_folder_created", "folder_id", "created_at", "id"),
+        Index("ix_files_new_account_deleted", "account_id", "deleted_at", "id"),
+        Index("ix_files_new_search", "search_vector", postgresql_using="gin"),
     )
@@ -0,0 +1,118 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, event, select
+
+from app.db.models import Base
+
+
+class FolderClosure(Base):
+    """
+    Ancestor index of folders_new: one row per (ancestor, descendant) pair,
+    including each folder paired with itself at depth 0. Maintained by
+    database triggers on folder create and move; deletes cascade.
+    """
+    __tablename__ = "folder_closure"
+
+    ancestor_id = Column(String(26), ForeignKey("folders_new.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    descendant_id = Column(String(26), ForeignKey("folders_new.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_folder_closure_descendant", "descendant_id", "depth"),
+    )
+
+
+def subtree_ids(folder_id, include_self: bool = True):
+    """Select the IDs of a folder and everything below it"""
+    stmt = select(FolderClosure.descendant_id).where(FolderClosure.ancestor_id == folder_id)
+    if not include_self:
+        stmt = stmt.where(FolderClosure.depth > 0)
+    return stmt
+
+
+def ancestor_ids(folder_id, include_self: bool = True):
+    """Select the IDs of a folder's ancestors, nearest first"""
+    stmt = select(FolderClosure.ancestor_id).where(FolderClosure.descendant_id == folder_id)
+    if not include_self:
+        stmt = stmt.where(FolderClosure.depth > 0)
+    return stmt.order_by(FolderClosure.depth)
+
+
+# Trigger functions, triggers and the initial backfill, installed by create_all
+# (see _install_closure_triggers). add_folder_closure carries its own copy; a
+# change here needs a new revision.
+CLOSURE_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_folder_closure() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+            SELECT NEW.id, NEW.id, 0
+            UNION ALL
+            SELECT ancestor_id, NEW.id, depth + 1 FROM folder_closure WHERE descendant_id = NEW.parent_folder_id;
+            RETURN NULL;
+        END IF;
+
+        IF NEW.parent_folder_id IS NOT DISTINCT FROM OLD.parent_folder_id THEN
+            RETURN NULL;
+        END IF;
+
+        IF EXISTS (
+            SELECT 1 FROM folder_closure WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_folder_id
+        ) THEN
+            RAISE EXCEPTION 'Folder % cannot be moved below itself', NEW.id;
+        END IF;
+
+        -- Unlink the subtree from its old ancestors, then link it below the new parent
+        DELETE FROM folder_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = NEW.id)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = NEW.id);
+
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+        SELECT p.ancestor_id, s.descendant_id, p.depth + s.depth + 1
+        FROM folder_closure p, folder_closure s
+        WHERE p.descendant_id = NEW.parent_folder_id AND s.ancestor_id = NEW.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+CLOSURE_BACKFILL = [
+    """
+    INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE tree AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM folders_new
+        UNION ALL
+        SELECT t.ancestor_id, f.id, t.depth + 1 FROM tree t JOIN folders_new f ON f.parent_folder_id = t.descendant_id
+    )
+    SELECT ancestor_id, descendant_id, depth FROM tree
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+CLOSURE_TRIGGERS = [
+    """
+    CREATE TRIGGER trg_folder_closure_insert AFTER INSERT ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folder_closure()
+    """,
+    """
+    CREATE TRIGGER trg_folder_closure_move AFTER UPDATE OF parent_folder_id ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folder_closure()
+    """,
+]
+
+CLOSURE_DROP = [
+    "DROP TRIGGER IF EXISTS trg_folder_closure_insert ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_folder_closure_move ON folders_new",
+    "DROP FUNCTION IF EXISTS dms_folder_closure()",
+]
+
+
+def _install_closure_triggers(target, connection, **kw):
+    """Install the triggers and index existing folders when create_all makes the table"""
+    if connection.dialect.name != "postgresql":
+        return
+    for statement in CLOSURE_FUNCTIONS + CLOSURE_BACKFILL + CLOSURE_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+
+event.listen(FolderClosure.__table__, "after_create", _install_closure_triggers)
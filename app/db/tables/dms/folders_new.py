@@ -1,5 +1,5 @@
 from datetime import datetime, timezone
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Boolean, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.expression import text
 
@@ -24,6 +24,10 @@ class FolderNew(Base):
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"))
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=text("now()"), onupdate=text("now()"))
 
+    # Soft delete (recycle bin)
+    is_deleted = Column(Boolean, default=False, server_default=text("false"), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
     # Relationships
     account = relationship("Account", foreign_keys=[account_id])
     section = relationship("Section", back_populates="folders")
@@ -34,4 +38,6 @@ class FolderNew(Base):
     # Ensure unique folder names within same parent/section
     __table_args__ = (
         UniqueConstraint("section_id", "parent_folder_id", "name", name="uq_folder_section_parent_name"),
+        # Keyset pagination of folder listings
+        Index("ix_folders_new_parent_name", "account_id", "parent_folder_id", "name", "id"),
     )
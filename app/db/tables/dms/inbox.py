@@ -54,6 +54,7 @@ class InboxAttachment(Base):
     
     # Storage (temporary until moved to folder)
     storage_path = Column(String(1000), nullable=False)
+    file_hash = Column(String(64), nullable=True)  # SHA-256, references storage_blobs
     
     # Link to created file (if moved)
     file_id = Column(String(26), ForeignKey("files_new.id", ondelete="SET NULL"), nullable=True)
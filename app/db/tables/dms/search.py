@@ -0,0 +1,117 @@
+import re
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.db.tables.dms.metadata import FileMetadata
+
+# Text search configuration: no stemming or stop words, so file names, codes
+# and any language are indexed as written
+SEARCH_CONFIG = "simple"
+# Shorter search terms match whole words only; a one-letter prefix would match most of the index
+MIN_PREFIX_LENGTH = 3
+# Weights of each part of files_new.search_vector
+SCOPE_WEIGHTS = {"name": "A", "metadata": "BCD"}
+
+
+def build_tsquery(text: str, scope: str = "all") -> Optional[str]:
+    """
+    to_tsquery() input for a search box string: every term must match, longer
+    terms as prefixes. Returns None when the text has no searchable terms.
+    """
+    terms = re.findall(r"[^\W_]+", text.lower())
+    if not terms:
+        return None
+    weights = SCOPE_WEIGHTS.get(scope, "")
+    return " & ".join(
+        f"{term}:*{weights}" if len(term) >= MIN_PREFIX_LENGTH else (f"{term}:{weights}" if weights else term)
+        for term in terms
+    )
+
+
+# files_new.search_vector is kept current by triggers: on the file row itself
+# and when its metadata values change. Installed by create_all (see
+# _install_search_triggers); add_search_vector carries its own copy, so a
+# change here needs a new revision.
+SEARCH_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_file_metadata_text(p_file_id varchar) RETURNS text AS $$
+        -- Scalar values without their JSON quoting
+        SELECT string_agg(value #>> '{}', ' ') FROM file_metadata WHERE file_id = p_file_id
+    $$ LANGUAGE sql STABLE
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION dms_file_search_vector(
+        p_file_id varchar, p_name text, p_tags text[], p_notes text
+    ) RETURNS tsvector AS $$
+        -- Punctuation is also split out so "invoice_2024-03.pdf" matches "invoice" and "2024"
+        SELECT
+            setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(p_name, '') || ' '
+                || regexp_replace(coalesce(p_name, ''), '[^[:alnum:]]+', ' ', 'g')), 'A')
+            || setweight(to_tsvector('{SEARCH_CONFIG}',
+                regexp_replace(coalesce(array_to_string(p_tags, ' '), ''), '[^[:alnum:]]+', ' ', 'g')), 'B')
+            || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(p_notes, '')), 'C')
+            || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(dms_file_metadata_text(p_file_id), '')), 'D')
+    $$ LANGUAGE sql STABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_files_search() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := dms_file_search_vector(NEW.id, NEW.name, NEW.tags, NEW.notes);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_file_metadata_search() RETURNS trigger AS $$
+    DECLARE
+        v_file_id varchar;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            v_file_id := OLD.file_id;
+        ELSE
+            v_file_id := NEW.file_id;
+        END IF;
+        -- No row to update when the file itself is being deleted
+        UPDATE files_new SET search_vector = dms_file_search_vector(id, name, tags, notes)
+        WHERE id = v_file_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER trg_files_search BEFORE INSERT OR UPDATE OF name, tags, notes ON files_new
+    FOR EACH ROW EXECUTE FUNCTION dms_files_search()
+    """,
+    """
+    CREATE TRIGGER trg_file_metadata_search AFTER INSERT OR UPDATE OR DELETE ON file_metadata
+    FOR EACH ROW EXECUTE FUNCTION dms_file_metadata_search()
+    """,
+]
+
+SEARCH_BACKFILL = [
+    "UPDATE files_new SET search_vector = dms_file_search_vector(id, name, tags, notes)",
+]
+
+SEARCH_DROP = [
+    "DROP TRIGGER IF EXISTS trg_file_metadata_search ON file_metadata",
+    "DROP TRIGGER IF EXISTS trg_files_search ON files_new",
+    "DROP FUNCTION IF EXISTS dms_file_metadata_search()",
+    "DROP FUNCTION IF EXISTS dms_files_search()",
+    "DROP FUNCTION IF EXISTS dms_file_search_vector(varchar, text, text[], text)",
+    "DROP FUNCTION IF EXISTS dms_file_metadata_text(varchar)",
+]
+
+
+def _install_search_triggers(target, connection, **kw):
+    """Install the triggers once file_metadata exists (files_new is created before it)"""
+    if connection.dialect.name != "postgresql":
+        return
+    for statement in SEARCH_FUNCTIONS + SEARCH_TRIGGERS + SEARCH_BACKFILL:
+        connection.exec_driver_sql(statement)
+
+
+event.listen(FileMetadata.__table__, "after_create", _install_search_triggers)
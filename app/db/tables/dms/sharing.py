@@ -64,4 +64,5 @@ class Share(Base):
     __table_args__ = (
         Index("idx_share_resource", "resource_type", "resource_id"),
         Index("idx_share_target", "target_type", "target_id"),
+        Index("idx_share_account_created", "account_id", "created_at", "id"),
     )
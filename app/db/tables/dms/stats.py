@@ -0,0 +1,323 @@
+from sqlalchemy import Column, String, BigInteger, ForeignKey, event
+
+from app.db.models import Base
+
+
+class FolderStats(Base):
+    """
+    Counters of a folder, maintained by database triggers on files_new and
+    folders_new so listings never count rows. Direct counters cover the
+    folder itself, total_* counters the whole subtree. Soft-deleted files
+    are not counted.
+    """
+    __tablename__ = "folder_stats"
+
+    folder_id = Column(String(26), ForeignKey("folders_new.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    file_count = Column(BigInteger, nullable=False, server_default="0")
+    bytes = Column(BigInteger, nullable=False, server_default="0")
+    folder_count = Column(BigInteger, nullable=False, server_default="0")
+    total_file_count = Column(BigInteger, nullable=False, server_default="0")
+    total_bytes = Column(BigInteger, nullable=False, server_default="0")
+    total_folder_count = Column(BigInteger, nullable=False, server_default="0")
+
+
+class SectionStats(Base):
+    """Counters of a whole section, maintained alongside FolderStats"""
+    __tablename__ = "section_stats"
+
+    section_id = Column(String(26), ForeignKey("sections.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    folder_count = Column(BigInteger, nullable=False, server_default="0")
+    file_count = Column(BigInteger, nullable=False, server_default="0")
+    total_bytes = Column(BigInteger, nullable=False, server_default="0")
+
+
+# Trigger functions, triggers and the initial backfill, installed by create_all
+# (see _install_stats_triggers). Migrations keep their own copy of the SQL they
+# install: a change here needs a new revision.
+STATS_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_stats_apply(
+        p_folder_ids varchar[], p_section_ids varchar[],
+        p_files bigint[], p_bytes bigint[], p_folders bigint[]
+    ) RETURNS void AS $$
+    DECLARE
+        v_ids varchar[];
+        v_files bigint[];
+        v_bytes bigint[];
+        v_folders bigint[];
+        v_direct_files bigint[];
+        v_direct_bytes bigint[];
+        v_direct_folders bigint[];
+    BEGIN
+        -- Applies every change of one statement at once. Entry i is either files
+        -- changed directly in folder i (p_folders = 0) or a subtree of p_folders
+        -- folders (including its root) added to or taken from folder i, or from
+        -- section i's root when the folder is NULL. Rows are locked in one
+        -- order, section_stats first and then folder_stats, each by id, so
+        -- concurrent writers queue instead of deadlocking.
+
+        -- Entries whose folder is gone were deleted together with an ancestor,
+        -- which already took its subtree out
+        WITH entries AS (
+            SELECT coalesce(f.section_id, e.section_id) AS section_id, e.files, e.bytes, e.folders
+            FROM unnest(p_folder_ids, p_section_ids, p_files, p_bytes, p_folders)
+                AS e(folder_id, section_id, files, bytes, folders)
+            LEFT JOIN folders_new f ON f.id = e.folder_id
+            WHERE e.folder_id IS NULL OR f.id IS NOT NULL
+        )
+        SELECT array_agg(section_id ORDER BY section_id), array_agg(files ORDER BY section_id),
+               array_agg(bytes ORDER BY section_id), array_agg(folders ORDER BY section_id)
+        INTO v_ids, v_files, v_bytes, v_folders
+        FROM (
+            SELECT section_id, sum(files)::bigint AS files, sum(bytes)::bigint AS bytes, sum(folders)::bigint AS folders
+            FROM entries GROUP BY section_id
+        ) deltas;
+
+        PERFORM 1 FROM section_stats WHERE section_id = ANY(v_ids) ORDER BY section_id FOR UPDATE;
+        UPDATE section_stats s SET
+            file_count = s.file_count + d.files,
+            total_bytes = s.total_bytes + d.bytes,
+            folder_count = s.folder_count + d.folders
+        FROM unnest(v_ids, v_files, v_bytes, v_folders) AS d(section_id, files, bytes, folders)
+        WHERE s.section_id = d.section_id;
+
+        -- Each entry counts towards its folder and every ancestor
+        WITH RECURSIVE entries AS (
+            SELECT folder_id, sum(files) AS files, sum(bytes) AS bytes, sum(folders) AS folders,
+                   sum(CASE WHEN folders = 0 THEN files ELSE 0 END) AS direct_files,
+                   sum(CASE WHEN folders = 0 THEN bytes ELSE 0 END) AS direct_bytes,
+                   sum(sign(folders)) AS direct_folders
+            FROM unnest(p_folder_ids, p_files, p_bytes, p_folders) AS e(folder_id, files, bytes, folders)
+            WHERE folder_id IS NOT NULL
+            GROUP BY folder_id
+        ), chain AS (
+            SELECT f.id AS start_id, f.id, f.parent_folder_id
+            FROM entries e JOIN folders_new f ON f.id = e.folder_id
+            UNION ALL
+            SELECT c.start_id, f.id, f.parent_folder_id
+            FROM chain c JOIN folders_new f ON f.id = c.parent_folder_id
+        )
+        SELECT array_agg(folder_id ORDER BY folder_id), array_agg(files ORDER BY folder_id),
+               array_agg(bytes ORDER BY folder_id), array_agg(folders ORDER BY folder_id),
+               array_agg(direct_files ORDER BY folder_id), array_agg(direct_bytes ORDER BY folder_id),
+               array_agg(direct_folders ORDER BY folder_id)
+        INTO v_ids, v_files, v_bytes, v_folders, v_direct_files, v_direct_bytes, v_direct_folders
+        FROM (
+            SELECT c.id AS folder_id,
+                   sum(e.files)::bigint AS files, sum(e.bytes)::bigint AS bytes, sum(e.folders)::bigint AS folders,
+                   coalesce(sum(e.direct_files) FILTER (WHERE c.id = c.start_id), 0)::bigint AS direct_files,
+                   coalesce(sum(e.direct_bytes) FILTER (WHERE c.id = c.start_id), 0)::bigint AS direct_bytes,
+                   coalesce(sum(e.direct_folders) FILTER (WHERE c.id = c.start_id), 0)::bigint AS direct_folders
+            FROM chain c JOIN entries e ON e.folder_id = c.start_id
+            GROUP BY c.id
+        ) deltas;
+
+        PERFORM 1 FROM folder_stats WHERE folder_id = ANY(v_ids) ORDER BY folder_id FOR UPDATE;
+        UPDATE folder_stats s SET
+            file_count = s.file_count + d.direct_files,
+            bytes = s.bytes + d.direct_bytes,
+            folder_count = s.folder_count + d.direct_folders,
+            total_file_count = s.total_file_count + d.files,
+            total_bytes = s.total_bytes + d.bytes,
+            total_folder_count = s.total_folder_count + d.folders
+        FROM unnest(v_ids, v_files, v_bytes, v_folders, v_direct_files, v_direct_bytes, v_direct_folders)
+            AS d(folder_id, files, bytes, folders, direct_files, direct_bytes, direct_folders)
+        WHERE s.folder_id = d.folder_id;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_files_stats() RETURNS trigger AS $$
+    DECLARE
+        v_folder_ids varchar[];
+        v_files bigint[];
+        v_bytes bigint[];
+    BEGIN
+        -- Net change per folder; moves, soft deletes, restores and new versions
+        -- come out of the update case, where unchanged rows cancel out
+        IF TG_OP = 'INSERT' THEN
+            SELECT array_agg(folder_id), array_agg(files), array_agg(bytes) INTO v_folder_ids, v_files, v_bytes
+            FROM (
+                SELECT folder_id, count(*) AS files, coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM new_rows WHERE NOT is_deleted GROUP BY folder_id
+            ) changes;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT array_agg(folder_id), array_agg(files), array_agg(bytes) INTO v_folder_ids, v_files, v_bytes
+            FROM (
+                SELECT folder_id, -count(*) AS files, -coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM old_rows WHERE NOT is_deleted GROUP BY folder_id
+            ) changes;
+        ELSE
+            SELECT array_agg(folder_id), array_agg(files), array_agg(bytes) INTO v_folder_ids, v_files, v_bytes
+            FROM (
+                SELECT folder_id, sum(files)::bigint AS files, sum(bytes)::bigint AS bytes
+                FROM (
+                    SELECT folder_id, 1 AS files, size_bytes AS bytes FROM new_rows WHERE NOT is_deleted
+                    UNION ALL
+                    SELECT folder_id, -1, -size_bytes FROM old_rows WHERE NOT is_deleted
+                ) rows
+                GROUP BY folder_id
+                HAVING sum(files) <> 0 OR sum(bytes) <> 0
+            ) changes;
+        END IF;
+
+        IF v_folder_ids IS NOT NULL THEN
+            PERFORM dms_stats_apply(
+                v_folder_ids, array_fill(NULL::varchar, ARRAY[cardinality(v_folder_ids)]),
+                v_files, v_bytes, array_fill(0::bigint, ARRAY[cardinality(v_folder_ids)])
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_folders_stats() RETURNS trigger AS $$
+    DECLARE
+        subtree folder_stats%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO folder_stats (folder_id) VALUES (NEW.id);
+            PERFORM dms_stats_apply(ARRAY[NEW.parent_folder_id], ARRAY[NEW.section_id],
+                ARRAY[0::bigint], ARRAY[0::bigint], ARRAY[1::bigint]);
+            RETURN NULL;
+        END IF;
+
+        SELECT * INTO subtree FROM folder_stats WHERE folder_id = OLD.id;
+        IF TG_OP = 'DELETE' THEN
+            -- Runs before the delete, while the folder's counters still exist
+            PERFORM dms_stats_apply(ARRAY[OLD.parent_folder_id], ARRAY[OLD.section_id],
+                ARRAY[-subtree.total_file_count], ARRAY[-subtree.total_bytes],
+                ARRAY[-(subtree.total_folder_count + 1)]);
+            RETURN OLD;
+        END IF;
+
+        IF NEW.parent_folder_id IS DISTINCT FROM OLD.parent_folder_id
+           OR NEW.section_id IS DISTINCT FROM OLD.section_id THEN
+            -- Detach from the old place and attach at the new one in a single call
+            PERFORM dms_stats_apply(
+                ARRAY[OLD.parent_folder_id, NEW.parent_folder_id], ARRAY[OLD.section_id, NEW.section_id],
+                ARRAY[-subtree.total_file_count, subtree.total_file_count],
+                ARRAY[-subtree.total_bytes, subtree.total_bytes],
+                ARRAY[-(subtree.total_folder_count + 1), subtree.total_folder_count + 1]
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_sections_stats() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO section_stats (section_id) VALUES (NEW.id);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+STATS_BACKFILL = [
+    "INSERT INTO section_stats (section_id) SELECT id FROM sections ON CONFLICT DO NOTHING",
+    """
+    INSERT INTO folder_stats (folder_id, file_count, bytes, folder_count)
+    SELECT f.id, coalesce(files.files, 0), coalesce(files.bytes, 0), coalesce(children.folders, 0)
+    FROM folders_new f
+    LEFT JOIN (
+        SELECT folder_id, count(*) AS files, sum(size_bytes) AS bytes
+        FROM files_new WHERE NOT is_deleted GROUP BY folder_id
+    ) files ON files.folder_id = f.id
+    LEFT JOIN (
+        SELECT parent_folder_id, count(*) AS folders
+        FROM folders_new WHERE parent_folder_id IS NOT NULL GROUP BY parent_folder_id
+    ) children ON children.parent_folder_id = f.id
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    WITH RECURSIVE tree AS (
+        SELECT id AS ancestor_id, id AS folder_id FROM folders_new
+        UNION ALL
+        SELECT t.ancestor_id, f.id FROM tree t JOIN folders_new f ON f.parent_folder_id = t.folder_id
+    )
+    UPDATE folder_stats s SET
+        total_file_count = totals.files,
+        total_bytes = totals.bytes,
+        total_folder_count = totals.folders
+    FROM (
+        SELECT t.ancestor_id, sum(d.file_count) AS files, sum(d.bytes) AS bytes, count(*) - 1 AS folders
+        FROM tree t JOIN folder_stats d ON d.folder_id = t.folder_id
+        GROUP BY t.ancestor_id
+    ) totals
+    WHERE s.folder_id = totals.ancestor_id
+    """,
+    """
+    UPDATE section_stats s SET
+        folder_count = totals.folders,
+        file_count = totals.files,
+        total_bytes = totals.bytes
+    FROM (
+        SELECT f.section_id, count(*) AS folders, sum(d.file_count) AS files, sum(d.bytes) AS bytes
+        FROM folders_new f JOIN folder_stats d ON d.folder_id = f.id
+        GROUP BY f.section_id
+    ) totals
+    WHERE s.section_id = totals.section_id
+    """,
+]
+
+STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER trg_files_stats_insert AFTER INSERT ON files_new
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dms_files_stats()
+    """,
+    """
+    CREATE TRIGGER trg_files_stats_update AFTER UPDATE ON files_new
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dms_files_stats()
+    """,
+    """
+    CREATE TRIGGER trg_files_stats_delete AFTER DELETE ON files_new
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION dms_files_stats()
+    """,
+    """
+    CREATE TRIGGER trg_folders_stats_insert AFTER INSERT ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folders_stats()
+    """,
+    """
+    CREATE TRIGGER trg_folders_stats_move AFTER UPDATE OF parent_folder_id, section_id ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folders_stats()
+    """,
+    """
+    CREATE TRIGGER trg_folders_stats_delete BEFORE DELETE ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folders_stats()
+    """,
+    """
+    CREATE TRIGGER trg_sections_stats_insert AFTER INSERT ON sections
+    FOR EACH ROW EXECUTE FUNCTION dms_sections_stats()
+    """,
+]
+
+STATS_DROP = [
+    "DROP TRIGGER IF EXISTS trg_files_stats_insert ON files_new",
+    "DROP TRIGGER IF EXISTS trg_files_stats_update ON files_new",
+    "DROP TRIGGER IF EXISTS trg_files_stats_delete ON files_new",
+    "DROP TRIGGER IF EXISTS trg_folders_stats_insert ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_folders_stats_move ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_folders_stats_delete ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_sections_stats_insert ON sections",
+    "DROP FUNCTION IF EXISTS dms_sections_stats()",
+    "DROP FUNCTION IF EXISTS dms_folders_stats()",
+    "DROP FUNCTION IF EXISTS dms_files_stats()",
+    "DROP FUNCTION IF EXISTS dms_stats_apply(varchar[], varchar[], bigint[], bigint[], bigint[])",
+]
+
+
+def _install_stats_triggers(target, connection, **kw):
+    """Install the triggers once both stats tables exist (create_all orders them freely)"""
+    if connection.dialect.name != "postgresql":
+        return
+    if not all(connection.dialect.has_table(connection, name) for name in ("folder_stats", "section_stats")):
+        return
+    for statement in STATS_FUNCTIONS + STATS_BACKFILL + STATS_TRIGGERS:
+        connection.exec_driver_sql(statement)
+
+
+event.listen(FolderStats.__table__, "after_create", _install_stats_triggers)
+event.listen(SectionStats.__table__, "after_create", _install_stats_triggers)
@@ -5,9 +5,12 @@ from fastapi.responses import FileResponse
 
 from app.api.router import router
 from app.core.config import settings
-from app.db.models import check_tables
+from app.db.models import check_tables, pool_stats, replica_engine
+from app.db.routing import primary_stickiness
 from app.logs.logger import docflow_logger
 from app.scripts.init_bucket import create_bucket_if_not_exists
+from app.services.storage_cache import get_storage_cache
+from app.services.storage_driver import get_storage_driver
 
 # Import all models to ensure they are registered with SQLAlchemy Base
 from app.db.tables.auth.auth import User  # noqa: F401
@@ -26,6 +29,11 @@ from app.db.tables.dms.folders_new import FolderNew  # noqa: F401
 from app.db.tables.dms.files import FileNew  # noqa: F401
 from app.db.tables.dms.metadata import MetadataDefinition, FileMetadata, RelatedFile  # noqa: F401
 from app.db.tables.dms.versioning import FileVersion, FileLock, FileReminder  # noqa: F401
+from app.db.tables.dms.blobs import StorageBlob, StorageBlobChunk  # noqa: F401
+from app.db.tables.dms.stats import FolderStats, SectionStats  # noqa: F401
+from app.db.tables.dms.folder_closure import FolderClosure  # noqa: F401
+from app.db.tables.dms.document_ids import DocumentIdCounter  # noqa: F401
+from app.db.tables.dms import search  # noqa: F401  (full-text search triggers)
 from app.db.tables.dms.approvals import (  # noqa: F401
     ApprovalWorkflow, ApprovalStep, FolderApprovalRule, FolderApprovalRuleApprover,
     NotificationSettings, Notification
@@ -46,6 +54,9 @@ async def lifespan(app: FastAPI):
         raise
     yield
 
+    # let in-flight storage calls finish before the worker exits
+    get_storage_driver().shutdown()
+
 
 app = FastAPI(
     title=settings.title,
@@ -102,6 +113,9 @@ app.openapi = custom_openapi
 
 app.include_router(router=router, prefix=settings.api_prefix)
 
+if replica_engine is not None:
+    app.middleware("http")(primary_stickiness)
+
 
 FAVICON_PATH = "favicon.ico"
 
@@ -125,3 +139,18 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "DocFlow API", "version": settings.version}
+
+
+@app.get("/health/storage-cache", tags=["Default"])
+async def storage_cache_stats():
+    """Disk cache hit/miss/byte counters"""
+    cache = get_storage_cache()
+    if not cache:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@app.get("/health/db-pool", tags=["Default"])
+async def db_pool_stats():
+    """Database connection pool occupancy and checkout wait counters"""
+    return pool_stats()
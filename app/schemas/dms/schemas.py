@@ -96,6 +96,7 @@ class SearchRequest(BaseModel):
     scope: str = Field("all", pattern=r'^(name|metadata|content|all)$')
     skip: int = Field(0, ge=0)
     limit: int = Field(50, ge=1, le=100)
+    cursor: Optional[str] = None  # next_cursor of the previous page; skip is ignored
 
 
 class SearchResult(BaseModel):
@@ -116,9 +117,11 @@ class SearchResult(BaseModel):
 
 class SearchResponse(BaseModel):
     results: List[SearchResult]
-    total: int
+    total: int  # at most SEARCH_COUNT_LIMIT
+    total_capped: bool = False  # more matches than total
     query: str
     scope: str
+    next_cursor: Optional[str] = None
 
 
 # Section Schemas
@@ -146,6 +149,7 @@ class SectionOut(SectionBase):
     updated_at: datetime
     folder_count: int = 0
     file_count: int = 0
+    total_bytes: int = 0
 
     class Config:
         from_attributes = True
@@ -186,6 +190,16 @@ class FolderTree(FolderOut):
     """Folder with nested subfolders"""
     subfolders: List['FolderTree'] = []
     file_count: int = 0
+    folder_count: int = 0
+
+
+class FolderTreeNode(BaseModel):
+    """Compact folder tree node; the tree is rebuilt from parent_folder_id"""
+    id: str
+    parent_folder_id: Optional[str]
+    name: str
+    file_count: int = 0
+    folder_count: int = 0
 
 
 # File Schemas
@@ -267,6 +281,59 @@ class BulkUploadResponse(BaseModel):
     fail_count: int
 
 
+# Direct-to-storage Upload Schemas
+class DirectUploadRequest(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=500)
+    mime_type: Optional[str] = None
+    size_bytes: int = Field(..., ge=0)
+    file_hash: str = Field(..., pattern=r'^[0-9a-f]{64}$')  # SHA-256, hex
+
+
+class DirectUploadOut(BaseModel):
+    upload_required: bool  # False when the account already holds this content
+    storage_key: Optional[str] = None
+    url: Optional[str] = None  # Single PUT (send the x-amz-checksum-sha256 header)
+    upload_id: Optional[str] = None  # Multipart: PUT each part to part_urls, in order
+    part_size: Optional[int] = None
+    part_urls: Optional[List[str]] = None
+    expires_in: int
+
+
+class DirectUploadPart(BaseModel):
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str
+
+
+class DirectUploadComplete(DirectUploadRequest):
+    storage_key: Optional[str] = None
+    upload_id: Optional[str] = None
+    parts: Optional[List[DirectUploadPart]] = None
+
+
+class DirectUploadAbort(BaseModel):
+    storage_key: str
+    upload_id: Optional[str] = None
+
+
+class ChunkRef(BaseModel):
+    hash: str = Field(..., pattern=r'^[0-9a-f]{64}$')  # SHA-256 of the chunk, hex
+    size_bytes: int = Field(..., ge=1)
+
+
+class ChunkedUploadRequest(BaseModel):
+    mime_type: Optional[str] = None
+    size_bytes: int = Field(..., ge=1)
+    file_hash: str = Field(..., pattern=r'^[0-9a-f]{64}$')  # SHA-256 of the whole content
+    chunks: List[ChunkRef] = Field(..., min_length=1)  # In content order
+
+
+class ChunkedUploadOut(BaseModel):
+    upload_required: bool  # False when the account already holds this content
+    missing_chunks: List[str] = []  # PUT each of these before completing
+    chunk_size: int  # Suggested average chunk size
+    max_chunk_size: int
+
+
 # Download All Request
 class DownloadAllRequest(BaseModel):
     account_id: Optional[str] = None
@@ -169,6 +169,7 @@ class AuditLogQuery(BaseModel):
     resource_id: Optional[str] = None
     skip: int = Field(0, ge=0)
     limit: int = Field(50, ge=1, le=500)
+    cursor: Optional[str] = None  # next_cursor of the previous page; skip is ignored
 
 
 # Profile Settings Schemas
@@ -1,29 +1,38 @@
 import asyncio
+import os
 
-import boto3
 from botocore.exceptions import ClientError
 
 from app.core.config import settings
 from app.logs.logger import s3_logger
+from app.services.storage_driver import get_s3_client
 
 
 async def create_bucket_if_not_exists():
-    """Create S3/MinIO bucket if it doesn't exist"""
-    try:
-        boto3_config = {
-            "aws_access_key_id": settings.aws_access_key_id,
-            "aws_secret_access_key": settings.aws_secret_key,
-            "region_name": settings.aws_region,
-        }
-
-        if settings.s3_endpoint_url:
-            boto3_config["endpoint_url"] = settings.s3_endpoint_url
+    """
+    Create S3/MinIO bucket if it doesn't exist. Runs once at startup and
+    builds the shared S3 client, so its connection pool is warm before the
+    first request.
+    """
+    if settings.storage_backend == "local":
+        os.makedirs(settings.storage_local_root, exist_ok=True)
+        s3_logger.info(f"✅ Using local storage at '{settings.storage_local_root}'")
+        return
 
-        client = boto3.client("s3", **boto3_config)
+    try:
+        client = get_s3_client()
 
         try:
             client.head_bucket(Bucket=settings.s3_bucket)
             s3_logger.info(f"✅ Bucket '{settings.s3_bucket}' already exists")
+            try:
+                # Legacy documents overwrite keys in place and rely on versioning
+                client.put_bucket_versioning(
+                    Bucket=settings.s3_bucket,
+                    VersioningConfiguration={"Status": "Enabled"},
+                )
+            except Exception as ve:
+                s3_logger.warning(f"⚠️  Could not enable versioning: {ve}")
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
             if error_code == "404":
@@ -0,0 +1,113 @@
+import hashlib
+import json
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+# Storage keys of chunk manifests: small JSON objects listing the chunks of a blob
+MANIFEST_PREFIX = "manifests/"
+
+# Each boundary bit is a hash of three consecutive bytes, built from one
+# pseudo-random byte->bit table per position. The tables and the pattern are
+# fixed: changing them moves every boundary and defeats deduplication against
+# content that is already stored.
+_BIT_TABLES = [
+    bytes(hashlib.sha256(b"docflow-cdc:%d:%d" % (position, value)).digest()[0] & 1 for value in range(256))
+    for position in range(3)
+]
+_PATTERN_SEED = hashlib.sha256(b"docflow-cdc-pattern").digest()
+_PATTERN = bytes((_PATTERN_SEED[i // 8] >> (i % 8)) & 1 for i in range(64))
+
+
+def _boundary_bits(data: bytes, context: bytes) -> bytes:
+    """
+    One 0/1 byte per input byte, each depending on that byte and the two
+    before it (context holds the last two bytes of the previous block).
+    Big-int XOR combines the translated streams without a per-byte loop.
+    """
+    source = context + data
+    combined = 0
+    for position, table in enumerate(_BIT_TABLES):
+        combined ^= int.from_bytes(source[position:position + len(data)].translate(table), "big")
+    return combined.to_bytes(len(data), "big")
+
+
+def is_manifest(storage_path: Optional[str]) -> bool:
+    """Whether a storage key holds a chunk manifest rather than the content itself"""
+    return bool(storage_path) and storage_path.startswith(MANIFEST_PREFIX)
+
+
+def encode_manifest(file_hash: str, size_bytes: int, mime_type: Optional[str],
+                    chunks: List[Tuple[str, int]]) -> bytes:
+    """Serialize a manifest. chunks: List of (storage_path, size_bytes) in content order"""
+    return json.dumps({
+        "sha256": file_hash,
+        "size": size_bytes,
+        "mime_type": mime_type,
+        "chunks": [[storage_path, size] for storage_path, size in chunks]
+    }, separators=(",", ":")).encode()
+
+
+def decode_manifest(data: bytes) -> dict:
+    """Parse a manifest written by encode_manifest"""
+    manifest = json.loads(data)
+    manifest["chunks"] = [(storage_path, size) for storage_path, size in manifest["chunks"]]
+    return manifest
+
+
+class ContentChunker:
+    """
+    Content-defined chunking. Every byte gets a pseudo-random bit derived from
+    the bytes around it and a boundary is placed after each occurrence of a
+    fixed bit pattern, which bytes.find locates at C speed. A boundary depends
+    only on the bytes just before it, so inserting or removing data only
+    changes the chunks around the edit and the rest of the file dedups against
+    the previous version. Chunks are kept between avg_size / 4 and avg_size * 4.
+    """
+
+    def __init__(self, avg_size: int):
+        self.min_size = max(avg_size // 4, 64)
+        self.max_size = max(avg_size * 4, self.min_size * 2)
+        bits = min(max((avg_size - self.min_size).bit_length() - 1, 8), len(_PATTERN))
+        self.pattern = _PATTERN[:bits]
+
+    def iter_chunks(self, source: BinaryIO) -> Iterator[bytes]:
+        """Split a readable binary file into chunks, holding at most two max_size reads"""
+        buffer = bytearray()
+        bits = bytearray()
+        context = bytes(len(_BIT_TABLES) - 1)
+        eof = False
+        while True:
+            while not eof and len(buffer) < self.max_size:
+                data = source.read(self.max_size)
+                if not data:
+                    eof = True
+                    break
+                bits += _boundary_bits(data, context)
+                context = (context + data)[-len(context):]
+                buffer += data
+
+            if not buffer:
+                return
+
+            size = min(len(buffer), self.max_size)
+            if len(buffer) > self.min_size:
+                index = bits.find(self.pattern, self.min_size - len(self.pattern), self.max_size)
+                if index != -1:
+                    size = index + len(self.pattern)
+
+            yield bytes(buffer[:size])
+            del buffer[:size]
+            del bits[:size]
+
+    def plan(self, source: BinaryIO) -> Tuple[int, str, List[Tuple[int, int, str]]]:
+        """
+        Chunk and hash a file without keeping its content
+        Returns: (size_bytes, file_hash, [(offset, size_bytes, chunk_hash), ...])
+        """
+        hasher = hashlib.sha256()
+        chunks = []
+        offset = 0
+        for chunk in self.iter_chunks(source):
+            hasher.update(chunk)
+            chunks.append((offset, len(chunk), hashlib.sha256(chunk).hexdigest()))
+            offset += len(chunk)
+        return offset, hasher.hexdigest(), chunks
@@ -0,0 +1,151 @@
+import asyncio
+import io
+import threading
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import settings
+from app.logs.logger import docflow_logger
+from app.services.storage_service import StorageService, storage_service
+
+# Longest edge, in pixels, of each rendition
+RENDITION_SIZES = {"thumbnail": 256, "preview": 1024}
+RENDITION_MEDIA_TYPE = "image/webp"
+
+# pdfium is not thread-safe: PDF pages are rendered one at a time
+_pdf_lock = threading.Lock()
+
+
+def rendition_path(account_id: str, file_hash: str, size: str) -> str:
+    """Storage key of a rendition; content-addressed, so it never goes stale"""
+    return f"renditions/{account_id}/{file_hash[:2]}/{file_hash}/{size}.webp"
+
+
+def rendition_keys(account_id: str, file_hash: str) -> List[str]:
+    """Every rendition key a blob can have, for cleanup when the blob is reclaimed"""
+    return [rendition_path(account_id, file_hash, size) for size in RENDITION_SIZES]
+
+
+def supports_renditions(mime_type: Optional[str]) -> bool:
+    """Images and PDFs get thumbnails and previews"""
+    if not mime_type:
+        return False
+    return (mime_type.startswith("image/") and mime_type != "image/svg+xml") or mime_type == "application/pdf"
+
+
+def render_rendition(data: bytes, mime_type: str, max_px: int) -> Optional[bytes]:
+    """
+    Render an image, or the first page of a PDF, scaled to fit max_px and
+    encoded as WebP. Returns None when the imaging libraries are not installed.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    if mime_type == "application/pdf":
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            return None
+
+        with _pdf_lock:
+            pdf = pdfium.PdfDocument(data)
+            try:
+                page = pdf[0]
+                width, height = page.get_size()
+                image = page.render(scale=max_px / max(width, height, 1)).to_pil()
+            finally:
+                pdf.close()
+    else:
+        image = Image.open(io.BytesIO(data))
+        # JPEGs decode straight at a reduced scale
+        image.draft("RGB", (max_px, max_px))
+        image = ImageOps.exif_transpose(image)
+
+    image.thumbnail((max_px, max_px))
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    output = io.BytesIO()
+    image.save(output, "WEBP", quality=80)
+    return output.getvalue()
+
+
+class RenditionService:
+    """
+    Thumbnails and first-page previews. Each rendition is rendered once per
+    content hash and size and kept in storage, so listing views never fetch
+    originals. Rendering runs on the storage pool; concurrent requests for
+    the same rendition share one render.
+    """
+
+    def __init__(self, storage: StorageService):
+        self.storage = storage
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._failed = set()
+
+    async def get_or_create(self, account_id: str, file_hash: str, storage_path: str,
+                            mime_type: Optional[str], size: str) -> Optional[str]:
+        """
+        Storage key of the rendition, rendering it first if needed.
+        Returns None when the content cannot be rendered.
+        """
+        if not file_hash or not supports_renditions(mime_type):
+            return None
+
+        key = rendition_path(account_id, file_hash, size)
+        if key in self._failed:
+            return None
+        if await self.storage.file_exists(key):
+            return key
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._render(key, storage_path, mime_type, RENDITION_SIZES[size])
+            )
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        # A client going away must not cancel a render other requests wait on
+        return await asyncio.shield(task)
+
+    async def _render(self, key: str, storage_path: str, mime_type: str, max_px: int) -> Optional[str]:
+        info = await self.storage.get_file_info(storage_path)
+        if info["size"] > settings.rendition_max_source_bytes:
+            self._mark_failed(key)
+            return None
+
+        data = await self.storage.download_file(storage_path)
+        try:
+            image = await self.storage.driver.run(render_rendition, data, mime_type, max_px)
+        except Exception as e:
+            docflow_logger.warning(f"Failed to render {storage_path}: {str(e)}")
+            image = None
+
+        if image is None:
+            self._mark_failed(key)
+            return None
+
+        await self.storage.upload_bytes(key, image, RENDITION_MEDIA_TYPE)
+        return key
+
+    def _mark_failed(self, key: str):
+        """Remember content that cannot be rendered so it is not fetched again"""
+        if len(self._failed) >= 10000:
+            self._failed.clear()
+        self._failed.add(key)
+
+    async def generate(self, account_id: str, file_hash: str, storage_path: str,
+                       mime_type: Optional[str], sizes: Sequence[str] = ("thumbnail",)):
+        """Render ahead of the first request; meant to run as a background task after uploads"""
+        for size in sizes:
+            try:
+                await self.get_or_create(account_id, file_hash, storage_path, mime_type, size)
+            except Exception as e:
+                docflow_logger.warning(f"Failed to render {storage_path}: {str(e)}")
+
+
+# Singleton instance
+rendition_service = RenditionService(storage_service)
@@ -0,0 +1,545 @@
+import base64
+import hashlib
+import mimetypes
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+from ulid import ULID
+
+from app.core.config import settings
+from app.services.storage_driver import AsyncStorageDriver, get_storage_driver
+
+
+class StorageBackend(ABC):
+    """
+    Object storage primitives used by StorageService. Keys are storage paths
+    such as "blobs/<account>/<xx>/<sha256>". Blocking work runs on the shared
+    storage driver pool; failures are raised as Exception("Failed to ...").
+    The presign_* methods are only needed with supports_presigned_urls.
+    """
+    
+    supports_presigned_urls = False
+    
+    def __init__(self, driver: AsyncStorageDriver):
+        self.driver = driver
+    
+    @abstractmethod
+    async def put_object(self, key: str, data: bytes, content_type: Optional[str] = None):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def create_multipart_upload(self, key: str, content_type: Optional[str] = None) -> str:
+        """Start a multipart upload and return its upload ID"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Upload one part and return its ETag"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[dict]):
+        """Assemble the object from parts: List of {PartNumber, ETag}"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def head(self, key: str, checksum: bool = False) -> dict:
+        """
+        Object metadata without the body
+        Returns: {size, etag, last_modified, content_type, checksum_sha256}
+        """
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def read(self, key: str) -> bytes:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def open_stream(self, key: str, byte_range: Optional[Tuple[int, int]],
+                          chunk_size: int) -> AsyncIterator[bytes]:
+        """Open an object (or an inclusive byte range) and return a chunk iterator"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def delete(self, key: str):
+        raise NotImplementedError
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        """Delete a batch of objects; returns how many were deleted"""
+        for key in keys:
+            await self.delete(key)
+        return len(keys)
+    
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def copy(self, source_key: str, key: str):
+        raise NotImplementedError
+    
+    async def hash_object(self, key: str, chunk_size: int) -> str:
+        """SHA-256 of a stored object"""
+        hasher = hashlib.sha256()
+        async for chunk in await self.open_stream(key, None, chunk_size):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+    
+    def local_path(self, key: str) -> Optional[str]:
+        """Filesystem path of the object when it can be served directly, else None"""
+        return None
+    
+    async def presign_get(self, key: str, expires_in: int, filename: Optional[str] = None,
+                          content_type: Optional[str] = None) -> str:
+        raise NotImplementedError
+    
+    async def presign_put(self, key: str, content_type: str, file_hash: str, expires_in: int) -> str:
+        raise NotImplementedError
+    
+    async def presign_upload_parts(self, key: str, upload_id: str, part_count: int,
+                                   expires_in: int) -> List[str]:
+        raise NotImplementedError
+
+
+class S3StorageBackend(StorageBackend):
+    """S3/MinIO through the pooled boto3 client"""
+    
+    supports_presigned_urls = True
+    
+    def __init__(self, driver: AsyncStorageDriver, bucket: Optional[str] = None):
+        super().__init__(driver)
+        self.bucket = bucket or settings.s3_bucket
+    
+    @property
+    def client(self):
+        return self.driver.client
+    
+    async def put_object(self, key: str, data: bytes, content_type: Optional[str] = None):
+        try:
+            await self.driver.call(
+                'put_object',
+                Bucket=self.bucket,
+                Key=key,
+                Body=data,
+                ContentType=content_type or 'application/octet-stream'
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to upload file: {str(e)}")
+    
+    async def create_multipart_upload(self, key: str, content_type: Optional[str] = None) -> str:
+        try:
+            upload = await self.driver.call(
+                'create_multipart_upload',
+                Bucket=self.bucket,
+                Key=key,
+                ContentType=content_type or 'application/octet-stream'
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to start upload: {str(e)}")
+        return upload['UploadId']
+    
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        try:
+            response = await self.driver.call(
+                'upload_part',
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=data
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to upload file: {str(e)}")
+        return response['ETag']
+    
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[dict]):
+        try:
+            await self.driver.call(
+                'complete_multipart_upload',
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': sorted(parts, key=lambda part: part['PartNumber'])}
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to complete upload: {str(e)}")
+    
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        try:
+            await self.driver.call(
+                'abort_multipart_upload',
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload_id
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to abort upload: {str(e)}")
+    
+    async def head(self, key: str, checksum: bool = False) -> dict:
+        params = {'Bucket': self.bucket, 'Key': key}
+        if checksum:
+            params['ChecksumMode'] = 'ENABLED'
+        
+        try:
+            response = await self.driver.call('head_object', **params)
+        except ClientError as e:
+            raise Exception(f"Failed to get file info: {str(e)}")
+        
+        return {
+            'size': response['ContentLength'],
+            'etag': response.get('ETag'),
+            'last_modified': response.get('LastModified'),
+            'content_type': response.get('ContentType'),
+            'checksum_sha256': response.get('ChecksumSHA256')
+        }
+    
+    async def read(self, key: str) -> bytes:
+        try:
+            response = await self.driver.call('get_object', Bucket=self.bucket, Key=key)
+            return await self.driver.run(response['Body'].read)
+        except ClientError as e:
+            raise Exception(f"Failed to download file: {str(e)}")
+    
+    async def open_stream(self, key: str, byte_range: Optional[Tuple[int, int]],
+                          chunk_size: int) -> AsyncIterator[bytes]:
+        params = {'Bucket': self.bucket, 'Key': key}
+        if byte_range:
+            params['Range'] = f"bytes={byte_range[0]}-{byte_range[1]}"
+        
+        try:
+            response = await self.driver.call('get_object', **params)
+        except ClientError as e:
+            raise Exception(f"Failed to download file: {str(e)}")
+        
+        return self._iter_body(response['Body'], chunk_size)
+    
+    async def _iter_body(self, body, chunk_size: int) -> AsyncIterator[bytes]:
+        """Yield an S3 body in chunks and always release the connection"""
+        try:
+            while True:
+                chunk = await self.driver.run(body.read, chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+    
+    async def delete(self, key: str):
+        try:
+            await self.driver.call('delete_object', Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            raise Exception(f"Failed to delete file: {str(e)}")
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        # One DeleteObjects request per batch (S3 accepts up to 1000 keys)
+        try:
+            response = await self.driver.call(
+                'delete_objects',
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to delete files: {str(e)}")
+        return len(keys) - len(response.get('Errors', []))
+    
+    async def exists(self, key: str) -> bool:
+        try:
+            await self.driver.call('head_object', Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+    
+    async def copy(self, source_key: str, key: str):
+        # The managed transfer switches to multipart copy for large objects
+        try:
+            await self.driver.run(
+                self.client.copy,
+                {'Bucket': self.bucket, 'Key': source_key},
+                self.bucket,
+                key
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to copy file: {str(e)}")
+    
+    async def presign_get(self, key: str, expires_in: int, filename: Optional[str] = None,
+                          content_type: Optional[str] = None) -> str:
+        params = {'Bucket': self.bucket, 'Key': key}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        if content_type:
+            params['ResponseContentType'] = content_type
+        
+        try:
+            return await self.driver.call(
+                'generate_presigned_url',
+                ClientMethod='get_object',
+                Params=params,
+                ExpiresIn=expires_in
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to generate URL: {str(e)}")
+    
+    async def presign_put(self, key: str, content_type: str, file_hash: str, expires_in: int) -> str:
+        # The SHA-256 is signed into the request, so storage rejects a body that does not match
+        try:
+            return await self.driver.call(
+                'generate_presigned_url',
+                ClientMethod='put_object',
+                Params={
+                    'Bucket': self.bucket,
+                    'Key': key,
+                    'ContentType': content_type,
+                    'ChecksumSHA256': base64.b64encode(bytes.fromhex(file_hash)).decode()
+                },
+                ExpiresIn=expires_in
+            )
+        except ClientError as e:
+            raise Exception(f"Failed to generate URL: {str(e)}")
+    
+    async def presign_upload_parts(self, key: str, upload_id: str, part_count: int,
+                                   expires_in: int) -> List[str]:
+        def presign_parts():
+            return [
+                self.client.generate_presigned_url(
+                    ClientMethod='upload_part',
+                    Params={
+                        'Bucket': self.bucket,
+                        'Key': key,
+                        'UploadId': upload_id,
+                        'PartNumber': part_number
+                    },
+                    ExpiresIn=expires_in
+                )
+                for part_number in range(1, part_count + 1)
+            ]
+        
+        try:
+            return await self.driver.run(presign_parts)
+        except ClientError as e:
+            raise Exception(f"Failed to generate URL: {str(e)}")
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Objects stored as plain files under a root directory, for single-node
+    deployments, development and tests without an object store. Writes go to
+    a temporary file that is renamed into place, so readers never see partial
+    objects, and objects can be served with sendfile straight from disk.
+    """
+    
+    MULTIPART_DIR = ".multipart"
+    
+    def __init__(self, driver: AsyncStorageDriver, root: str):
+        super().__init__(driver)
+        self.root = os.path.abspath(root)
+        os.makedirs(os.path.join(self.root, self.MULTIPART_DIR), exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep) or key.startswith(self.MULTIPART_DIR):
+            raise Exception(f"Failed to resolve storage path: {key}")
+        return path
+    
+    def _upload_dir(self, upload_id: str) -> str:
+        if not re.fullmatch(r"[0-9A-Za-z]+", upload_id or ""):
+            raise Exception("Failed to find upload: invalid upload ID")
+        return os.path.join(self.root, self.MULTIPART_DIR, upload_id)
+    
+    @staticmethod
+    def _write_atomic(path: str, write) -> None:
+        """Write through a temporary file in the target directory, then rename over path"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                write(target)
+                target.flush()
+                os.fsync(target.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+    
+    async def put_object(self, key: str, data: bytes, content_type: Optional[str] = None):
+        path = self._path(key)
+        try:
+            await self.driver.run(self._write_atomic, path, lambda target: target.write(data))
+        except OSError as e:
+            raise Exception(f"Failed to upload file: {str(e)}")
+    
+    async def create_multipart_upload(self, key: str, content_type: Optional[str] = None) -> str:
+        self._path(key)
+        upload_id = str(ULID())
+        try:
+            await self.driver.run(os.makedirs, self._upload_dir(upload_id))
+        except OSError as e:
+            raise Exception(f"Failed to start upload: {str(e)}")
+        return upload_id
+    
+    async def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        path = os.path.join(self._upload_dir(upload_id), f"{part_number:05d}")
+        try:
+            await self.driver.run(self._write_atomic, path, lambda target: target.write(data))
+        except OSError as e:
+            raise Exception(f"Failed to upload file: {str(e)}")
+        return f'"{hashlib.md5(data).hexdigest()}"'
+    
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: List[dict]):
+        path = self._path(key)
+        upload_dir = self._upload_dir(upload_id)
+        
+        def assemble(target):
+            for part in sorted(parts, key=lambda part: part['PartNumber']):
+                with open(os.path.join(upload_dir, f"{part['PartNumber']:05d}"), "rb") as source:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+        
+        try:
+            await self.driver.run(self._write_atomic, path, assemble)
+        except OSError as e:
+            raise Exception(f"Failed to complete upload: {str(e)}")
+        await self.driver.run(shutil.rmtree, upload_dir, True)
+    
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        await self.driver.run(shutil.rmtree, self._upload_dir(upload_id), True)
+    
+    async def head(self, key: str, checksum: bool = False) -> dict:
+        try:
+            stat = await self.driver.run(os.stat, self._path(key))
+        except OSError as e:
+            raise Exception(f"Failed to get file info: {str(e)}")
+        
+        return {
+            'size': stat.st_size,
+            'etag': f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+            'last_modified': datetime.fromtimestamp(int(stat.st_mtime), timezone.utc),
+            'content_type': mimetypes.guess_type(key)[0],
+            'checksum_sha256': None
+        }
+    
+    async def read(self, key: str) -> bytes:
+        def read_file():
+            with open(self._path(key), "rb") as source:
+                return source.read()
+        
+        try:
+            return await self.driver.run(read_file)
+        except OSError as e:
+            raise Exception(f"Failed to download file: {str(e)}")
+    
+    async def open_stream(self, key: str, byte_range: Optional[Tuple[int, int]],
+                          chunk_size: int) -> AsyncIterator[bytes]:
+        try:
+            source = await self.driver.run(open, self._path(key), "rb")
+        except OSError as e:
+            raise Exception(f"Failed to download file: {str(e)}")
+        
+        remaining = None
+        if byte_range:
+            await self.driver.run(source.seek, byte_range[0])
+            remaining = byte_range[1] - byte_range[0] + 1
+        return self._iter_file(source, chunk_size, remaining)
+    
+    async def _iter_file(self, source, chunk_size: int, remaining: Optional[int]) -> AsyncIterator[bytes]:
+        try:
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = await self.driver.run(source.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            source.close()
+    
+    async def delete(self, key: str):
+        try:
+            await self.driver.run(os.remove, self._path(key))
+        except FileNotFoundError:
+            pass  # Deletes are idempotent, as on S3
+        except OSError as e:
+            raise Exception(f"Failed to delete file: {str(e)}")
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        paths = [self._path(key) for key in keys]
+        
+        def remove_all():
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            return len(paths)
+        
+        try:
+            return await self.driver.run(remove_all)
+        except OSError as e:
+            raise Exception(f"Failed to delete files: {str(e)}")
+    
+    async def exists(self, key: str) -> bool:
+        return await self.driver.run(os.path.isfile, self._path(key))
+    
+    async def copy(self, source_key: str, key: str):
+        source_path = self._path(source_key)
+        path = self._path(key)
+        
+        def link_or_copy():
+            # Objects are immutable once written, so a hard link is a free copy
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{ULID()}.tmp"
+            try:
+                os.link(source_path, temp_path)
+            except OSError:
+                shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, path)
+        
+        try:
+            await self.driver.run(link_or_copy)
+        except OSError as e:
+            raise Exception(f"Failed to copy file: {str(e)}")
+    
+    async def hash_object(self, key: str, chunk_size: int) -> str:
+        def digest():
+            with open(self._path(key), "rb") as source:
+                if os.fstat(source.fileno()).st_size == 0:
+                    return hashlib.sha256().hexdigest()
+                # Hash straight from the page cache without copying into Python buffers
+                with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return hashlib.sha256(mapped).hexdigest()
+        
+        try:
+            return await self.driver.run(digest)
+        except OSError as e:
+            raise Exception(f"Failed to download file: {str(e)}")
+    
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+
+_backend = None
+
+
+def get_storage_backend() -> StorageBackend:
+    """Process-wide backend selected by STORAGE_BACKEND ("s3" or "local")"""
+    global _backend
+    if _backend is None:
+        if settings.storage_backend == "local":
+            _backend = LocalStorageBackend(get_storage_driver(), settings.storage_local_root)
+        else:
+            _backend = S3StorageBackend(get_storage_driver())
+    return _backend
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Dict, Optional, Set
+
+from app.core.config import settings
+
+
+class StorageCache:
+    """
+    Size-bounded on-disk LRU cache for stored objects.
+    Entries are keyed by storage path plus a content version (SHA-256 or ETag),
+    so a new version or a restore never serves stale bytes: it simply misses.
+    Files are written to a temporary name and renamed into place, so readers
+    only ever see complete entries, and hits are handed out as open files, so
+    an entry evicted while it is being served is still read to the end.
+    The LRU index and the size bound are per process: N workers sharing one
+    directory can use up to N x max_bytes of disk.
+    """
+    
+    def __init__(self, directory: str, max_bytes: int, max_object_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._paths: Dict[str, Set[str]] = {}
+        self._size = 0
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "bytes_served": 0,
+            "bytes_written": 0,
+            "evictions": 0
+        }
+        
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+    
+    def _load_existing(self):
+        """Index entries left by a previous process, least recently used first"""
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith("tmp") or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_atime, name, stat.st_size))
+        
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._size += size
+        self._evict()
+    
+    @staticmethod
+    def _key(storage_path: str, version: str) -> str:
+        return hashlib.sha256(f"{storage_path}\0{version}".encode()).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+    
+    def open_entry(self, storage_path: str, version: Optional[str]) -> Optional[BinaryIO]:
+        """
+        Open a cached object for reading, or return None on a miss. The file is
+        opened under the lock that evictions take, and an open file outlives
+        the removal of its entry.
+        """
+        if not version:
+            return None
+        
+        key = self._key(storage_path, version)
+        with self._lock:
+            if key in self._entries:
+                try:
+                    source = open(self._path(key), "rb")
+                except OSError:
+                    source = None
+                if source:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["bytes_served"] += self._entries[key]
+                    return source
+            
+            self._remove(key)
+            self._stats["misses"] += 1
+            return None
+    
+    def accepts(self, size_bytes: int) -> bool:
+        """Whether an object of this size is worth caching"""
+        return 0 < size_bytes <= min(self.max_object_bytes, self.max_bytes)
+    
+    def create_temp(self):
+        """Open a temporary file in the cache directory for a new entry"""
+        return tempfile.NamedTemporaryFile(dir=self.directory, prefix="tmp", delete=False)
+    
+    def commit(self, storage_path: str, version: str, temp_path: str):
+        """Move a fully written temporary file into the cache"""
+        key = self._key(storage_path, version)
+        size = os.path.getsize(temp_path)
+        os.replace(temp_path, self._path(key))
+        
+        with self._lock:
+            self._size += size - self._entries.get(key, 0)
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._paths.setdefault(storage_path, set()).add(key)
+            self._stats["bytes_written"] += size
+            self._evict()
+    
+    @staticmethod
+    def discard(temp_path: str):
+        """Drop a partially written entry"""
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+    
+    def invalidate(self, storage_path: str):
+        """Forget every cached version of a storage path (e.g. after a delete)"""
+        with self._lock:
+            for key in self._paths.pop(storage_path, set()):
+                self._remove(key)
+    
+    def _remove(self, key: str):
+        size = self._entries.pop(key, None)
+        if size is None:
+            return
+        self._size -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+    
+    def _evict(self):
+        """Drop least recently used entries until the cache fits (lock held)"""
+        while self._size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self._stats["evictions"] += 1
+    
+    def stats(self) -> dict:
+        """Hit/miss/byte counters for sizing the cache"""
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_ratio": self._stats["hits"] / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
+
+
+_cache = None
+
+
+def get_storage_cache() -> Optional[StorageCache]:
+    """Process-wide cache, or None when STORAGE_CACHE_DIR is not set"""
+    global _cache
+    if _cache is None and settings.storage_cache_dir:
+        _cache = StorageCache(
+            settings.storage_cache_dir,
+            settings.storage_cache_max_bytes,
+            settings.storage_cache_max_object_bytes
+        )
+    return _cache
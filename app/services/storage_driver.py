@@ -0,0 +1,99 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import boto3
+from botocore.config import Config
+
+from app.core.config import settings
+
+
+class AsyncStorageDriver:
+    """
+    Runs blocking boto3 calls on a bounded thread pool so S3/MinIO round trips
+    never block the event loop. The pool size and the HTTP connection pool
+    are sized together, so in-flight I/O scales up to s3_io_workers.
+    """
+
+    def __init__(self, client=None, max_workers: int = None):
+        self.max_workers = max_workers or settings.s3_io_workers
+        self._client = client
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="storage-io"
+        )
+
+    @property
+    def client(self):
+        """boto3 client, the shared process-wide one unless the driver was given its own"""
+        if self._client is None:
+            self._client = get_s3_client()
+        return self._client
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the storage pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def call(self, operation: str, **kwargs) -> Any:
+        """Invoke a boto3 client operation (put_object, get_object, ...) off the loop"""
+        return await self.run(getattr(self.client, operation), **kwargs)
+
+    def shutdown(self):
+        """Stop accepting work and wait for in-flight calls to finish"""
+        self.executor.shutdown(wait=True)
+
+
+def build_s3_client():
+    """Create a boto3 client with a connection pool sized for the worker pool"""
+    return boto3.session.Session().client(
+        's3',
+        endpoint_url=settings.s3_endpoint_url,
+        aws_access_key_id=settings.aws_access_key_id,
+        aws_secret_access_key=settings.aws_secret_key,
+        region_name=settings.aws_region,
+        config=Config(
+            max_pool_connections=settings.s3_max_pool_connections,
+            tcp_keepalive=settings.s3_tcp_keepalive,
+            connect_timeout=settings.s3_connect_timeout,
+            read_timeout=settings.s3_read_timeout,
+            retries={
+                "max_attempts": settings.s3_max_attempts,
+                "mode": settings.s3_retry_mode
+            }
+        )
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Process-wide boto3 S3 client shared by the storage driver, the legacy
+    repositories and bucket initialization. It is built once (the lock keeps
+    concurrent first calls from building several) and boto3 clients are safe
+    to use from any thread, so every request reuses its connection pool.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = build_s3_client()
+    return _client
+
+
+_driver = None
+
+
+def get_storage_driver() -> AsyncStorageDriver:
+    """Process-wide driver shared by every StorageService instance"""
+    global _driver
+    if _driver is None:
+        _driver = AsyncStorageDriver()
+    return _driver
@@ -1,168 +1,717 @@
-import boto3
+import asyncio
+import base64
 import hashlib
 import zipfile
-import io
+import mimetypes
 import os
-from typing import List, BinaryIO, Optional, Tuple
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import List, BinaryIO, AsyncIterator, Optional, Tuple
 from fastapi import UploadFile
-from botocore.exceptions import ClientError
 import tempfile
 import shutil
 
 from app.core.config import settings
+from app.logs.logger import docflow_logger
+from app.services.storage_backends import StorageBackend, S3StorageBackend, get_storage_backend
+from app.services.storage_cache import get_storage_cache
+from app.services.chunking import ContentChunker, decode_manifest, encode_manifest, is_manifest
+from app.services.storage_driver import AsyncStorageDriver, get_storage_driver
 
+# S3 rejects multipart parts smaller than 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
+# ... and larger than 5 GiB, and uploads of more than 10 000 parts
+MAX_PART_SIZE = 5 * 1024 * 1024 * 1024
+MAX_PARTS = 10000
+# Part size doubles until a file needs at most this many parts
+TARGET_PARTS = 1000
 
-class StorageService:
-    """Service for handling file storage operations with S3/MinIO"""
+# S3 DeleteObjects accepts at most 1000 keys per request
+DELETE_BATCH_SIZE = 1000
+
+# Parsed chunk manifests kept in memory (they are immutable and small)
+MANIFEST_CACHE_SIZE = 256
+
+# Formats that are already compressed: deflating them again only burns CPU
+STORED_MIME_TYPES = {
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/heic',
+    'application/zip', 'application/x-zip-compressed', 'application/gzip',
+    'application/x-gzip', 'application/x-7z-compressed', 'application/x-rar-compressed',
+    'application/x-bzip2',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
+STORED_MIME_PREFIXES = ('video/', 'audio/')
+
+
+class _ZipStreamBuffer:
+    """
+    Write-only, non-seekable sink for zipfile. zipfile falls back to data
+    descriptors when it cannot seek, so the archive can be emitted as it is built.
+    """
     
     def __init__(self):
-        self.s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.s3_endpoint_url,
-            aws_access_key_id=settings.aws_access_key_id,
-            aws_secret_access_key=settings.aws_secret_key,
-            region_name=settings.aws_region
-        )
-        self.bucket = settings.s3_bucket
+        self._buffer = bytearray()
+        self._position = 0
+    
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        """Return and clear everything written since the last drain"""
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+class StorageService:
+    """Service for handling file storage operations on the configured backend (S3/MinIO or local disk)"""
+    
+    def __init__(self, driver: Optional[AsyncStorageDriver] = None,
+                 backend: Optional[StorageBackend] = None):
+        # Blocking work goes through the shared driver pool so it runs off the event loop
+        self.driver = driver or get_storage_driver()
+        if backend is None:
+            backend = S3StorageBackend(self.driver) if driver else get_storage_backend()
+        self.backend = backend
+        self.part_size = max(settings.s3_upload_part_size, MIN_PART_SIZE)
+        self.download_chunk_size = settings.s3_download_chunk_size
+        self.cache = get_storage_cache()
+        self.chunker = ContentChunker(settings.storage_chunk_size)
+        self._manifests: "OrderedDict[str, dict]" = OrderedDict()
     
     async def upload_file(self, file: UploadFile, storage_path: str) -> Tuple[int, str]:
         """
         Upload file to S3/MinIO
         Returns: (size_bytes, file_hash)
         """
-        # Read file content
-        content = await file.read()
-        size_bytes = len(content)
+        return await self.upload_file_stream(file, storage_path)
+    
+    async def upload_file_stream(
+        self,
+        file: UploadFile,
+        storage_path: str,
+        content_type: Optional[str] = None,
+        size_bytes: Optional[int] = None
+    ) -> Tuple[int, str]:
+        """
+        Stream an upload to S3/MinIO, hashing as it goes.
+        Files that fit in a single part are sent with one put_object, larger
+        ones go through a multipart upload with several parts in flight at
+        once; part size and concurrency follow the file size (size_bytes,
+        when the upload object does not know it) and memory stays bounded by
+        s3_upload_max_buffer regardless of the file size.
+        Returns: (size_bytes, file_hash)
+        """
+        content_type = content_type or file.content_type or 'application/octet-stream'
+        part_size, concurrency = self.plan_upload(size_bytes or getattr(file, 'size', None))
+        hasher = hashlib.sha256()
+        
+        await file.seek(0)
+        chunk = await self._read_part(file, part_size)
         
-        # Calculate hash
-        file_hash = hashlib.sha256(content).hexdigest()
+        if len(chunk) < part_size:
+            # Small file: a single request is cheaper than a multipart upload
+            hasher.update(chunk)
+            await self.backend.put_object(storage_path, chunk, content_type)
+            await file.seek(0)
+            return len(chunk), hasher.hexdigest()
         
-        # Upload to S3
+        upload_id = await self.backend.create_multipart_upload(storage_path, content_type)
+        parts = []
+        in_flight = set()
+        size_bytes = 0
         try:
-            self.s3_client.put_object(
-                Bucket=self.bucket,
-                Key=storage_path,
-                Body=content,
-                ContentType=file.content_type or 'application/octet-stream'
-            )
-        except ClientError as e:
-            raise Exception(f"Failed to upload file: {str(e)}")
+            part_number = 1
+            while chunk:
+                if len(in_flight) >= concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        parts.append(task.result())
+                
+                in_flight.add(asyncio.ensure_future(
+                    self._upload_part(storage_path, upload_id, part_number, chunk)
+                ))
+                part_number += 1
+                size_bytes += len(chunk)
+                
+                # Hash this part on the pool while the next one is read from the upload
+                hashed = asyncio.ensure_future(self.driver.run(hasher.update, chunk))
+                try:
+                    chunk = await self._read_part(file, part_size)
+                finally:
+                    await hashed
+            
+            if in_flight:
+                parts.extend(await asyncio.gather(*in_flight))
+                in_flight = set()
+            parts.sort(key=lambda part: part['PartNumber'])
+            await self.backend.complete_multipart_upload(storage_path, upload_id, parts)
+        except BaseException:
+            # Never leave an orphaned multipart upload behind, even when the request is cancelled
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            try:
+                await asyncio.shield(self.backend.abort_multipart_upload(storage_path, upload_id))
+            except Exception:
+                pass
+            raise
+        
+        await file.seek(0)
+        return size_bytes, hasher.hexdigest()
+    
+    def plan_upload(self, size_bytes: Optional[int]) -> Tuple[int, int]:
+        """
+        Part size and number of parts in flight for an upload of size_bytes
+        (None when unknown). Large files use larger parts so they need fewer
+        requests, and concurrency is capped so that the parts held in memory
+        stay within s3_upload_max_buffer.
+        Returns: (part_size, concurrency)
+        """
+        part_size = self.part_size
+        part_count = None
+        if size_bytes:
+            while part_size < MAX_PART_SIZE and (
+                size_bytes > part_size * TARGET_PARTS or size_bytes > part_size * MAX_PARTS
+            ):
+                part_size = min(part_size * 2, MAX_PART_SIZE)
+            part_count = -(-size_bytes // part_size)
+        
+        concurrency = max(1, min(settings.s3_upload_concurrency,
+                                 settings.s3_upload_max_buffer // part_size))
+        if part_count:
+            concurrency = min(concurrency, part_count)
+        return part_size, concurrency
+    
+    async def _upload_part(self, storage_path: str, upload_id: str, part_number: int,
+                           data: bytes) -> dict:
+        etag = await self.backend.upload_part(storage_path, upload_id, part_number, data)
+        return {'ETag': etag, 'PartNumber': part_number}
+    
+    async def hash_file(self, file: UploadFile) -> Tuple[int, str]:
+        """
+        Hash an upload locally (FastAPI spools uploads to disk) without sending it anywhere
+        Returns: (size_bytes, file_hash)
+        """
+        hasher = hashlib.sha256()
+        size_bytes = 0
+        
+        await file.seek(0)
+        while True:
+            chunk = await file.read(self.part_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            size_bytes += len(chunk)
+        await file.seek(0)
         
-        # Reset file pointer
+        return size_bytes, hasher.hexdigest()
+    
+    async def _read_part(self, file: UploadFile, part_size: int) -> bytes:
+        """Read up to one part from the upload, tolerating short reads"""
+        buffer = bytearray()
+        while len(buffer) < part_size:
+            data = await file.read(part_size - len(buffer))
+            if not data:
+                break
+            buffer.extend(data)
+        return bytes(buffer)
+    
+    async def upload_bytes(self, storage_path: str, data: bytes, content_type: Optional[str] = None):
+        """Store an in-memory object with a single request"""
+        await self.backend.put_object(storage_path, data, content_type)
+    
+    async def chunk_file(self, file: UploadFile) -> Tuple[int, str, List[Tuple[int, int, str]]]:
+        """
+        Split an upload into content-defined chunks on the storage pool
+        Returns: (size_bytes, file_hash, [(offset, size_bytes, chunk_hash), ...])
+        """
         await file.seek(0)
+        try:
+            return await self.driver.run(self.chunker.plan, file.file)
+        finally:
+            await file.seek(0)
+    
+    async def read_file_range(self, file: UploadFile, offset: int, size: int) -> bytes:
+        """Read a byte range of a spooled upload (callers serialize reads of one file)"""
+        def read_range():
+            file.file.seek(offset)
+            return file.file.read(size)
         
-        return size_bytes, file_hash
+        return await self.driver.run(read_range)
+    
+    async def put_manifest(self, storage_path: str, file_hash: str, size_bytes: int,
+                           mime_type: Optional[str], chunks: List[Tuple[str, int]]):
+        """Store a chunk manifest. chunks: List of (storage_path, size_bytes) in content order"""
+        data = encode_manifest(file_hash, size_bytes, mime_type, chunks)
+        await self.backend.put_object(storage_path, data, 'application/json')
+    
+    async def load_manifest(self, storage_path: str) -> dict:
+        """Read a chunk manifest: {sha256, size, mime_type, chunks: [(storage_path, size_bytes)]}"""
+        manifest = self._manifests.get(storage_path)
+        if manifest is not None:
+            self._manifests.move_to_end(storage_path)
+            return manifest
+        
+        manifest = decode_manifest(await self.backend.read(storage_path))
+        self._manifests[storage_path] = manifest
+        if len(self._manifests) > MANIFEST_CACHE_SIZE:
+            self._manifests.popitem(last=False)
+        return manifest
+    
+    async def hash_chunks(self, chunks: List[Tuple[str, int]]) -> str:
+        """SHA-256 of stored chunks read back in order, without buffering them"""
+        hasher = hashlib.sha256()
+        for storage_path, _ in chunks:
+            async for data in await self.backend.open_stream(storage_path, None, self.part_size):
+                hasher.update(data)
+        return hasher.hexdigest()
     
     async def download_file(self, storage_path: str) -> bytes:
-        """Download file from S3/MinIO"""
+        """Download file from storage"""
+        if is_manifest(storage_path):
+            return b"".join([chunk async for chunk in await self.open_file_stream(storage_path)])
+        return await self.backend.read(storage_path)
+    
+    async def get_file_info(self, storage_path: str) -> dict:
+        """
+        Get object size and validators without fetching the body
+        Returns: {size, etag, last_modified, content_type}
+        """
+        info = await self.backend.head(storage_path)
+        if not is_manifest(storage_path):
+            return info
+        
+        # Chunked content: describe the content, not the manifest object
+        manifest = await self.load_manifest(storage_path)
+        return {
+            **info,
+            'size': manifest['size'],
+            'etag': f'"{manifest["sha256"]}"',
+            'content_type': manifest.get('mime_type') or 'application/octet-stream',
+            'checksum_sha256': None
+        }
+    
+    async def open_file_stream(
+        self,
+        storage_path: str,
+        byte_range: Optional[Tuple[int, int]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Open an object for streaming, optionally restricted to an inclusive byte range.
+        The object is opened here so missing objects fail before any response is sent;
+        the returned iterator yields chunks of download_chunk_size.
+        Chunked content is reassembled from its manifest as it streams.
+        """
+        if is_manifest(storage_path):
+            manifest = await self.load_manifest(storage_path)
+            return await self._open_manifest_stream(manifest, byte_range)
+        return await self.backend.open_stream(storage_path, byte_range, self.download_chunk_size)
+    
+    async def _open_manifest_stream(self, manifest: dict,
+                                    byte_range: Optional[Tuple[int, int]]) -> AsyncIterator[bytes]:
+        """Open the chunks covering a byte range; the first one is opened before returning"""
+        first, last = byte_range if byte_range else (0, manifest['size'] - 1)
+        spans = []
+        offset = 0
+        for chunk_path, chunk_size in manifest['chunks']:
+            start, end = max(first, offset), min(last, offset + chunk_size - 1)
+            if start <= end:
+                whole = start == offset and end == offset + chunk_size - 1
+                spans.append((chunk_path, None if whole else (start - offset, end - offset)))
+            offset += chunk_size
+        
+        if not spans:
+            return self._replay([])
+        body = await self.backend.open_stream(spans[0][0], spans[0][1], self.download_chunk_size)
+        return self._iter_manifest_chunks(body, spans[1:])
+    
+    async def _iter_manifest_chunks(self, body: AsyncIterator[bytes],
+                                    spans: List[tuple]) -> AsyncIterator[bytes]:
+        """Yield chunk after chunk, opening the next GET while the current one streams"""
+        pending = None
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket,
-                Key=storage_path
-            )
-            return response['Body'].read()
-        except ClientError as e:
-            raise Exception(f"Failed to download file: {str(e)}")
+            for index in range(len(spans) + 1):
+                if index < len(spans):
+                    chunk_path, chunk_range = spans[index]
+                    pending = asyncio.create_task(
+                        self.backend.open_stream(chunk_path, chunk_range, self.download_chunk_size)
+                    )
+                
+                async for data in body:
+                    yield data
+                
+                if pending is not None:
+                    body = await pending
+                    pending = None
+        finally:
+            if pending is not None:
+                pending.cancel()
+    
+    @staticmethod
+    async def _replay(chunks: List[bytes]) -> AsyncIterator[bytes]:
+        for chunk in chunks:
+            yield chunk
+    
+    def get_local_path(self, storage_path: str) -> Optional[str]:
+        """Filesystem path when the backend can serve the object straight from disk"""
+        if is_manifest(storage_path):
+            return None
+        return self.backend.local_path(storage_path)
+    
+    def open_cached(self, storage_path: str, version: Optional[str]) -> Optional[BinaryIO]:
+        """Open the cached copy of this object version, if the disk cache holds one"""
+        if not self.cache:
+            return None
+        return self.cache.open_entry(storage_path, version)
+    
+    @staticmethod
+    def cached_file_info(source: BinaryIO, version: str) -> dict:
+        """get_file_info() for an open cache entry; the ETag is the cached version"""
+        stat = os.fstat(source.fileno())
+        return {
+            'size': stat.st_size,
+            'etag': f'"{version}"',
+            'last_modified': datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
+        }
+    
+    async def stream_cached(self, source: BinaryIO,
+                            byte_range: Optional[Tuple[int, int]] = None) -> AsyncIterator[bytes]:
+        """Stream an open cache entry (or an inclusive byte range of it), closing it at the end"""
+        try:
+            remaining = None
+            if byte_range:
+                await self.driver.run(source.seek, byte_range[0])
+                remaining = byte_range[1] - byte_range[0] + 1
+            while remaining is None or remaining > 0:
+                size = self.download_chunk_size if remaining is None else min(self.download_chunk_size, remaining)
+                chunk = await self.driver.run(source.read, size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+        finally:
+            source.close()
+    
+    def cache_through(self, storage_path: str, version: Optional[str], size_bytes: int,
+                      body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """
+        Wrap a full-object stream so the bytes are also written to the disk cache.
+        The entry is only committed when the whole object has been read.
+        """
+        if not self.cache or not version or not self.cache.accepts(size_bytes):
+            return body
+        return self._tee_to_cache(storage_path, version, body)
+    
+    async def _tee_to_cache(self, storage_path: str, version: str,
+                            body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        temp = await self.driver.run(self.cache.create_temp)
+        completed = False
+        try:
+            async for chunk in body:
+                await self.driver.run(temp.write, chunk)
+                yield chunk
+            completed = True
+        finally:
+            await self.driver.run(temp.close)
+            if completed:
+                await self.driver.run(self.cache.commit, storage_path, version, temp.name)
+            else:
+                self.cache.discard(temp.name)
     
     async def delete_file(self, storage_path: str):
         """Delete file from S3/MinIO"""
-        try:
-            self.s3_client.delete_object(
-                Bucket=self.bucket,
-                Key=storage_path
-            )
-        except ClientError as e:
-            raise Exception(f"Failed to delete file: {str(e)}")
+        if self.cache:
+            self.cache.invalidate(storage_path)
+        self._manifests.pop(storage_path, None)
+        await self.backend.delete(storage_path)
     
-    async def extract_zip(self, zip_file: UploadFile) -> List[dict]:
+    async def delete_files(self, storage_paths: List[str]) -> int:
         """
-        Extract ZIP file and return list of files with their content
-        Returns: List of {filename, content, size, path_parts}
+        Delete many objects with batched requests, the batches running
+        concurrently on the storage pool. Failed batches are logged and skipped:
+        orphaned objects are harmless.
+        Returns the number of objects deleted
         """
-        extracted_files = []
+        for storage_path in storage_paths:
+            if self.cache:
+                self.cache.invalidate(storage_path)
+            self._manifests.pop(storage_path, None)
         
-        # Read ZIP content
-        zip_content = await zip_file.read()
+        batches = [
+            storage_paths[start:start + DELETE_BATCH_SIZE]
+            for start in range(0, len(storage_paths), DELETE_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(
+            *[self.backend.delete_many(batch) for batch in batches],
+            return_exceptions=True
+        )
         
+        deleted = 0
+        for result in results:
+            if isinstance(result, Exception):
+                docflow_logger.error(f"Storage batch delete failed: {result}")
+            else:
+                deleted += result
+        return deleted
+    
+    async def open_zip(self, zip_file: UploadFile) -> zipfile.ZipFile:
+        """
+        Open an uploaded ZIP for lazy reading. The upload is already spooled to
+        disk by FastAPI, so only the central directory is read here; members are
+        decompressed on demand.
+        """
+        await zip_file.seek(0)
         try:
-            with zipfile.ZipFile(io.BytesIO(zip_content)) as zf:
-                for file_info in zf.filelist:
-                    # Skip directories
-                    if file_info.is_dir():
-                        continue
-                    
-                    # Extract file
-                    file_content = zf.read(file_info.filename)
-                    
-                    # Parse path
-                    path_parts = file_info.filename.split('/')
-                    filename = path_parts[-1]
-                    folder_path = path_parts[:-1] if len(path_parts) > 1 else []
-                    
-                    extracted_files.append({
-                        'filename': filename,
-                        'content': file_content,
-                        'size': len(file_content),
-                        'folder_path': folder_path,
-                        'original_path': file_info.filename
-                    })
+            return await self.driver.run(zipfile.ZipFile, zip_file.file)
         except zipfile.BadZipFile:
             raise Exception("Invalid ZIP file")
+    
+    def list_zip_members(self, archive: zipfile.ZipFile) -> List[dict]:
+        """
+        List the files in an opened ZIP without reading their content
+        Returns: List of {filename, size, folder_path, original_path, mime_type, zip_info}
+        """
+        members = []
+        for zip_info in archive.infolist():
+            # Skip directories
+            if zip_info.is_dir():
+                continue
+            
+            # Parse path
+            path_parts = [part for part in zip_info.filename.split('/') if part]
+            filename = path_parts[-1]
+            folder_path = path_parts[:-1]
+            
+            members.append({
+                'filename': filename,
+                'size': zip_info.file_size,
+                'folder_path': folder_path,
+                'original_path': zip_info.filename,
+                'mime_type': mimetypes.guess_type(filename)[0],
+                'zip_info': zip_info
+            })
+        return members
+    
+    async def hash_zip_member(self, archive: zipfile.ZipFile, member: dict) -> Tuple[int, str]:
+        """
+        Hash a ZIP member by streaming it through the decompressor on the storage pool
+        Returns: (size_bytes, file_hash)
+        """
+        def digest():
+            hasher = hashlib.sha256()
+            size_bytes = 0
+            with archive.open(member['zip_info']) as source:
+                while True:
+                    chunk = source.read(self.part_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    size_bytes += len(chunk)
+            return size_bytes, hasher.hexdigest()
         
-        return extracted_files
+        return await self.driver.run(digest)
     
-    async def create_zip(self, files: List[dict]) -> bytes:
+    async def upload_zip_member(self, archive: zipfile.ZipFile, member: dict,
+                                storage_path: str) -> Tuple[int, str]:
         """
-        Create ZIP file from list of files
-        files: List of {storage_path, filename, folder_path}
-        Returns: ZIP file content as bytes
+        Stream a ZIP member straight from the archive to storage
+        Returns: (size_bytes, file_hash)
         """
-        zip_buffer = io.BytesIO()
+        source = await self.driver.run(archive.open, member['zip_info'])
+        try:
+            return await self.upload_file_stream(
+                UploadFile(file=source, filename=member['filename']),
+                storage_path,
+                member['mime_type'],
+                member['zip_info'].file_size
+            )
+        finally:
+            source.close()
+    
+    async def stream_zip(self, files: List[dict]) -> AsyncIterator[bytes]:
+        """
+        Stream a ZIP archive of stored files without holding it in memory.
+        files: List of {storage_path, filename, folder_path, mime_type, size_bytes}
+        The next zip_prefetch_count objects are fetched concurrently while the
+        current one is written; small objects are read ahead in full, large
+        ones only have their GET opened. Already-compressed formats are STOREd.
+        """
+        sink = _ZipStreamBuffer()
+        window = max(settings.zip_prefetch_count, 1)
+        pending = deque()
+        remaining = iter(files)
+        used_names = set()
         
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for file_info in files:
-                try:
-                    # Download file from S3
-                    file_content = await self.download_file(file_info['storage_path'])
+        def schedule_next():
+            file_info = next(remaining, None)
+            if file_info is not None:
+                pending.append((file_info, asyncio.create_task(self._prefetch_zip_entry(file_info))))
+        
+        for _ in range(window):
+            schedule_next()
+        
+        try:
+            with zipfile.ZipFile(sink, 'w', allowZip64=True) as zf:
+                while pending:
+                    file_info, task = pending.popleft()
+                    schedule_next()
+                    
+                    try:
+                        body = await task
+                    except Exception as e:
+                        docflow_logger.error(f"Failed to add {file_info['filename']} to ZIP: {str(e)}")
+                        continue
+                    
+                    zinfo = zipfile.ZipInfo(
+                        self._unique_zip_path(file_info, used_names),
+                        date_time=time.localtime()[:6]
+                    )
+                    zinfo.compress_type = self._zip_compress_type(file_info.get('mime_type'))
+                    zinfo.file_size = file_info.get('size_bytes') or 0
                     
-                    # Construct path in ZIP
-                    if file_info.get('folder_path'):
-                        zip_path = f"{'/'.join(file_info['folder_path'])}/{file_info['filename']}"
-                    else:
-                        zip_path = file_info['filename']
+                    with zf.open(zinfo, 'w') as dest:
+                        async for chunk in body:
+                            # Deflate on the storage pool, off the event loop
+                            await self.driver.run(dest.write, chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
                     
-                    # Add to ZIP
-                    zf.writestr(zip_path, file_content)
-                except Exception as e:
-                    print(f"Failed to add {file_info['filename']} to ZIP: {str(e)}")
-                    continue
+                    data = sink.drain()
+                    if data:
+                        yield data
+            
+            # Central directory
+            data = sink.drain()
+            if data:
+                yield data
+        finally:
+            # Client went away or an error occurred: stop outstanding prefetches
+            for _, task in pending:
+                task.cancel()
+    
+    async def _prefetch_zip_entry(self, file_info: dict):
+        """Open an object for the ZIP writer, reading it ahead when it is small"""
+        body = await self.open_file_stream(file_info['storage_path'])
+        if (file_info.get('size_bytes') or 0) > settings.zip_prefetch_max_bytes:
+            return body
+        
+        chunks = [chunk async for chunk in body]
+        return self._replay(chunks)
+    
+    @staticmethod
+    def _zip_compress_type(mime_type: Optional[str]) -> int:
+        """STORE formats that are already compressed, DEFLATE everything else"""
+        if mime_type and (mime_type in STORED_MIME_TYPES or mime_type.startswith(STORED_MIME_PREFIXES)):
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+    
+    @staticmethod
+    def _unique_zip_path(file_info: dict, used_names: set) -> str:
+        """Build the entry path from the folder path, suffixing duplicates"""
+        if file_info.get('folder_path'):
+            zip_path = f"{'/'.join(file_info['folder_path'])}/{file_info['filename']}"
+        else:
+            zip_path = file_info['filename']
         
-        zip_buffer.seek(0)
-        return zip_buffer.read()
+        candidate = zip_path
+        counter = 1
+        while candidate in used_names:
+            stem, ext = os.path.splitext(zip_path)
+            candidate = f"{stem} ({counter}){ext}"
+            counter += 1
+        used_names.add(candidate)
+        return candidate
+    
+    @property
+    def supports_presigned_urls(self) -> bool:
+        """Whether clients can be sent to storage directly with presigned URLs"""
+        return self.backend.supports_presigned_urls
+    
+    def can_presign(self, storage_path: str) -> bool:
+        """Whether this object can be served with a presigned URL (chunked content cannot)"""
+        return self.supports_presigned_urls and not is_manifest(storage_path)
     
-    async def get_file_url(self, storage_path: str, expires_in: int = 3600) -> str:
+    async def get_file_url(self, storage_path: str, expires_in: int = 3600,
+                           filename: Optional[str] = None, content_type: Optional[str] = None) -> str:
         """Generate presigned URL for file download"""
-        try:
-            url = self.s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': self.bucket,
-                    'Key': storage_path
-                },
-                ExpiresIn=expires_in
+        return await self.backend.presign_get(storage_path, expires_in, filename, content_type)
+    
+    async def get_upload_url(self, storage_path: str, content_type: str, file_hash: str,
+                             expires_in: int = 3600) -> str:
+        """
+        Generate a presigned PUT for a direct upload. The SHA-256 is signed into
+        the request, so storage rejects a body that does not match it.
+        """
+        return await self.backend.presign_put(storage_path, content_type, file_hash, expires_in)
+    
+    async def create_multipart_upload_urls(self, storage_path: str, content_type: str,
+                                           size_bytes: int, expires_in: int = 3600) -> dict:
+        """
+        Start a multipart upload for a direct upload and presign one URL per part.
+        Parts grow past part_size when needed to stay within the 10 000 part limit.
+        Returns: {upload_id, part_size, part_urls}
+        """
+        part_size = max(self.part_size, -(-size_bytes // 10000))
+        part_count = max(-(-size_bytes // part_size), 1)
+        
+        upload_id = await self.backend.create_multipart_upload(storage_path, content_type)
+        return {
+            'upload_id': upload_id,
+            'part_size': part_size,
+            'part_urls': await self.backend.presign_upload_parts(
+                storage_path, upload_id, part_count, expires_in
             )
-            return url
-        except ClientError as e:
-            raise Exception(f"Failed to generate URL: {str(e)}")
+        }
     
-    def file_exists(self, storage_path: str) -> bool:
-        """Check if file exists in S3/MinIO"""
-        try:
-            self.s3_client.head_object(Bucket=self.bucket, Key=storage_path)
-            return True
-        except ClientError:
-            return False
+    async def complete_multipart_upload(self, storage_path: str, upload_id: str, parts: List[dict]):
+        """Complete a client-driven multipart upload. parts: List of {PartNumber, ETag}"""
+        await self.backend.complete_multipart_upload(storage_path, upload_id, parts)
+    
+    async def abort_multipart_upload(self, storage_path: str, upload_id: str):
+        """Abort a multipart upload and discard its parts"""
+        await self.backend.abort_multipart_upload(storage_path, upload_id)
+    
+    async def verify_file_hash(self, storage_path: str, file_hash: str) -> bool:
+        """
+        Check a stored object's SHA-256. Objects uploaded with a signed checksum
+        are checked with HEAD alone; anything else is re-hashed by the backend.
+        """
+        info = await self.backend.head(storage_path, checksum=True)
+        
+        checksum = info.get('checksum_sha256')
+        # Multipart uploads only carry a checksum of part checksums ("...-N")
+        if checksum and '-' not in checksum:
+            return base64.b64decode(checksum).hex() == file_hash
+        
+        return await self.backend.hash_object(storage_path, self.part_size) == file_hash
+    
+    async def copy_file(self, source_path: str, storage_path: str):
+        """Copy an object inside storage without passing the bytes through the API"""
+        await self.backend.copy(source_path, storage_path)
+    
+    async def file_exists(self, storage_path: str) -> bool:
+        """Check if file exists in storage"""
+        return await self.backend.exists(storage_path)
 
 
 # Singleton instance
 storage_service = StorageService()
+
+
+def get_storage_service() -> StorageService:
+    """Dependency returning the shared StorageService"""
+    return storage_service
@@ -0,0 +1,28 @@
+"""add document_id_counters for sequential per-account document IDs
+
+Revision ID: add_document_id_counters
+Revises: add_pagination_indexes
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_document_id_counters'
+down_revision = 'add_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create document_id_counters table (next unreserved document ID value per account)
+    op.create_table(
+        'document_id_counters',
+        sa.Column('account_id', sa.String(26), sa.ForeignKey('accounts.id', ondelete='CASCADE'), primary_key=True, nullable=False),
+        sa.Column('next_value', sa.BigInteger(), nullable=False, server_default='1'),
+    )
+
+
+def downgrade():
+    op.drop_table('document_id_counters')
@@ -0,0 +1,105 @@
+"""add folder_closure ancestor index for the folder hierarchy
+
+Revision ID: add_folder_closure
+Revises: add_folder_stats
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_folder_closure'
+down_revision = 'add_folder_stats'
+branch_labels = None
+depends_on = None
+
+# Closure table maintenance as installed by this revision
+CLOSURE_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_folder_closure() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+            SELECT NEW.id, NEW.id, 0
+            UNION ALL
+            SELECT ancestor_id, NEW.id, depth + 1 FROM folder_closure WHERE descendant_id = NEW.parent_folder_id;
+            RETURN NULL;
+        END IF;
+
+        IF NEW.parent_folder_id IS NOT DISTINCT FROM OLD.parent_folder_id THEN
+            RETURN NULL;
+        END IF;
+
+        IF EXISTS (
+            SELECT 1 FROM folder_closure WHERE ancestor_id = NEW.id AND descendant_id = NEW.parent_folder_id
+        ) THEN
+            RAISE EXCEPTION 'Folder % cannot be moved below itself', NEW.id;
+        END IF;
+
+        -- Unlink the subtree from its old ancestors, then link it below the new parent
+        DELETE FROM folder_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = NEW.id)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = NEW.id);
+
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+        SELECT p.ancestor_id, s.descendant_id, p.depth + s.depth + 1
+        FROM folder_closure p, folder_closure s
+        WHERE p.descendant_id = NEW.parent_folder_id AND s.ancestor_id = NEW.id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+CLOSURE_BACKFILL = [
+    """
+    INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+    WITH RECURSIVE tree AS (
+        SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM folders_new
+        UNION ALL
+        SELECT t.ancestor_id, f.id, t.depth + 1 FROM tree t JOIN folders_new f ON f.parent_folder_id = t.descendant_id
+    )
+    SELECT ancestor_id, descendant_id, depth FROM tree
+    ON CONFLICT DO NOTHING
+    """,
+]
+
+CLOSURE_TRIGGERS = [
+    """
+    CREATE TRIGGER trg_folder_closure_insert AFTER INSERT ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folder_closure()
+    """,
+    """
+    CREATE TRIGGER trg_folder_closure_move AFTER UPDATE OF parent_folder_id ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folder_closure()
+    """,
+]
+
+CLOSURE_DROP = [
+    "DROP TRIGGER IF EXISTS trg_folder_closure_insert ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_folder_closure_move ON folders_new",
+    "DROP FUNCTION IF EXISTS dms_folder_closure()",
+]
+
+
+def upgrade():
+    # Create folder_closure table (every ancestor/descendant pair of folders_new)
+    op.create_table(
+        'folder_closure',
+        sa.Column('ancestor_id', sa.String(26), sa.ForeignKey('folders_new.id', ondelete='CASCADE'), primary_key=True, nullable=False),
+        sa.Column('descendant_id', sa.String(26), sa.ForeignKey('folders_new.id', ondelete='CASCADE'), primary_key=True, nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+    )
+    op.create_index('ix_folder_closure_descendant', 'folder_closure', ['descendant_id', 'depth'])
+
+    # Trigger function, backfill of existing folders, then the triggers
+    for statement in CLOSURE_FUNCTIONS + CLOSURE_BACKFILL + CLOSURE_TRIGGERS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in CLOSURE_DROP:
+        op.execute(statement)
+    op.drop_index('ix_folder_closure_descendant', table_name='folder_closure')
+    op.drop_table('folder_closure')
@@ -0,0 +1,25 @@
+"""add soft delete columns to folders_new for the recycle bin
+
+Revision ID: add_folder_soft_delete
+Revises: add_search_vector
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_folder_soft_delete'
+down_revision = 'add_search_vector'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('folders_new', sa.Column('is_deleted', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.add_column('folders_new', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade():
+    op.drop_column('folders_new', 'deleted_at')
+    op.drop_column('folders_new', 'is_deleted')
@@ -0,0 +1,281 @@
+"""add folder_stats and section_stats counters maintained by triggers
+
+Revision ID: add_folder_stats
+Revises: add_storage_blob_chunks
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_folder_stats'
+down_revision = 'add_storage_blob_chunks'
+branch_labels = None
+depends_on = None
+
+# Trigger SQL as installed by this revision (app/db/tables/dms/stats.py has
+# moved on since; see batch_folder_stats_updates)
+STATS_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_stats_apply(
+        p_folder_id varchar, p_files bigint, p_bytes bigint, p_folders bigint,
+        p_direct_files bigint, p_direct_bytes bigint, p_direct_folders bigint
+    ) RETURNS void AS $$
+    DECLARE
+        v_section_id varchar;
+    BEGIN
+        SELECT section_id INTO v_section_id FROM folders_new WHERE id = p_folder_id;
+        IF NOT FOUND THEN
+            -- Deleted together with an ancestor, which already took its subtree out
+            RETURN;
+        END IF;
+
+        UPDATE folder_stats SET
+            file_count = file_count + p_direct_files,
+            bytes = bytes + p_direct_bytes,
+            folder_count = folder_count + p_direct_folders
+        WHERE folder_id = p_folder_id;
+
+        WITH RECURSIVE chain AS (
+            SELECT id, parent_folder_id FROM folders_new WHERE id = p_folder_id
+            UNION ALL
+            SELECT f.id, f.parent_folder_id FROM folders_new f JOIN chain c ON f.id = c.parent_folder_id
+        )
+        UPDATE folder_stats SET
+            total_file_count = total_file_count + p_files,
+            total_bytes = total_bytes + p_bytes,
+            total_folder_count = total_folder_count + p_folders
+        WHERE folder_id IN (SELECT id FROM chain);
+
+        UPDATE section_stats SET
+            file_count = file_count + p_files,
+            total_bytes = total_bytes + p_bytes,
+            folder_count = folder_count + p_folders
+        WHERE section_id = v_section_id;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_stats_attach(
+        p_parent_id varchar, p_section_id varchar, p_files bigint, p_bytes bigint, p_folders bigint
+    ) RETURNS void AS $$
+    BEGIN
+        -- A subtree (p_folders folders including its root) added to or taken from a parent or section root
+        IF p_parent_id IS NULL THEN
+            UPDATE section_stats SET
+                file_count = file_count + p_files,
+                total_bytes = total_bytes + p_bytes,
+                folder_count = folder_count + p_folders
+            WHERE section_id = p_section_id;
+        ELSE
+            PERFORM dms_stats_apply(p_parent_id, p_files, p_bytes, p_folders, 0, 0, sign(p_folders)::bigint);
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_files_stats() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            FOR rec IN
+                SELECT folder_id, count(*) AS files, coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM new_rows WHERE NOT is_deleted GROUP BY folder_id ORDER BY folder_id
+            LOOP
+                PERFORM dms_stats_apply(rec.folder_id, rec.files, rec.bytes, 0, rec.files, rec.bytes, 0);
+            END LOOP;
+        ELSIF TG_OP = 'DELETE' THEN
+            FOR rec IN
+                SELECT folder_id, -count(*) AS files, -coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM old_rows WHERE NOT is_deleted GROUP BY folder_id ORDER BY folder_id
+            LOOP
+                PERFORM dms_stats_apply(rec.folder_id, rec.files, rec.bytes, 0, rec.files, rec.bytes, 0);
+            END LOOP;
+        ELSE
+            -- Moves, soft deletes, restores and new versions; unchanged rows cancel out
+            FOR rec IN
+                SELECT folder_id, sum(files)::bigint AS files, sum(bytes)::bigint AS bytes
+                FROM (
+                    SELECT folder_id, 1 AS files, size_bytes AS bytes FROM new_rows WHERE NOT is_deleted
+                    UNION ALL
+                    SELECT folder_id, -1, -size_bytes FROM old_rows WHERE NOT is_deleted
+                ) changes
+                GROUP BY folder_id
+                HAVING sum(files) <> 0 OR sum(bytes) <> 0
+                ORDER BY folder_id
+            LOOP
+                PERFORM dms_stats_apply(rec.folder_id, rec.files, rec.bytes, 0, rec.files, rec.bytes, 0);
+            END LOOP;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_folders_stats() RETURNS trigger AS $$
+    DECLARE
+        subtree folder_stats%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO folder_stats (folder_id) VALUES (NEW.id);
+            PERFORM dms_stats_attach(NEW.parent_folder_id, NEW.section_id, 0, 0, 1);
+            RETURN NULL;
+        END IF;
+
+        SELECT * INTO subtree FROM folder_stats WHERE folder_id = OLD.id;
+        IF TG_OP = 'DELETE' THEN
+            -- Runs before the delete, while the folder's counters still exist
+            PERFORM dms_stats_attach(OLD.parent_folder_id, OLD.section_id,
+                -subtree.total_file_count, -subtree.total_bytes, -(subtree.total_folder_count + 1));
+            RETURN OLD;
+        END IF;
+
+        IF NEW.parent_folder_id IS DISTINCT FROM OLD.parent_folder_id
+           OR NEW.section_id IS DISTINCT FROM OLD.section_id THEN
+            PERFORM dms_stats_attach(OLD.parent_folder_id, OLD.section_id,
+                -subtree.total_file_count, -subtree.total_bytes, -(subtree.total_folder_count + 1));
+            PERFORM dms_stats_attach(NEW.parent_folder_id, NEW.section_id,
+                subtree.total_file_count, subtree.total_bytes, subtree.total_folder_count + 1);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_sections_stats() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO section_stats (section_id) VALUES (NEW.id);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+STATS_BACKFILL = [
+    "INSERT INTO section_stats (section_id) SELECT id FROM sections ON CONFLICT DO NOTHING",
+    """
+    INSERT INTO folder_stats (folder_id, file_count, bytes, folder_count)
+    SELECT f.id, coalesce(files.files, 0), coalesce(files.bytes, 0), coalesce(children.folders, 0)
+    FROM folders_new f
+    LEFT JOIN (
+        SELECT folder_id, count(*) AS files, sum(size_bytes) AS bytes
+        FROM files_new WHERE NOT is_deleted GROUP BY folder_id
+    ) files ON files.folder_id = f.id
+    LEFT JOIN (
+        SELECT parent_folder_id, count(*) AS folders
+        FROM folders_new WHERE parent_folder_id IS NOT NULL GROUP BY parent_folder_id
+    ) children ON children.parent_folder_id = f.id
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    WITH RECURSIVE tree AS (
+        SELECT id AS ancestor_id, id AS folder_id FROM folders_new
+        UNION ALL
+        SELECT t.ancestor_id, f.id FROM tree t JOIN folders_new f ON f.parent_folder_id = t.folder_id
+    )
+    UPDATE folder_stats s SET
+        total_file_count = totals.files,
+        total_bytes = totals.bytes,
+        total_folder_count = totals.folders
+    FROM (
+        SELECT t.ancestor_id, sum(d.file_count) AS files, sum(d.bytes) AS bytes, count(*) - 1 AS folders
+        FROM tree t JOIN folder_stats d ON d.folder_id = t.folder_id
+        GROUP BY t.ancestor_id
+    ) totals
+    WHERE s.folder_id = totals.ancestor_id
+    """,
+    """
+    UPDATE section_stats s SET
+        folder_count = totals.folders,
+        file_count = totals.files,
+        total_bytes = totals.bytes
+    FROM (
+        SELECT f.section_id, count(*) AS folders, sum(d.file_count) AS files, sum(d.bytes) AS bytes
+        FROM folders_new f JOIN folder_stats d ON d.folder_id = f.id
+        GROUP BY f.section_id
+    ) totals
+    WHERE s.section_id = totals.section_id
+    """,
+]
+
+STATS_TRIGGERS = [
+    """
+    CREATE TRIGGER trg_files_stats_insert AFTER INSERT ON files_new
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dms_files_stats()
+    """,
+    """
+    CREATE TRIGGER trg_files_stats_update AFTER UPDATE ON files_new
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION dms_files_stats()
+    """,
+    """
+    CREATE TRIGGER trg_files_stats_delete AFTER DELETE ON files_new
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION dms_files_stats()
+    """,
+    """
+    CREATE TRIGGER trg_folders_stats_insert AFTER INSERT ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folders_stats()
+    """,
+    """
+    CREATE TRIGGER trg_folders_stats_move AFTER UPDATE OF parent_folder_id, section_id ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folders_stats()
+    """,
+    """
+    CREATE TRIGGER trg_folders_stats_delete BEFORE DELETE ON folders_new
+    FOR EACH ROW EXECUTE FUNCTION dms_folders_stats()
+    """,
+    """
+    CREATE TRIGGER trg_sections_stats_insert AFTER INSERT ON sections
+    FOR EACH ROW EXECUTE FUNCTION dms_sections_stats()
+    """,
+]
+
+STATS_DROP = [
+    "DROP TRIGGER IF EXISTS trg_files_stats_insert ON files_new",
+    "DROP TRIGGER IF EXISTS trg_files_stats_update ON files_new",
+    "DROP TRIGGER IF EXISTS trg_files_stats_delete ON files_new",
+    "DROP TRIGGER IF EXISTS trg_folders_stats_insert ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_folders_stats_move ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_folders_stats_delete ON folders_new",
+    "DROP TRIGGER IF EXISTS trg_sections_stats_insert ON sections",
+    "DROP FUNCTION IF EXISTS dms_sections_stats()",
+    "DROP FUNCTION IF EXISTS dms_folders_stats()",
+    "DROP FUNCTION IF EXISTS dms_files_stats()",
+    "DROP FUNCTION IF EXISTS dms_stats_attach(varchar, varchar, bigint, bigint, bigint)",
+    "DROP FUNCTION IF EXISTS dms_stats_apply(varchar, bigint, bigint, bigint, bigint, bigint, bigint)",
+]
+
+
+def upgrade():
+    # Create folder_stats table (direct and subtree counters per folder)
+    op.create_table(
+        'folder_stats',
+        sa.Column('folder_id', sa.String(26), sa.ForeignKey('folders_new.id', ondelete='CASCADE'), primary_key=True, nullable=False),
+        sa.Column('file_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('folder_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_file_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_folder_count', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+
+    # Create section_stats table
+    op.create_table(
+        'section_stats',
+        sa.Column('section_id', sa.String(26), sa.ForeignKey('sections.id', ondelete='CASCADE'), primary_key=True, nullable=False),
+        sa.Column('folder_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('file_count', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+
+    # Trigger functions, backfill of existing rows, then the triggers
+    for statement in STATS_FUNCTIONS + STATS_BACKFILL + STATS_TRIGGERS:
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in STATS_DROP:
+        op.execute(statement)
+    op.drop_table('section_stats')
+    op.drop_table('folder_stats')
@@ -0,0 +1,37 @@
+"""add composite indexes for keyset pagination of DMS listings
+
+Revision ID: add_pagination_indexes
+Revises: add_folder_closure
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_pagination_indexes'
+down_revision = 'add_folder_closure'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns): each listing's filter columns, sort key and id tie-breaker
+INDEXES = [
+    ('ix_files_new_account_created', 'files_new', ['account_id', 'created_at', 'id']),
+    ('ix_files_new_folder_created', 'files_new', ['folder_id', 'created_at', 'id']),
+    ('ix_files_new_account_deleted', 'files_new', ['account_id', 'deleted_at', 'id']),
+    ('ix_folders_new_parent_name', 'folders_new', ['account_id', 'parent_folder_id', 'name', 'id']),
+    ('idx_audit_account_created', 'audit_logs', ['account_id', 'created_at', 'id']),
+    ('idx_share_account_created', 'shares', ['account_id', 'created_at', 'id']),
+    ('ix_approval_workflows_created', 'approval_workflows', ['created_at', 'id']),
+    ('ix_approval_workflows_file_created', 'approval_workflows', ['file_id', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,107 @@
+"""add full-text search vector to files_new
+
+Revision ID: add_search_vector
+Revises: add_document_id_counters
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_search_vector'
+down_revision = 'add_document_id_counters'
+branch_labels = None
+depends_on = None
+
+# Search vector functions and triggers as installed by this revision
+# (text search configuration 'simple')
+SEARCH_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_file_metadata_text(p_file_id varchar) RETURNS text AS $$
+        -- Scalar values without their JSON quoting
+        SELECT string_agg(value #>> '{}', ' ') FROM file_metadata WHERE file_id = p_file_id
+    $$ LANGUAGE sql STABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_file_search_vector(
+        p_file_id varchar, p_name text, p_tags text[], p_notes text
+    ) RETURNS tsvector AS $$
+        -- Punctuation is also split out so "invoice_2024-03.pdf" matches "invoice" and "2024"
+        SELECT
+            setweight(to_tsvector('simple', coalesce(p_name, '') || ' '
+                || regexp_replace(coalesce(p_name, ''), '[^[:alnum:]]+', ' ', 'g')), 'A')
+            || setweight(to_tsvector('simple',
+                regexp_replace(coalesce(array_to_string(p_tags, ' '), ''), '[^[:alnum:]]+', ' ', 'g')), 'B')
+            || setweight(to_tsvector('simple', coalesce(p_notes, '')), 'C')
+            || setweight(to_tsvector('simple', coalesce(dms_file_metadata_text(p_file_id), '')), 'D')
+    $$ LANGUAGE sql STABLE
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_files_search() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := dms_file_search_vector(NEW.id, NEW.name, NEW.tags, NEW.notes);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_file_metadata_search() RETURNS trigger AS $$
+    DECLARE
+        v_file_id varchar;
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            v_file_id := OLD.file_id;
+        ELSE
+            v_file_id := NEW.file_id;
+        END IF;
+        -- No row to update when the file itself is being deleted
+        UPDATE files_new SET search_vector = dms_file_search_vector(id, name, tags, notes)
+        WHERE id = v_file_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+SEARCH_BACKFILL = [
+    "UPDATE files_new SET search_vector = dms_file_search_vector(id, name, tags, notes)",
+]
+
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER trg_files_search BEFORE INSERT OR UPDATE OF name, tags, notes ON files_new
+    FOR EACH ROW EXECUTE FUNCTION dms_files_search()
+    """,
+    """
+    CREATE TRIGGER trg_file_metadata_search AFTER INSERT OR UPDATE OR DELETE ON file_metadata
+    FOR EACH ROW EXECUTE FUNCTION dms_file_metadata_search()
+    """,
+]
+
+SEARCH_DROP = [
+    "DROP TRIGGER IF EXISTS trg_file_metadata_search ON file_metadata",
+    "DROP TRIGGER IF EXISTS trg_files_search ON files_new",
+    "DROP FUNCTION IF EXISTS dms_file_metadata_search()",
+    "DROP FUNCTION IF EXISTS dms_files_search()",
+    "DROP FUNCTION IF EXISTS dms_file_search_vector(varchar, text, text[], text)",
+    "DROP FUNCTION IF EXISTS dms_file_metadata_text(varchar)",
+]
+
+
+def upgrade():
+    op.add_column('files_new', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Functions, backfill of existing files, then the triggers that keep it current
+    for statement in SEARCH_FUNCTIONS + SEARCH_BACKFILL + SEARCH_TRIGGERS:
+        op.execute(statement)
+
+    op.create_index('ix_files_new_search', 'files_new', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_files_new_search', table_name='files_new')
+    for statement in SEARCH_DROP:
+        op.execute(statement)
+    op.drop_column('files_new', 'search_vector')
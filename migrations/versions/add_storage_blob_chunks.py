@@ -0,0 +1,30 @@
+"""add storage_blob_chunks table for chunk-level deduplication
+
+Revision ID: add_storage_blob_chunks
+Revises: add_storage_blobs
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_storage_blob_chunks'
+down_revision = 'add_storage_blobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create storage_blob_chunks table (chunk list of blobs stored as manifests)
+    op.create_table(
+        'storage_blob_chunks',
+        sa.Column('blob_id', sa.String(26), sa.ForeignKey('storage_blobs.id', ondelete='CASCADE'), primary_key=True, nullable=False),
+        sa.Column('position', sa.Integer(), primary_key=True, nullable=False),
+        sa.Column('chunk_path', sa.String(1000), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade():
+    op.drop_table('storage_blob_chunks')
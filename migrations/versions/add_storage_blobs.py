@@ -0,0 +1,42 @@
+"""add storage_blobs table for content-addressed deduplication
+
+Revision ID: add_storage_blobs
+Revises: add_settings_table
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_storage_blobs'
+down_revision = 'add_settings_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create storage_blobs table (one object per account and SHA-256)
+    op.create_table(
+        'storage_blobs',
+        sa.Column('id', sa.String(26), primary_key=True, nullable=False),
+        sa.Column('account_id', sa.String(26), sa.ForeignKey('accounts.id', ondelete='CASCADE'), nullable=False, index=True),
+        sa.Column('file_hash', sa.String(64), nullable=False),
+        sa.Column('storage_path', sa.String(1000), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('mime_type', sa.String(200), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.UniqueConstraint('account_id', 'file_hash', name='uq_blob_account_hash'),
+    )
+    op.create_index('idx_storage_blobs_path', 'storage_blobs', ['account_id', 'storage_path'])
+    
+    # Inbox attachments reference blobs by hash
+    op.add_column('inbox_attachments', sa.Column('file_hash', sa.String(64), nullable=True))
+
+
+def downgrade():
+    op.drop_column('inbox_attachments', 'file_hash')
+    op.drop_index('idx_storage_blobs_path', 'storage_blobs')
+    op.drop_table('storage_blobs')
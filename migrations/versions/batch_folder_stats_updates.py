@@ -0,0 +1,350 @@
+"""apply folder stats changes per statement in a fixed lock order
+
+Revision ID: batch_folder_stats_updates
+Revises: add_folder_soft_delete
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'batch_folder_stats_updates'
+down_revision = 'add_folder_soft_delete'
+branch_labels = None
+depends_on = None
+
+# The batched trigger functions as of this revision
+STATS_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_stats_apply(
+        p_folder_ids varchar[], p_section_ids varchar[],
+        p_files bigint[], p_bytes bigint[], p_folders bigint[]
+    ) RETURNS void AS $$
+    DECLARE
+        v_ids varchar[];
+        v_files bigint[];
+        v_bytes bigint[];
+        v_folders bigint[];
+        v_direct_files bigint[];
+        v_direct_bytes bigint[];
+        v_direct_folders bigint[];
+    BEGIN
+        -- Applies every change of one statement at once. Entry i is either files
+        -- changed directly in folder i (p_folders = 0) or a subtree of p_folders
+        -- folders (including its root) added to or taken from folder i, or from
+        -- section i's root when the folder is NULL. Rows are locked in one
+        -- order, section_stats first and then folder_stats, each by id, so
+        -- concurrent writers queue instead of deadlocking.
+
+        -- Entries whose folder is gone were deleted together with an ancestor,
+        -- which already took its subtree out
+        WITH entries AS (
+            SELECT coalesce(f.section_id, e.section_id) AS section_id, e.files, e.bytes, e.folders
+            FROM unnest(p_folder_ids, p_section_ids, p_files, p_bytes, p_folders)
+                AS e(folder_id, section_id, files, bytes, folders)
+            LEFT JOIN folders_new f ON f.id = e.folder_id
+            WHERE e.folder_id IS NULL OR f.id IS NOT NULL
+        )
+        SELECT array_agg(section_id ORDER BY section_id), array_agg(files ORDER BY section_id),
+               array_agg(bytes ORDER BY section_id), array_agg(folders ORDER BY section_id)
+        INTO v_ids, v_files, v_bytes, v_folders
+        FROM (
+            SELECT section_id, sum(files)::bigint AS files, sum(bytes)::bigint AS bytes, sum(folders)::bigint AS folders
+            FROM entries GROUP BY section_id
+        ) deltas;
+
+        PERFORM 1 FROM section_stats WHERE section_id = ANY(v_ids) ORDER BY section_id FOR UPDATE;
+        UPDATE section_stats s SET
+            file_count = s.file_count + d.files,
+            total_bytes = s.total_bytes + d.bytes,
+            folder_count = s.folder_count + d.folders
+        FROM unnest(v_ids, v_files, v_bytes, v_folders) AS d(section_id, files, bytes, folders)
+        WHERE s.section_id = d.section_id;
+
+        -- Each entry counts towards its folder and every ancestor
+        WITH RECURSIVE entries AS (
+            SELECT folder_id, sum(files) AS files, sum(bytes) AS bytes, sum(folders) AS folders,
+                   sum(CASE WHEN folders = 0 THEN files ELSE 0 END) AS direct_files,
+                   sum(CASE WHEN folders = 0 THEN bytes ELSE 0 END) AS direct_bytes,
+                   sum(sign(folders)) AS direct_folders
+            FROM unnest(p_folder_ids, p_files, p_bytes, p_folders) AS e(folder_id, files, bytes, folders)
+            WHERE folder_id IS NOT NULL
+            GROUP BY folder_id
+        ), chain AS (
+            SELECT f.id AS start_id, f.id, f.parent_folder_id
+            FROM entries e JOIN folders_new f ON f.id = e.folder_id
+            UNION ALL
+            SELECT c.start_id, f.id, f.parent_folder_id
+            FROM chain c JOIN folders_new f ON f.id = c.parent_folder_id
+        )
+        SELECT array_agg(folder_id ORDER BY folder_id), array_agg(files ORDER BY folder_id),
+               array_agg(bytes ORDER BY folder_id), array_agg(folders ORDER BY folder_id),
+               array_agg(direct_files ORDER BY folder_id), array_agg(direct_bytes ORDER BY folder_id),
+               array_agg(direct_folders ORDER BY folder_id)
+        INTO v_ids, v_files, v_bytes, v_folders, v_direct_files, v_direct_bytes, v_direct_folders
+        FROM (
+            SELECT c.id AS folder_id,
+                   sum(e.files)::bigint AS files, sum(e.bytes)::bigint AS bytes, sum(e.folders)::bigint AS folders,
+                   coalesce(sum(e.direct_files) FILTER (WHERE c.id = c.start_id), 0)::bigint AS direct_files,
+                   coalesce(sum(e.direct_bytes) FILTER (WHERE c.id = c.start_id), 0)::bigint AS direct_bytes,
+                   coalesce(sum(e.direct_folders) FILTER (WHERE c.id = c.start_id), 0)::bigint AS direct_folders
+            FROM chain c JOIN entries e ON e.folder_id = c.start_id
+            GROUP BY c.id
+        ) deltas;
+
+        PERFORM 1 FROM folder_stats WHERE folder_id = ANY(v_ids) ORDER BY folder_id FOR UPDATE;
+        UPDATE folder_stats s SET
+            file_count = s.file_count + d.direct_files,
+            bytes = s.bytes + d.direct_bytes,
+            folder_count = s.folder_count + d.direct_folders,
+            total_file_count = s.total_file_count + d.files,
+            total_bytes = s.total_bytes + d.bytes,
+            total_folder_count = s.total_folder_count + d.folders
+        FROM unnest(v_ids, v_files, v_bytes, v_folders, v_direct_files, v_direct_bytes, v_direct_folders)
+            AS d(folder_id, files, bytes, folders, direct_files, direct_bytes, direct_folders)
+        WHERE s.folder_id = d.folder_id;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_files_stats() RETURNS trigger AS $$
+    DECLARE
+        v_folder_ids varchar[];
+        v_files bigint[];
+        v_bytes bigint[];
+    BEGIN
+        -- Net change per folder; moves, soft deletes, restores and new versions
+        -- come out of the update case, where unchanged rows cancel out
+        IF TG_OP = 'INSERT' THEN
+            SELECT array_agg(folder_id), array_agg(files), array_agg(bytes) INTO v_folder_ids, v_files, v_bytes
+            FROM (
+                SELECT folder_id, count(*) AS files, coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM new_rows WHERE NOT is_deleted GROUP BY folder_id
+            ) changes;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT array_agg(folder_id), array_agg(files), array_agg(bytes) INTO v_folder_ids, v_files, v_bytes
+            FROM (
+                SELECT folder_id, -count(*) AS files, -coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM old_rows WHERE NOT is_deleted GROUP BY folder_id
+            ) changes;
+        ELSE
+            SELECT array_agg(folder_id), array_agg(files), array_agg(bytes) INTO v_folder_ids, v_files, v_bytes
+            FROM (
+                SELECT folder_id, sum(files)::bigint AS files, sum(bytes)::bigint AS bytes
+                FROM (
+                    SELECT folder_id, 1 AS files, size_bytes AS bytes FROM new_rows WHERE NOT is_deleted
+                    UNION ALL
+                    SELECT folder_id, -1, -size_bytes FROM old_rows WHERE NOT is_deleted
+                ) rows
+                GROUP BY folder_id
+                HAVING sum(files) <> 0 OR sum(bytes) <> 0
+            ) changes;
+        END IF;
+
+        IF v_folder_ids IS NOT NULL THEN
+            PERFORM dms_stats_apply(
+                v_folder_ids, array_fill(NULL::varchar, ARRAY[cardinality(v_folder_ids)]),
+                v_files, v_bytes, array_fill(0::bigint, ARRAY[cardinality(v_folder_ids)])
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_folders_stats() RETURNS trigger AS $$
+    DECLARE
+        subtree folder_stats%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO folder_stats (folder_id) VALUES (NEW.id);
+            PERFORM dms_stats_apply(ARRAY[NEW.parent_folder_id], ARRAY[NEW.section_id],
+                ARRAY[0::bigint], ARRAY[0::bigint], ARRAY[1::bigint]);
+            RETURN NULL;
+        END IF;
+
+        SELECT * INTO subtree FROM folder_stats WHERE folder_id = OLD.id;
+        IF TG_OP = 'DELETE' THEN
+            -- Runs before the delete, while the folder's counters still exist
+            PERFORM dms_stats_apply(ARRAY[OLD.parent_folder_id], ARRAY[OLD.section_id],
+                ARRAY[-subtree.total_file_count], ARRAY[-subtree.total_bytes],
+                ARRAY[-(subtree.total_folder_count + 1)]);
+            RETURN OLD;
+        END IF;
+
+        IF NEW.parent_folder_id IS DISTINCT FROM OLD.parent_folder_id
+           OR NEW.section_id IS DISTINCT FROM OLD.section_id THEN
+            -- Detach from the old place and attach at the new one in a single call
+            PERFORM dms_stats_apply(
+                ARRAY[OLD.parent_folder_id, NEW.parent_folder_id], ARRAY[OLD.section_id, NEW.section_id],
+                ARRAY[-subtree.total_file_count, subtree.total_file_count],
+                ARRAY[-subtree.total_bytes, subtree.total_bytes],
+                ARRAY[-(subtree.total_folder_count + 1), subtree.total_folder_count + 1]
+            );
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_sections_stats() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO section_stats (section_id) VALUES (NEW.id);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+# The per-folder functions of add_folder_stats, restored on downgrade
+PREVIOUS_STATS_FUNCTIONS = [
+    """
+    CREATE OR REPLACE FUNCTION dms_stats_apply(
+        p_folder_id varchar, p_files bigint, p_bytes bigint, p_folders bigint,
+        p_direct_files bigint, p_direct_bytes bigint, p_direct_folders bigint
+    ) RETURNS void AS $$
+    DECLARE
+        v_section_id varchar;
+    BEGIN
+        SELECT section_id INTO v_section_id FROM folders_new WHERE id = p_folder_id;
+        IF NOT FOUND THEN
+            -- Deleted together with an ancestor, which already took its subtree out
+            RETURN;
+        END IF;
+
+        UPDATE folder_stats SET
+            file_count = file_count + p_direct_files,
+            bytes = bytes + p_direct_bytes,
+            folder_count = folder_count + p_direct_folders
+        WHERE folder_id = p_folder_id;
+
+        WITH RECURSIVE chain AS (
+            SELECT id, parent_folder_id FROM folders_new WHERE id = p_folder_id
+            UNION ALL
+            SELECT f.id, f.parent_folder_id FROM folders_new f JOIN chain c ON f.id = c.parent_folder_id
+        )
+        UPDATE folder_stats SET
+            total_file_count = total_file_count + p_files,
+            total_bytes = total_bytes + p_bytes,
+            total_folder_count = total_folder_count + p_folders
+        WHERE folder_id IN (SELECT id FROM chain);
+
+        UPDATE section_stats SET
+            file_count = file_count + p_files,
+            total_bytes = total_bytes + p_bytes,
+            folder_count = folder_count + p_folders
+        WHERE section_id = v_section_id;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_stats_attach(
+        p_parent_id varchar, p_section_id varchar, p_files bigint, p_bytes bigint, p_folders bigint
+    ) RETURNS void AS $$
+    BEGIN
+        -- A subtree (p_folders folders including its root) added to or taken from a parent or section root
+        IF p_parent_id IS NULL THEN
+            UPDATE section_stats SET
+                file_count = file_count + p_files,
+                total_bytes = total_bytes + p_bytes,
+                folder_count = folder_count + p_folders
+            WHERE section_id = p_section_id;
+        ELSE
+            PERFORM dms_stats_apply(p_parent_id, p_files, p_bytes, p_folders, 0, 0, sign(p_folders)::bigint);
+        END IF;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_files_stats() RETURNS trigger AS $$
+    DECLARE
+        rec record;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            FOR rec IN
+                SELECT folder_id, count(*) AS files, coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM new_rows WHERE NOT is_deleted GROUP BY folder_id ORDER BY folder_id
+            LOOP
+                PERFORM dms_stats_apply(rec.folder_id, rec.files, rec.bytes, 0, rec.files, rec.bytes, 0);
+            END LOOP;
+        ELSIF TG_OP = 'DELETE' THEN
+            FOR rec IN
+                SELECT folder_id, -count(*) AS files, -coalesce(sum(size_bytes), 0)::bigint AS bytes
+                FROM old_rows WHERE NOT is_deleted GROUP BY folder_id ORDER BY folder_id
+            LOOP
+                PERFORM dms_stats_apply(rec.folder_id, rec.files, rec.bytes, 0, rec.files, rec.bytes, 0);
+            END LOOP;
+        ELSE
+            -- Moves, soft deletes, restores and new versions; unchanged rows cancel out
+            FOR rec IN
+                SELECT folder_id, sum(files)::bigint AS files, sum(bytes)::bigint AS bytes
+                FROM (
+                    SELECT folder_id, 1 AS files, size_bytes AS bytes FROM new_rows WHERE NOT is_deleted
+                    UNION ALL
+                    SELECT folder_id, -1, -size_bytes FROM old_rows WHERE NOT is_deleted
+                ) changes
+                GROUP BY folder_id
+                HAVING sum(files) <> 0 OR sum(bytes) <> 0
+                ORDER BY folder_id
+            LOOP
+                PERFORM dms_stats_apply(rec.folder_id, rec.files, rec.bytes, 0, rec.files, rec.bytes, 0);
+            END LOOP;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_folders_stats() RETURNS trigger AS $$
+    DECLARE
+        subtree folder_stats%ROWTYPE;
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO folder_stats (folder_id) VALUES (NEW.id);
+            PERFORM dms_stats_attach(NEW.parent_folder_id, NEW.section_id, 0, 0, 1);
+            RETURN NULL;
+        END IF;
+
+        SELECT * INTO subtree FROM folder_stats WHERE folder_id = OLD.id;
+        IF TG_OP = 'DELETE' THEN
+            -- Runs before the delete, while the folder's counters still exist
+            PERFORM dms_stats_attach(OLD.parent_folder_id, OLD.section_id,
+                -subtree.total_file_count, -subtree.total_bytes, -(subtree.total_folder_count + 1));
+            RETURN OLD;
+        END IF;
+
+        IF NEW.parent_folder_id IS DISTINCT FROM OLD.parent_folder_id
+           OR NEW.section_id IS DISTINCT FROM OLD.section_id THEN
+            PERFORM dms_stats_attach(OLD.parent_folder_id, OLD.section_id,
+                -subtree.total_file_count, -subtree.total_bytes, -(subtree.total_folder_count + 1));
+            PERFORM dms_stats_attach(NEW.parent_folder_id, NEW.section_id,
+                subtree.total_file_count, subtree.total_bytes, subtree.total_folder_count + 1);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION dms_sections_stats() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO section_stats (section_id) VALUES (NEW.id);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+
+
+def upgrade():
+    # The triggers keep their names; only the functions behind them change
+    for statement in STATS_FUNCTIONS:
+        op.execute(statement)
+    op.execute("DROP FUNCTION IF EXISTS dms_stats_attach(varchar, varchar, bigint, bigint, bigint)")
+    op.execute("DROP FUNCTION IF EXISTS dms_stats_apply(varchar, bigint, bigint, bigint, bigint, bigint, bigint)")
+
+
+def downgrade():
+    # The counters are the same either way; put the per-folder functions back
+    for statement in PREVIOUS_STATS_FUNCTIONS:
+        op.execute(statement)
+    op.execute("DROP FUNCTION IF EXISTS dms_stats_apply(varchar[], varchar[], bigint[], bigint[], bigint[])")
@@ -14,6 +14,9 @@ from app.main import app
 from app.db.models import Base
 from app.core.config import settings
 from app.api.dependencies.repositories import get_db
+from app.services.storage_backends import LocalStorageBackend
+from app.services.storage_driver import AsyncStorageDriver
+from app.services.storage_service import StorageService
 
 
 # Use the main database for tests (not a separate test database)
@@ -142,3 +145,17 @@ async def clean_db(test_session: AsyncSession):
             pass  # Table might not exist
 
     await test_session.commit()
+
+
+@pytest.fixture
+def local_backend(tmp_path):
+    """Local disk storage backend in a temporary directory, with its own driver pool."""
+    driver = AsyncStorageDriver(max_workers=2)
+    yield LocalStorageBackend(driver, str(tmp_path))
+    driver.shutdown()
+
+
+@pytest.fixture
+def local_storage(local_backend):
+    """Storage service on the local disk backend."""
+    return StorageService(local_backend.driver, local_backend)
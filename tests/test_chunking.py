@@ -0,0 +1,45 @@
+import hashlib
+import io
+import os
+
+from app.services.chunking import ContentChunker
+
+
+def test_chunks_survive_an_insert():
+    """Test that inserting bytes only changes the chunks around the edit."""
+    chunker = ContentChunker(64 * 1024)
+    data = os.urandom(4 * 1024 * 1024)
+    edited = data[:1000000] + b"inserted bytes" + data[1000000:]
+
+    size, file_hash, chunks = chunker.plan(io.BytesIO(data))
+    _, _, edited_chunks = chunker.plan(io.BytesIO(edited))
+
+    assert size == len(data)
+    assert file_hash == hashlib.sha256(data).hexdigest()
+    assert all(0 < chunk_size <= chunker.max_size for _, chunk_size, _ in chunks)
+
+    known = {chunk_hash for _, _, chunk_hash in chunks}
+    new_chunks = [chunk for chunk in edited_chunks if chunk[2] not in known]
+    assert len(new_chunks) <= 2
+
+
+async def test_manifest_streams_and_honors_ranges(local_storage):
+    """Test that chunked content is reassembled for full and ranged reads."""
+    data = os.urandom(300000)
+    chunks = []
+    for offset in range(0, len(data), 100000):
+        path = f"blobs/acc/chunk{offset}"
+        await local_storage.upload_bytes(path, data[offset:offset + 100000])
+        chunks.append((path, 100000))
+
+    await local_storage.put_manifest("manifests/acc/ab/abc", hashlib.sha256(data).hexdigest(),
+                                     len(data), "application/pdf", chunks)
+
+    info = await local_storage.get_file_info("manifests/acc/ab/abc")
+    assert info["size"] == len(data)
+    assert local_storage.get_local_path("manifests/acc/ab/abc") is None
+
+    assert await local_storage.download_file("manifests/acc/ab/abc") == data
+    body = await local_storage.open_file_stream("manifests/acc/ab/abc", (99990, 200010))
+    assert b"".join([chunk async for chunk in body]) == data[99990:200011]
+    assert await local_storage.hash_chunks(chunks) == hashlib.sha256(data).hexdigest()
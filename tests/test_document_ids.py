@@ -0,0 +1,31 @@
+from app.db.document_ids import ALPHABET, format_document_id, is_valid_document_id
+
+
+def test_document_id_format():
+    """Test that document IDs are DOC- plus base32 digits and a check character."""
+    assert format_document_id(1)[:-1] == "DOC-000001"
+    assert format_document_id(32 ** 6 - 1)[:-1] == "DOC-ZZZZZZ"
+    assert format_document_id(32 ** 6)[:-1] == "DOC-1000000"
+
+    ids = {format_document_id(value) for value in range(1, 5000)}
+    assert len(ids) == 4999
+    assert all(is_valid_document_id(document_id) for document_id in ids)
+    # Random IDs of the previous format never match
+    assert not is_valid_document_id("DOC-A1B2C3")
+
+
+def test_check_character_catches_typos():
+    """Test that a mistyped character or swapped neighbours fail validation."""
+    document_id = format_document_id(123456789)
+    body = document_id[4:]
+
+    for position in range(len(body)):
+        for char in ALPHABET:
+            if char != body[position]:
+                typo = body[:position] + char + body[position + 1:]
+                assert not is_valid_document_id("DOC-" + typo)
+
+    for position in range(len(body) - 1):
+        if body[position] != body[position + 1]:
+            swapped = body[:position] + body[position + 1] + body[position] + body[position + 2:]
+            assert not is_valid_document_id("DOC-" + swapped)
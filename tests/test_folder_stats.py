@@ -0,0 +1,89 @@
+import pytest
+from sqlalchemy import text
+
+from app.db.tables.dms.stats import STATS_BACKFILL
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _counters(session, section_id):
+    folders = (await session.execute(text(
+        "SELECT s.* FROM folder_stats s JOIN folders_new f ON f.id = s.folder_id "
+        "WHERE f.section_id = :section_id ORDER BY s.folder_id"
+    ), {"section_id": section_id})).all()
+    section = (await session.execute(text(
+        "SELECT * FROM section_stats WHERE section_id = :section_id"
+    ), {"section_id": section_id})).all()
+    return folders, section
+
+
+async def _assert_counters_match_recount(session, section_id):
+    """Counters kept by the triggers equal the ones the backfill computes from scratch"""
+    maintained = await _counters(session, section_id)
+    await session.execute(text("SAVEPOINT recount"))
+    await session.execute(text("DELETE FROM folder_stats"))
+    await session.execute(text("DELETE FROM section_stats"))
+    for statement in STATS_BACKFILL:
+        await session.execute(text(statement))
+    recounted = await _counters(session, section_id)
+    await session.execute(text("ROLLBACK TO SAVEPOINT recount"))
+    assert maintained == recounted
+
+
+async def test_stats_follow_file_and_folder_changes(test_session):
+    """Test the stats triggers through inserts, moves, soft deletes and restores."""
+    session = test_session
+    await session.execute(text(
+        "INSERT INTO users (id, username, email, password, is_active, is_super_admin) "
+        "VALUES ('stats-user', 'stats-user', 'stats@example.com', 'x', true, false)"
+    ))
+    await session.execute(text(
+        "INSERT INTO accounts (id, name, slug, is_active) VALUES ('stats-account', 'Stats', 'stats', true)"
+    ))
+    await session.execute(text(
+        "INSERT INTO sections (id, account_id, name, position, created_by) VALUES "
+        "('stats-s1', 'stats-account', 'One', 0, 'stats-user'), "
+        "('stats-s2', 'stats-account', 'Two', 1, 'stats-user')"
+    ))
+    await session.execute(text(
+        "INSERT INTO folders_new (id, account_id, section_id, parent_folder_id, name, created_by) VALUES "
+        "('stats-root', 'stats-account', 'stats-s1', NULL, 'root', 'stats-user'), "
+        "('stats-a', 'stats-account', 'stats-s1', 'stats-root', 'a', 'stats-user'), "
+        "('stats-b', 'stats-account', 'stats-s1', 'stats-a', 'b', 'stats-user'), "
+        "('stats-other', 'stats-account', 'stats-s1', NULL, 'other', 'stats-user')"
+    ))
+    await session.execute(text(
+        "INSERT INTO files_new (id, account_id, folder_id, document_id, name, original_filename, "
+        "size_bytes, storage_path, is_office_doc, is_deleted, created_by) VALUES "
+        "('stats-f1', 'stats-account', 'stats-b', 'S1', 'f1', 'f1', 100, 'p', false, false, 'stats-user'), "
+        "('stats-f2', 'stats-account', 'stats-b', 'S2', 'f2', 'f2', 50, 'p', false, false, 'stats-user'), "
+        "('stats-f3', 'stats-account', 'stats-a', 'S3', 'f3', 'f3', 7, 'p', false, false, 'stats-user'), "
+        "('stats-f4', 'stats-account', 'stats-other', 'S4', 'f4', 'f4', 3, 'p', false, false, 'stats-user')"
+    ))
+    await _assert_counters_match_recount(session, "stats-s1")
+
+    # Files moved across folders in one statement
+    await session.execute(text(
+        "UPDATE files_new SET folder_id = CASE folder_id WHEN 'stats-b' THEN 'stats-other' ELSE 'stats-b' END "
+        "WHERE id IN ('stats-f1', 'stats-f4')"
+    ))
+    await _assert_counters_match_recount(session, "stats-s1")
+
+    # Soft delete and restore
+    await session.execute(text("UPDATE files_new SET is_deleted = true WHERE id IN ('stats-f2', 'stats-f3')"))
+    await _assert_counters_match_recount(session, "stats-s1")
+    await session.execute(text("UPDATE files_new SET is_deleted = false WHERE id = 'stats-f2'"))
+    await _assert_counters_match_recount(session, "stats-s1")
+
+    # Folder moves: under another folder, then to a section root
+    await session.execute(text("UPDATE folders_new SET parent_folder_id = 'stats-other' WHERE id = 'stats-a'"))
+    await _assert_counters_match_recount(session, "stats-s1")
+    await session.execute(text("UPDATE folders_new SET parent_folder_id = NULL WHERE id = 'stats-b'"))
+    await _assert_counters_match_recount(session, "stats-s1")
+
+    # A folder with files moved to another section, then a subtree deleted with everything in it
+    await session.execute(text("UPDATE folders_new SET section_id = 'stats-s2' WHERE id = 'stats-b'"))
+    await _assert_counters_match_recount(session, "stats-s1")
+    await _assert_counters_match_recount(session, "stats-s2")
+    await session.execute(text("DELETE FROM folders_new WHERE id = 'stats-other'"))
+    await _assert_counters_match_recount(session, "stats-s1")
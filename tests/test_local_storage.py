@@ -0,0 +1,92 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+
+async def read_all(stream) -> bytes:
+    return b"".join([chunk async for chunk in stream])
+
+
+async def test_put_head_and_ranged_stream(local_backend):
+    """Test that objects round-trip and byte ranges are honored."""
+    await local_backend.put_object("blobs/acc/ab/abc", b"0123456789", "text/plain")
+
+    info = await local_backend.head("blobs/acc/ab/abc")
+    assert info["size"] == 10
+    assert info["etag"]
+
+    assert await local_backend.read("blobs/acc/ab/abc") == b"0123456789"
+    assert await read_all(await local_backend.open_stream("blobs/acc/ab/abc", (2, 5), 3)) == b"2345"
+    assert local_backend.local_path("blobs/acc/ab/abc").endswith("abc")
+
+
+async def test_multipart_copy_hash_and_delete(local_backend):
+    """Test multipart assembly, copies, mmap hashing and idempotent deletes."""
+    upload_id = await local_backend.create_multipart_upload("uploads/acc/big")
+    second = await local_backend.upload_part("uploads/acc/big", upload_id, 2, b"world")
+    first = await local_backend.upload_part("uploads/acc/big", upload_id, 1, b"hello ")
+    await local_backend.complete_multipart_upload("uploads/acc/big", upload_id, [
+        {"PartNumber": 2, "ETag": second},
+        {"PartNumber": 1, "ETag": first},
+    ])
+
+    await local_backend.copy("uploads/acc/big", "blobs/acc/copy")
+    assert await local_backend.read("blobs/acc/copy") == b"hello world"
+    assert await local_backend.hash_object("blobs/acc/copy", 4) == hashlib.sha256(b"hello world").hexdigest()
+
+    await local_backend.delete("uploads/acc/big")
+    await local_backend.delete("uploads/acc/big")
+    assert not await local_backend.exists("uploads/acc/big")
+    assert await local_backend.exists("blobs/acc/copy")
+
+
+async def test_delete_many_skips_missing_objects(local_backend):
+    """Test that batch deletes remove every object and tolerate missing keys."""
+    for name in ("a", "b"):
+        await local_backend.put_object(f"blobs/acc/{name}", b"x")
+
+    assert await local_backend.delete_many(["blobs/acc/a", "blobs/acc/b", "blobs/acc/missing"]) == 3
+    assert not await local_backend.exists("blobs/acc/a")
+    assert not await local_backend.exists("blobs/acc/b")
+
+
+async def test_rejects_paths_outside_root(local_backend):
+    """Test that keys cannot escape the storage root."""
+    with pytest.raises(Exception):
+        await local_backend.put_object("../outside", b"x")
+
+
+class SpooledUpload:
+    """Minimal stand-in for an UploadFile backed by an in-memory file."""
+
+    content_type = "application/octet-stream"
+
+    def __init__(self, data: bytes):
+        self.file = io.BytesIO(data)
+        self.size = len(data)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+    async def seek(self, offset: int):
+        self.file.seek(offset)
+
+
+async def test_parallel_multipart_upload(local_backend, local_storage):
+    """Test that parts uploaded concurrently are assembled in order and hashed."""
+    service = local_storage
+    service.part_size = 64 * 1024
+    data = os.urandom(10 * service.part_size + 123)
+
+    part_size, concurrency = service.plan_upload(len(data))
+    assert part_size == service.part_size
+    assert concurrency > 1
+
+    size, file_hash = await service.upload_file_stream(SpooledUpload(data), "uploads/acc/big")
+
+    assert size == len(data)
+    assert file_hash == hashlib.sha256(data).hexdigest()
+    assert await local_backend.read("uploads/acc/big") == data
+    assert os.listdir(os.path.join(local_backend.root, local_backend.MULTIPART_DIR)) == []
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.pagination import decode_cursor, encode_cursor
+from app.db.tables.dms.files import FileNew
+
+
+def test_cursor_round_trip():
+    """Test that cursors restore the typed sort key values they were made from."""
+    created_at = datetime(2026, 10, 17, 12, 30, 5, 123456, tzinfo=timezone.utc)
+    keys = (FileNew.created_at, FileNew.id)
+
+    cursor = encode_cursor([created_at, "01JABCDEFGHJKMNPQRSTVWXYZ0"])
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, keys) == [created_at, "01JABCDEFGHJKMNPQRSTVWXYZ0"]
+
+
+@pytest.mark.parametrize("cursor", ["garbage", encode_cursor(["only-one-value"]), encode_cursor(["not a date", "x"])])
+def test_invalid_cursor_is_rejected(cursor):
+    """Test that malformed cursors are a client error."""
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, (FileNew.created_at, FileNew.id))
+    assert error.value.status_code == 400
@@ -0,0 +1,33 @@
+import io
+
+import pytest
+
+from app.services.renditions import render_rendition, rendition_keys, supports_renditions
+
+
+def test_supported_types_and_keys():
+    """Test which content gets renditions and where they are stored."""
+    assert supports_renditions("image/png")
+    assert supports_renditions("application/pdf")
+    assert not supports_renditions("image/svg+xml")
+    assert not supports_renditions("text/plain")
+    assert not supports_renditions(None)
+
+    keys = rendition_keys("acc", "ab" + "0" * 62)
+    assert keys == [
+        f"renditions/acc/ab/ab{'0' * 62}/thumbnail.webp",
+        f"renditions/acc/ab/ab{'0' * 62}/preview.webp",
+    ]
+
+
+def test_image_thumbnail_fits_requested_size():
+    """Test that images are scaled down to the rendition size."""
+    Image = pytest.importorskip("PIL.Image")
+    source = io.BytesIO()
+    Image.new("RGB", (2000, 1000), "red").save(source, "PNG")
+
+    rendition = render_rendition(source.getvalue(), "image/png", 256)
+
+    with Image.open(io.BytesIO(rendition)) as image:
+        assert image.format == "WEBP"
+        assert image.size == (256, 128)
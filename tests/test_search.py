@@ -0,0 +1,12 @@
+from app.db.tables.dms.search import build_tsquery
+
+
+def test_build_tsquery():
+    """Test that search box text becomes a prefix query, short terms matching whole words."""
+    assert build_tsquery("Invoice ACME") == "invoice:* & acme:*"
+    assert build_tsquery("q1 report") == "q1 & report:*"
+    assert build_tsquery("invoice_2024-03.pdf") == "invoice:* & 2024:* & 03 & pdf:*"
+    assert build_tsquery("acme", scope="name") == "acme:*A"
+    assert build_tsquery("q1", scope="metadata") == "q1:BCD"
+    assert build_tsquery("acme", scope="content") == "acme:*"
+    assert build_tsquery("' & !") is None
@@ -0,0 +1,67 @@
+import pytest
+from datetime import datetime, timezone
+from fastapi import HTTPException
+
+from app.api.dependencies.streaming import parse_range_header, if_range_matches
+from app.services.storage_cache import StorageCache
+
+
+def test_parse_range_full_and_open_ended():
+    """Test explicit and open-ended byte ranges."""
+    assert parse_range_header("bytes=0-99", 1000) == (0, 99)
+    assert parse_range_header("bytes=500-", 1000) == (500, 999)
+    assert parse_range_header("bytes=900-5000", 1000) == (900, 999)
+
+
+def test_parse_range_suffix():
+    """Test suffix ranges return the last N bytes."""
+    assert parse_range_header("bytes=-100", 1000) == (900, 999)
+    assert parse_range_header("bytes=-5000", 1000) == (0, 999)
+
+
+def test_parse_range_ignored():
+    """Test that missing, multi-range or malformed headers serve the whole object."""
+    assert parse_range_header(None, 1000) is None
+    assert parse_range_header("bytes=0-1,5-6", 1000) is None
+    assert parse_range_header("items=0-1", 1000) is None
+    assert parse_range_header("bytes=abc-", 1000) is None
+    assert parse_range_header("bytes=5-3", 1000) is None
+    assert parse_range_header("bytes=2000-1500", 1000) is None
+
+
+def test_parse_range_unsatisfiable():
+    """Test that a range past the end of the object raises 416."""
+    with pytest.raises(HTTPException) as exc:
+        parse_range_header("bytes=1000-", 1000)
+
+    assert exc.value.status_code == 416
+    assert exc.value.headers["Content-Range"] == "bytes */1000"
+
+
+def test_if_range_validators():
+    """Test If-Range matching against ETag and Last-Modified."""
+    last_modified = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    assert if_range_matches(None, '"abc"', last_modified)
+    assert if_range_matches('"abc"', '"abc"', last_modified)
+    assert not if_range_matches('"xyz"', '"abc"', last_modified)
+    assert not if_range_matches('W/"abc"', '"abc"', last_modified)
+    assert if_range_matches("Thu, 02 Jan 2025 03:04:05 GMT", '"abc"', last_modified)
+    assert not if_range_matches("Thu, 02 Jan 2025 03:04:06 GMT", '"abc"', last_modified)
+
+
+async def test_cache_hit_survives_eviction(tmp_path, local_storage):
+    """Test that a cache hit is still served after its entry is evicted."""
+    cache = StorageCache(str(tmp_path / "cache"), 1024, 1024)
+    temp = cache.create_temp()
+    temp.write(b"0123456789")
+    temp.close()
+    cache.commit("blobs/acc/ab/abc", "v1", temp.name)
+
+    source = cache.open_entry("blobs/acc/ab/abc", "v1")
+    assert local_storage.cached_file_info(source, "v1")["size"] == 10
+
+    cache.invalidate("blobs/acc/ab/abc")
+    assert cache.open_entry("blobs/acc/ab/abc", "v1") is None
+    assert b"".join([chunk async for chunk in local_storage.stream_cached(source, (2, 5))]) == b"2345"
+    assert source.closed